@@ -0,0 +1,24 @@
+# python -m benchmarks.encoding
+import json
+import time
+
+from langgraphics.encoding import Encoder
+from benchmarks.messages import conversation
+
+
+def measure(encode, states) -> float:
+    start = time.perf_counter()
+    for state in states:
+        encode(state)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for turns in (50, 200):
+        states = [{"messages": messages, "turn": i} for i, messages in enumerate(conversation(turns))]
+        before = measure(lambda s: json.dumps(s, ensure_ascii=False, default=lambda x: x.__dict__), states)
+        line = f"{turns:>4} turns: json + __dict__ {before * 1e3:8.1f} ms"
+        for backend in ("json", "orjson"):
+            after = measure(Encoder(backend=backend).dumps, states)
+            line += f", {backend} {after * 1e3:8.1f} ms ({before / after:4.1f}x)"
+        print(line)
@@ -0,0 +1,40 @@
+# python -m benchmarks.messages
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, messages_to_dict
+
+from langgraphics.formatter import Formatter
+
+
+def conversation(turns: int) -> list[list]:
+    # The message state a node sees on each turn of a chat agent.
+    history, states = [], []
+    for i in range(turns):
+        history.append(HumanMessage(content=f"question {i} " + "x" * 400, id=f"h{i}"))
+        history.append(AIMessage(
+            content=f"answer {i} " + "y" * 400,
+            id=f"a{i}",
+            tool_calls=[{"name": "search", "args": {"q": str(i)}, "id": f"c{i}"}],
+            response_metadata={"model_name": "gpt-4o-mini", "finish_reason": "tool_calls"},
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        ))
+        states.append(list(history))
+    return states
+
+
+if __name__ == "__main__":
+    for turns in (50, 200):
+        states = conversation(turns)
+        start = time.perf_counter()
+        for messages in states:
+            list(map(Formatter.norm, messages_to_dict(messages)))
+        before = time.perf_counter() - start
+        Formatter.normalized.clear()
+        start = time.perf_counter()
+        for messages in states:
+            Formatter.normalize(messages)
+        after = time.perf_counter() - start
+        print(
+            f"{turns:>4} turns: normalize every message {before * 1e3:8.1f} ms, "
+            f"memoized {after * 1e3:8.1f} ms, {before / after:5.1f}x"
+        )
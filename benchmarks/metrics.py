@@ -0,0 +1,53 @@
+# python -m benchmarks.metrics
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from langgraphics.formatter import Formatter
+
+
+def llm_run(messages: int, usage: str) -> SimpleNamespace:
+    history = [
+        {"lc": 1, "type": "constructor", "id": ["langchain", "schema", "messages", "AIMessage"],
+         "kwargs": {"content": "x" * 200, "tool_calls": [{"name": "search", "args": {"q": str(i)}}]}}
+        for i in range(messages)
+    ]
+    kwargs = {"content": "done", "response_metadata": {}, "additional_kwargs": {"history": history}}
+    llm_output = None
+    if usage == "usage_metadata":
+        kwargs["usage_metadata"] = {"total_tokens": 500, "input_token_details": {"cache_read": 100}}
+    elif usage == "token_usage":
+        llm_output = {"token_usage": {"total_tokens": 500, "prompt_tokens_details": {"cached_tokens": 100}}}
+    start = datetime(2025, 1, 1)
+    return SimpleNamespace(
+        extra={"metadata": {"ls_model_name": "gpt-4o-mini"}},
+        outputs={"generations": [[{"text": "done", "message": {"kwargs": kwargs}}]], "llm_output": llm_output},
+        start_time=start,
+        end_time=start + timedelta(seconds=1),
+    )
+
+
+def baseline(run: SimpleNamespace) -> dict:
+    # Formatter.metrics before the single-pass extractor.
+    model_name = Formatter.extract(run.extra, "ls_model_name") or "unknown"
+    total_tokens = Formatter.extract(run.outputs, "total_tokens") or 0
+    cached_tokens = Formatter.extract(run.outputs, "cached_tokens") or 0
+    return {
+        "latency": Formatter.latency((run.end_time - run.start_time).total_seconds()),
+        "costs": Formatter.costs(model_name, cached_tokens, total_tokens),
+        "tokens": {"cached": cached_tokens, "total": total_tokens},
+    }
+
+
+if __name__ == "__main__":
+    for usage in ("usage_metadata", "token_usage", "none"):
+        for messages in (10, 1000):
+            run = llm_run(messages, usage)
+            number = 200
+            before = timeit.timeit(lambda: baseline(run), number=number) / number
+            after = timeit.timeit(lambda: Formatter.metrics(run), number=number) / number
+            print(
+                f"{usage:>15} {messages:>5} messages: "
+                f"3x extract {before * 1e6:9.1f} us, single pass {after * 1e6:9.1f} us, "
+                f"{before / after:6.1f}x"
+            )
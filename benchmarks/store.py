@@ -0,0 +1,31 @@
+# python -m benchmarks.store
+import json
+import tempfile
+import time
+
+from langgraphics.store import TraceStore
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        store = TraceStore(directory)
+        message = json.dumps({"type": "node_output", "node_id": "agent", "state": {"value": "x" * 200}})
+        start = time.perf_counter()
+        for run in range(20):
+            run_id = f"run{run:05d}"
+            events = 100_000 if run == 10 else 1_000
+            store.append(run_id, "run_start", "{}")
+            for _ in range(events):
+                store.append(run_id, "node_output", message)
+            store.append(run_id, "run_end", "{}")
+            store.flush()
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        runs = store.list_runs()
+        listed = time.perf_counter() - start
+        start = time.perf_counter()
+        events = store.events("run00010")
+        opened = time.perf_counter() - start
+        print(
+            f"append {written * 1e3:8.1f} ms, list {len(runs)} runs {listed * 1e3:6.2f} ms, "
+            f"open a {len(events)}-event run {opened * 1e3:6.1f} ms"
+        )
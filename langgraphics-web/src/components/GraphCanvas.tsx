@@ -4,7 +4,7 @@ import {Controls} from "./Controls";
 import {CustomNode} from "./CustomNode";
 import {useFocus} from "../hooks/useFocus";
 import {InspectPanel} from "./InspectPanel";
-import type {EdgeData, ExecutionEvent, InspectorMode, NodeData, NodeEntry, ViewMode} from "../types";
+import type {EdgeData, ExecutionEvent, InspectorMode, NodeData, NodeEntry, StateBase, ViewMode} from "../types";
 import type {RankDir} from "../layout";
 
 const nodeTypes: NodeTypes = {custom: CustomNode as NodeTypes[string]};
@@ -14,6 +14,10 @@ interface GraphCanvasProps {
     edges: Edge<EdgeData>[];
     events: ExecutionEvent[];
     nodeEntries: NodeEntry[];
+    stateBase?: StateBase | null;
+    blobs?: Map<string, string | null>;
+    onFetchBlob?: (id: string) => void;
+    onExpand?: (id: string) => void;
     activeNodeIds: string[];
     initialMode: ViewMode;
     isRecording: boolean;
@@ -23,9 +27,10 @@ interface GraphCanvasProps {
     initialColorMode?: ColorMode;
     initialInspect?: InspectorMode;
     onRankDirChange?: (v: RankDir) => void;
+    onInspectorModeChange?: (v: InspectorMode) => void;
 }
 
-export function GraphCanvas({nodes, edges, events, activeNodeIds, nodeEntries, initialMode = "auto", initialInspect = "off", initialColorMode = "system", initialRankDir = "TB", onRankDirChange, onReplay, isRecording = true, isReplaying = false}: GraphCanvasProps) {
+export function GraphCanvas({nodes, edges, events, activeNodeIds, nodeEntries, stateBase = null, blobs, onFetchBlob, onExpand, initialMode = "auto", initialInspect = "off", initialColorMode = "system", initialRankDir = "TB", onRankDirChange, onInspectorModeChange, onReplay, isRecording = true, isReplaying = false}: GraphCanvasProps) {
     const [rankDir, setRankDir] = useState<RankDir>(initialRankDir);
     const [colorMode, setColorMode] = useState<ColorMode>(initialColorMode);
     const [inspectorMode, setInspectorMode] = useState<InspectorMode>(initialInspect);
@@ -37,6 +42,15 @@ export function GraphCanvas({nodes, edges, events, activeNodeIds, nodeEntries, i
         await fitContent();
     }, [onRankDirChange, fitContent])
 
+    const handleInspectorModeChange = useCallback((v: InspectorMode) => {
+        setInspectorMode(v);
+        onInspectorModeChange?.(v);
+    }, [onInspectorModeChange])
+
+    const handleNodeClick = useCallback((_: unknown, node: Node<NodeData>) => {
+        if (node.data.collapsed) onExpand?.(node.id);
+    }, [onExpand]);
+
     useEffect(() => {
         if (events.find(({type}) => ["error", "run_end"].includes(type))) {
             fitContent().then();
@@ -49,6 +63,7 @@ export function GraphCanvas({nodes, edges, events, activeNodeIds, nodeEntries, i
             edges={edges}
             colorMode={colorMode}
             nodeTypes={nodeTypes}
+            onNodeClick={handleNodeClick}
             proOptions={{hideAttribution: true}}
             className={`inspector-${inspectorMode}`}
             zoomOnDoubleClick={false} nodesDraggable={false}
@@ -68,13 +83,16 @@ export function GraphCanvas({nodes, edges, events, activeNodeIds, nodeEntries, i
                 setColorMode={setColorMode}
                 inspectorMode={inspectorMode}
                 setRankDir={handleRankDirChange}
-                setInspectorMode={setInspectorMode}
+                setInspectorMode={handleInspectorModeChange}
             />
             <Background/>
             <div className={`inspect-wrapper-${inspectorMode}`}>
                 <InspectPanel
                     colorMode={colorMode}
                     nodeEntries={nodeEntries}
+                    stateBase={stateBase}
+                    blobs={blobs}
+                    onFetchBlob={onFetchBlob}
                 />
             </div>
         </ReactFlow>
@@ -4,10 +4,29 @@ import type {TreeDataNode} from "antd";
 import ReactMarkdown from "react-markdown";
 import type {ColorMode} from "@xyflow/react";
 import {useCallback, useEffect, useMemo, useState} from "react";
-import type {NodeEntry} from "../types";
+import type {NodeEntry, PayloadField, StateBase} from "../types";
+import {payloadBody, resolveState} from "../state";
 import {Metrics} from "./Metrics";
 
-export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, nodeEntries: NodeEntry[] }) {
+const NO_BLOBS = new Map<string, string | null>();
+
+function FullBody({entry, field}: { entry: NodeEntry, field: PayloadField }) {
+    const full = entry.truncated?.[field];
+    if (!full) return null;
+    return (
+        <a
+            className="tag"
+            target="_blank"
+            rel="noreferrer"
+            href={`/blobs/${full.id}`}
+            onClick={(event) => event.stopPropagation()}
+        >
+            truncated · full {Math.ceil(full.size / 1024)} KB
+        </a>
+    );
+}
+
+export function InspectPanel({colorMode, nodeEntries, stateBase, blobs = NO_BLOBS, onFetchBlob}: { colorMode: ColorMode, nodeEntries: NodeEntry[], stateBase: StateBase | null, blobs?: Map<string, string | null>, onFetchBlob?: (id: string) => void }) {
     const [selectedKey, setSelectedKey] = useState<string>("");
 
     const expandedKeys = useMemo(() => {
@@ -19,6 +38,7 @@ export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, n
     }, [nodeEntries, selectedKey]);
 
     const safeParseJSON = useCallback((str: any) => {
+        if (str != null && typeof str !== "string") return str;
         try {
             return JSON.parse(str ?? "[]");
         } catch {
@@ -26,26 +46,37 @@ export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, n
         }
     }, [])
 
-    const state = useMemo(() => {
-        if (!selectedEntry?.state) return null;
-        return safeParseJSON(selectedEntry?.state);
-    }, [selectedEntry, safeParseJSON])
+    const payload = useMemo(() => {
+        const missing: string[] = [];
+        return {
+            input: payloadBody(selectedEntry, "input", blobs, missing),
+            output: payloadBody(selectedEntry, "output", blobs, missing),
+            state: resolveState(nodeEntries, selectedEntry, stateBase, (e) => payloadBody(e, "state", blobs, missing), blobs, missing),
+            missing,
+        };
+    }, [nodeEntries, selectedEntry, stateBase, blobs])
+
+    useEffect(() => {
+        if (onFetchBlob) payload.missing.forEach(onFetchBlob);
+    }, [payload, onFetchBlob]);
+
+    const state = payload.state;
 
     const system = useMemo(() => {
-        const inputs = safeParseJSON(selectedEntry?.input);
+        const inputs = safeParseJSON(payload.input);
         const system = inputs[0] || {};
         return system.role === "system" && inputs.length < 3 ? system : null;
-    }, [selectedEntry, safeParseJSON])
+    }, [payload, safeParseJSON])
 
     const input = useMemo(() => {
-        const input = safeParseJSON(selectedEntry?.input);
+        const input = safeParseJSON(payload.input);
         return input[input.length - 1] || null;
-    }, [selectedEntry, safeParseJSON])
+    }, [payload, safeParseJSON])
 
     const output = useMemo(() => {
-        const output = safeParseJSON(selectedEntry?.output);
+        const output = safeParseJSON(payload.output);
         return output[output.length - 1] || null;
-    }, [selectedEntry, safeParseJSON])
+    }, [payload, safeParseJSON])
 
     const sectionMaxHeight = useMemo(() => {
         const reducer: any = (acc: number, curr: boolean) => acc + Number(curr);
@@ -128,7 +159,12 @@ export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, n
                                         items={[
                                             {
                                                 key: "state",
-                                                label: "State",
+                                                label: (
+                                                    <>
+                                                        <span>State</span>
+                                                        <FullBody entry={selectedEntry} field="state"/>
+                                                    </>
+                                                ),
                                                 showArrow: false,
                                                 children: <pre>{JSON.stringify(state, null, 2)}</pre>,
                                             },
@@ -170,6 +206,7 @@ export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, n
                                                     <>
                                                         <span>Input</span>
                                                         <span className="tag">{input.role ?? "unknown"}</span>
+                                                        <FullBody entry={selectedEntry} field="input"/>
                                                     </>
                                                 ),
                                                 children: (
@@ -194,6 +231,7 @@ export function InspectPanel({colorMode, nodeEntries}: { colorMode: ColorMode, n
                                                     <>
                                                         <span>Output</span>
                                                         <span className="tag">{output.role ?? "unknown"}</span>
+                                                        <FullBody entry={selectedEntry} field="output"/>
                                                     </>
                                                 ),
                                                 children: (
@@ -16,6 +16,15 @@ export function computeStatuses(events: ExecutionEvent[], subgraphContainers: Se
             nodeStatuses.clear();
             edgeStatuses.clear();
             edgeInfo.clear();
+        } else if (event.type === "snapshot") {
+            nodeStatuses.clear();
+            edgeStatuses.clear();
+            edgeInfo.clear();
+            for (const [id, status] of Object.entries(event.nodes)) nodeStatuses.set(id, status);
+            for (const [id, {source, target, status}] of Object.entries(event.edges)) {
+                edgeInfo.set(id, {source, target});
+                edgeStatuses.set(id, status);
+            }
         } else if (event.type === "edge_active") {
             edgeInfo.set(event.edge_id, {source: event.source, target: event.target});
             if (nodeStatuses.get(event.source) === "active") {
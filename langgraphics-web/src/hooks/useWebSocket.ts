@@ -1,23 +1,54 @@
-import {useEffect, useRef, useState} from "react";
-import type {ExecutionEvent, GraphMessage, NodeEntry, WsMessage} from "../types";
+import {useCallback, useEffect, useRef, useState} from "react";
+import type {Detail, ExecutionEvent, GraphMessage, NodeEntry, StateBase, SubgraphTopology, TopologyIndex, WsFrame, WsMessage} from "../types";
 
 const RECONNECT_INTERVAL = 500;
 const CONNECTION_TIMEOUT = 500;
 
-export function useWebSocket(url: string) {
+function expand(msg: WsMessage, index: TopologyIndex | null): WsMessage {
+    if ((msg.type !== "edge_active" && msg.type !== "error") || msg.edge === undefined || !index) return msg;
+    const [edge_id, source, target] = index.edges[msg.edge];
+    return {...msg, edge_id, source, target};
+}
+
+function insertSubgraph<T extends SubgraphTopology>(topology: T, path: string[], subgraph: SubgraphTopology): T {
+    const [head, ...rest] = path;
+    return {
+        ...topology,
+        nodes: topology.nodes.map((n) => {
+            if (n.id !== head) return n;
+            if (rest.length) return n.subgraph ? {...n, subgraph: insertSubgraph(n.subgraph, rest, subgraph)} : n;
+            const {collapsed: _, ...node} = n;
+            return {...node, subgraph};
+        }),
+    };
+}
+
+export function useWebSocket(url: string, detail: Detail = "full", runId: string | null = null) {
     const [events, setEvents] = useState<ExecutionEvent[]>([]);
     const [nodeEntries, setNodeEntries] = useState<NodeEntry[]>([]);
     const [topology, setTopology] = useState<GraphMessage | null>(null);
+    const [stateBase, setStateBase] = useState<StateBase | null>(null);
+    const [blobs, setBlobs] = useState<Map<string, string | null>>(new Map());
+    const requestedRef = useRef<Set<string>>(new Set());
+    const expandedRef = useRef<Set<string>>(new Set());
     const wsRef = useRef<WebSocket | null>(null);
+    const detailRef = useRef<Detail>(detail);
     const timerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
 
     useEffect(() => {
         let unmounted = false;
         let runDone = false;
+        let lastSeq: number | null = null;
+        let channel: string | null = null;
+        let edgeIndex: TopologyIndex | null = null;
 
         function connect() {
             if (unmounted) return;
-            const ws = new WebSocket(url);
+            const params = new URLSearchParams();
+            if (runId !== null) params.set("run_id", runId);
+            if (lastSeq !== null) params.set("last_seq", String(lastSeq));
+            const query = params.toString();
+            const ws = new WebSocket(query ? `${url}/?${query}` : url);
             wsRef.current = ws;
 
             timerRef.current = setTimeout(() => {
@@ -33,30 +64,74 @@ export function useWebSocket(url: string) {
             ws.onopen = () => {
                 clearTimeout(timerRef.current!);
                 timerRef.current = null;
+                ws.send(JSON.stringify({type: "subscribe", detail: detailRef.current}));
+                for (const id of requestedRef.current) ws.send(JSON.stringify({type: "fetch", id}));
             };
 
             ws.onmessage = (event) => {
                 if (unmounted) return;
                 try {
-                    const msg: WsMessage = JSON.parse(event.data);
-                    if (msg.type === "graph") {
-                        runDone = false;
-                        setEvents([]);
-                        setTopology(msg);
-                        setNodeEntries([]);
-                    } else if (msg.type === "run_start") {
-                        runDone = false;
-                        setEvents([msg]);
-                        setNodeEntries([]);
-                    } else if (msg.type === "node_output") {
-                        const {type: _, ...entry} = msg;
-                        setNodeEntries((prev) => [...prev, entry]);
-                        if (msg.status === "ok" && !msg.parent_run_id) {
-                            setEvents((prev) => [...prev, msg]);
+                    const frame: WsFrame = JSON.parse(event.data);
+                    let reset = false;
+                    let newEvents: ExecutionEvent[] = [];
+                    let newEntries: NodeEntry[] = [];
+                    const fetched: [string, string | null][] = [];
+                    for (const raw of Array.isArray(frame) ? frame : [frame]) {
+                        const msg = expand(raw, edgeIndex);
+                        if ("seq" in msg && typeof msg.seq === "number") lastSeq = msg.seq;
+                        if (msg.type === "run_start") {
+                            if (channel !== null && !runDone && msg.channel && msg.channel !== channel) continue;
+                            channel = msg.channel ?? null;
+                        } else if (msg.type === "snapshot") {
+                            channel = msg.run_id;
+                        } else if ("channel" in msg && msg.channel && channel !== null && msg.channel !== channel) {
+                            continue;
+                        }
+                        if (msg.type === "graph") {
+                            reset = true;
+                            runDone = false;
+                            channel = null;
+                            edgeIndex = msg.index ?? null;
+                            newEvents = [];
+                            newEntries = [];
+                            setTopology(msg);
+                            setStateBase(null);
+                            setBlobs(new Map());
+                        } else if (msg.type === "run_start") {
+                            reset = true;
+                            runDone = false;
+                            newEvents = [msg];
+                            newEntries = [];
+                            setStateBase(null);
+                        } else if (msg.type === "snapshot") {
+                            reset = true;
+                            runDone = false;
+                            newEvents = [msg];
+                            newEntries = [...msg.outputs];
+                            setStateBase(msg.state);
+                        } else if (msg.type === "subgraph") {
+                            setTopology((prev) => prev && insertSubgraph(prev, msg.id.split(":"), msg.subgraph));
+                        } else if (msg.type === "blob") {
+                            requestedRef.current.delete(msg.id);
+                            fetched.push([msg.id, msg.body]);
+                        } else if (msg.type === "intern") {
+                            for (const [id, body] of Object.entries(msg.messages)) fetched.push([id, body]);
+                        } else if (msg.type === "node_output") {
+                            const {type: _, ...entry} = msg;
+                            newEntries.push(entry);
+                            if (msg.status === "ok" && !msg.parent_run_id) newEvents.push(msg);
+                        } else {
+                            if (msg.type === "run_end" || msg.type === "error") runDone = true;
+                            newEvents.push(msg as ExecutionEvent);
                         }
+                    }
+                    if (fetched.length) setBlobs((prev) => new Map([...prev, ...fetched]));
+                    if (reset) {
+                        setEvents(newEvents);
+                        setNodeEntries(newEntries);
                     } else {
-                        if (msg.type === "run_end" || msg.type === "error") runDone = true;
-                        setEvents((prev) => [...prev, msg as ExecutionEvent]);
+                        if (newEvents.length) setEvents((prev) => [...prev, ...newEvents]);
+                        if (newEntries.length) setNodeEntries((prev) => [...prev, ...newEntries]);
                     }
                 } catch {
                 }
@@ -75,7 +150,29 @@ export function useWebSocket(url: string) {
             if (timerRef.current) clearTimeout(timerRef.current);
             wsRef.current?.close();
         };
-    }, [url]);
+    }, [url, runId]);
+
+    useEffect(() => {
+        detailRef.current = detail;
+        const ws = wsRef.current;
+        if (ws?.readyState === WebSocket.OPEN) ws.send(JSON.stringify({type: "subscribe", detail}));
+    }, [detail]);
+
+    const fetchBlob = useCallback((id: string) => {
+        if (requestedRef.current.has(id)) return;
+        requestedRef.current.add(id);
+        const ws = wsRef.current;
+        if (ws?.readyState === WebSocket.OPEN) ws.send(JSON.stringify({type: "fetch", id}));
+    }, []);
+
+    // Asks the server for the body of a collapsed subgraph; it arrives as a
+    // "subgraph" message like one expanded by a run.
+    const expandNode = useCallback((id: string) => {
+        const ws = wsRef.current;
+        if (expandedRef.current.has(id) || ws?.readyState !== WebSocket.OPEN) return;
+        expandedRef.current.add(id);
+        ws.send(JSON.stringify({type: "expand", id}));
+    }, []);
 
-    return {topology, events, nodeEntries};
+    return {topology, events, nodeEntries, stateBase, blobs, fetchBlob, expandNode};
 }
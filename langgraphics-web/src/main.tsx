@@ -10,7 +10,7 @@ import type {RankDir} from "./layout";
 import "@xyflow/react/dist/style.css";
 import "./index.css";
 
-function parseParams(): {theme: ColorMode; direction: RankDir, mode: ViewMode, inspect: InspectorMode, ws_url: string} {
+function parseParams(): {theme: ColorMode; direction: RankDir, mode: ViewMode, inspect: InspectorMode, ws_url: string, run_id: string | null} {
     const p = new URLSearchParams(window.location.search);
     const mode = p.get("mode") ?? "auto";
     const theme = p.get("theme") ?? "system";
@@ -22,14 +22,16 @@ function parseParams(): {theme: ColorMode; direction: RankDir, mode: ViewMode, i
         direction: (["TB", "LR"].includes(direction) ? direction : "TB") as RankDir,
         mode: (["auto", "manual"].includes(mode) ? mode : "auto") as ViewMode,
         ws_url: "ws://localhost:" + (p.get("ws_port") ?? "8765"),
+        run_id: p.get("run_id"),
     };
 }
 
-const {theme, mode, inspect, direction, ws_url} = parseParams();
+const {theme, mode, inspect, direction, ws_url, run_id} = parseParams();
 
 function Index() {
     const [rankDir, setRankDir] = useState<RankDir>(direction);
-    const {topology, events, nodeEntries} = useWebSocket(ws_url);
+    const [inspectorMode, setInspectorMode] = useState<InspectorMode>(inspect);
+    const {topology, events, nodeEntries, stateBase, blobs, fetchBlob, expandNode} = useWebSocket(ws_url, inspectorMode === "off" ? "none" : inspectorMode, run_id);
     const [displayEvents, setDisplayEvents] = useState<ExecutionEvent[]>([]);
     const [displayNodeEntries, setDisplayNodeEntries] = useState<typeof nodeEntries>([]);
 
@@ -61,7 +63,7 @@ function Index() {
         const pending: ExecutionEvent[] = [];
         for (const event of events) {
             if (event.type === "node_output") { pending.push(event); continue; }
-            if (event.type === "run_start") pending.length = 0;
+            if (event.type === "run_start" || event.type === "snapshot") pending.length = 0;
             const last = batches[batches.length - 1];
             const prev = last?.[last.length - 1];
             if (last &&
@@ -103,7 +105,12 @@ function Index() {
                 isReplaying={isReplaying}
                 initialRankDir={direction}
                 onRankDirChange={setRankDir}
+                onInspectorModeChange={setInspectorMode}
                 nodeEntries={playNodeEntries}
+                stateBase={stateBase}
+                blobs={blobs}
+                onFetchBlob={fetchBlob}
+                onExpand={expandNode}
                 activeNodeIds={activeNodeIds}
             />
         </ReactFlowProvider>
@@ -0,0 +1,123 @@
+import type {NodeEntry, PatchOp, Payload, PayloadField, StateBase} from "./types";
+
+function unescape(token: string): string {
+    return token.replace(/~1/g, "/").replace(/~0/g, "~");
+}
+
+// Patch values are inserted as copies: later patches in a chain change the
+// document in place and must not reach back into the stored ops.
+function copy(value: any): any {
+    return value === undefined ? value : structuredClone(value);
+}
+
+export function applyPatch(doc: any, ops: PatchOp[]): any {
+    for (const op of ops) {
+        if (op.path === "") {
+            doc = copy(op.value) ?? null;
+            continue;
+        }
+        const tokens = op.path.split("/").slice(1).map(unescape);
+        const last = tokens.pop()!;
+        let target = doc;
+        for (const token of tokens) target = Array.isArray(target) ? target[Number(token)] : target[token];
+        if (Array.isArray(target)) {
+            if (op.op === "remove") target.splice(Number(last), 1);
+            else if (op.op === "replace") target[Number(last)] = copy(op.value);
+            else if (last === "-") target.push(copy(op.value));
+            else target.splice(Number(last), 0, copy(op.value));
+        } else if (op.op === "remove") {
+            delete target[last];
+        } else {
+            target[last] = copy(op.value);
+        }
+    }
+    return doc;
+}
+
+function parse(value: Payload | undefined): any {
+    if (typeof value !== "string") return value ?? null;
+    try {
+        return JSON.parse(value);
+    } catch {
+        return null;
+    }
+}
+
+type StateOf = (entry: NodeEntry) => Payload | undefined;
+
+// Interned patch ops carry a message's content id instead of its value.
+function resolveRefs(ops: PatchOp[], blobs: Map<string, string | null>, missing: string[]): PatchOp[] | null {
+    if (!ops.some((op) => op.ref)) return ops;
+    const absent = ops.filter((op) => op.ref && !blobs.has(op.ref)).map((op) => op.ref!);
+    if (absent.length) {
+        missing.push(...absent);
+        return null;
+    }
+    return ops.map((op) => op.ref ? {op: op.op, path: op.path, value: parse(blobs.get(op.ref) ?? "null")} : op);
+}
+
+export function resolveState(entries: NodeEntry[], entry: NodeEntry | undefined, base: StateBase | null, stateOf: StateOf = (e) => e.state, blobs: Map<string, string | null> = new Map(), missing: string[] = []): any {
+    if (!entry) return null;
+    const own = stateOf(entry);
+    if (own) return parse(own);
+    if (!entry.state_patch) return null;
+
+    const byId = new Map<number, NodeEntry>();
+    for (const e of entries) if (e.state_id != null) byId.set(e.state_id, e);
+
+    const patches: PatchOp[][] = [];
+    let current: NodeEntry | undefined = entry;
+    let doc: any = null;
+    while (current) {
+        const state = stateOf(current);
+        if (state) {
+            doc = parse(state);
+            break;
+        }
+        if (!current.state_patch || current.state_base == null) return null;
+        const ops = resolveRefs(current.state_patch, blobs, missing);
+        if (!ops) return null;
+        patches.push(ops);
+        if (base && base.id === current.state_base) {
+            doc = parse(base.value);
+            break;
+        }
+        current = byId.get(current.state_base);
+    }
+    if (doc === null) return null;
+    // Structured payloads are shared with the entries, and patches apply in place.
+    if (patches.length) doc = structuredClone(doc);
+    for (const ops of patches.reverse()) doc = applyPatch(doc, ops);
+    return doc;
+}
+
+export function payloadBody(entry: NodeEntry | undefined, field: PayloadField, blobs: Map<string, string | null>, missing: string[]): Payload {
+    if (!entry) return null;
+    const refs = entry.refs?.[field];
+    if (refs) {
+        const ids = Array.isArray(refs) ? refs : Object.values(refs).flat();
+        const absent = ids.filter((id) => !blobs.has(id));
+        if (absent.length) {
+            missing.push(...absent);
+            return null;
+        }
+        if (Array.isArray(refs)) return `[${refs.map((id) => blobs.get(id) ?? "null").join(",")}]`;
+        // The rest of the state may itself have been moved to a blob.
+        const restId = entry.blobs?.[field];
+        let rest: Payload | undefined = entry[field];
+        if (rest == null && restId) {
+            if (!blobs.has(restId)) {
+                missing.push(restId);
+                return null;
+            }
+            rest = blobs.get(restId);
+        }
+        const doc = {...parse(rest ?? "{}")};
+        for (const [key, keyIds] of Object.entries(refs)) doc[key] = keyIds.map((id) => parse(blobs.get(id) ?? "null"));
+        return JSON.stringify(doc);
+    }
+    const id = entry.blobs?.[field];
+    if (entry[field] != null || !id) return entry[field] ?? null;
+    if (!blobs.has(id)) missing.push(id);
+    return blobs.get(id) ?? null;
+}
@@ -2,6 +2,7 @@ import {Position} from "@xyflow/react";
 
 export type ViewMode = "auto" | "manual";
 export type InspectorMode = "off" | "tree" | "full";
+export type Detail = "none" | "tree" | "full";
 
 export interface NodeMetrics {
     latency: string;
@@ -26,6 +27,7 @@ export interface NodeData extends Record<string, unknown> {
     status: NodeStatus;
     handles: NodeHandle[];
     nodeType: "start" | "end" | "node" | "subgraph";
+    collapsed?: boolean;
 }
 
 export interface EdgeData extends Record<string, unknown> {
@@ -44,6 +46,7 @@ export interface ProtocolNode {
     name: string;
     node_type: "start" | "end" | "node" | "subgraph";
     subgraph?: SubgraphTopology;
+    collapsed?: boolean;
 }
 
 export interface ProtocolEdge {
@@ -54,32 +57,73 @@ export interface ProtocolEdge {
     label: string | null;
 }
 
+export interface TopologyIndex {
+    edges: [string, string, string][];
+}
+
 export interface GraphMessage {
     type: "graph";
     nodes: ProtocolNode[];
     edges: ProtocolEdge[];
+    index?: TopologyIndex;
 }
 
 export interface RunStartMessage {
     type: "run_start";
     run_id: string;
+    seq?: number;
+    channel?: string | null;
+}
+
+export interface PatchOp {
+    op: "add" | "replace" | "remove";
+    path: string;
+    value?: unknown;
+    // Interned payloads: the content id of a message standing in for `value`.
+    ref?: string;
+}
+
+// Payloads are JSON text in the "string" wire shape and plain values in the
+// default "structured" one.
+export type Payload = string | number | boolean | null | Payload[] | {[key: string]: Payload};
+
+export interface StateBase {
+    id: number;
+    value: Payload;
+}
+
+export interface SnapshotMessage {
+    type: "snapshot";
+    run_id: string | null;
+    nodes: Record<string, NodeStatus>;
+    edges: Record<string, { source: string; target: string; status: EdgeStatus }>;
+    outputs: NodeEntry[];
+    state: StateBase | null;
+    metrics: Omit<NodeMetrics, "latency">;
+    seq: number | null;
 }
 
 export interface RunEndMessage {
     type: "run_end";
     run_id: string;
+    seq?: number;
+    channel?: string | null;
 }
 
 export interface NodeStartMessage {
     type: "node_start";
     node: string;
     task_id: string;
+    seq?: number;
+    channel?: string | null;
 }
 
 export interface NodeEndMessage {
     type: "node_end";
     node: string;
     task_id: string;
+    seq?: number;
+    channel?: string | null;
 }
 
 export interface EdgeActiveMessage {
@@ -87,6 +131,9 @@ export interface EdgeActiveMessage {
     source: string;
     target: string;
     edge_id: string;
+    edge?: number;
+    seq?: number;
+    channel?: string | null;
 }
 
 export interface ErrorMessage {
@@ -94,6 +141,9 @@ export interface ErrorMessage {
     source: string;
     target: string;
     edge_id: string | null;
+    edge?: number;
+    seq?: number;
+    channel?: string | null;
 }
 
 export interface NodeMessage {
@@ -103,18 +153,62 @@ export interface NodeMessage {
     node_kind?: NodeKind | null;
     parent_run_id?: string | null;
     status?: "ok" | "error";
-    input?: string | null;
-    output?: string | null;
-    state?: string | null;
+    input?: Payload;
+    output?: Payload;
+    state?: Payload;
+    state_id?: number | null;
+    state_base?: number | null;
+    state_patch?: PatchOp[] | null;
+    blobs?: Partial<Record<PayloadField, string>> | null;
+    sizes?: Partial<Record<PayloadField, number>> | null;
+    truncated?: Partial<Record<PayloadField, TruncatedPayload>> | null;
+    refs?: PayloadRefs | null;
     metrics?: NodeMetrics | null;
+    seq?: number;
+    channel?: string | null;
+}
+
+export type PayloadField = "input" | "output" | "state";
+
+export interface TruncatedPayload {
+    id: string;
+    size: number;
+}
+
+export interface PayloadRefs {
+    input?: string[];
+    output?: string[];
+    state?: Record<string, string[]>;
+}
+
+export interface InternMessage {
+    type: "intern";
+    messages: Record<string, string>;
+    seq?: number;
+    channel?: string | null;
+}
+
+export interface BlobMessage {
+    type: "blob";
+    id: string;
+    body: string | null;
+}
+
+export interface SubgraphMessage {
+    type: "subgraph";
+    id: string;
+    subgraph: SubgraphTopology;
 }
 
 export type NodeEntry = Omit<NodeMessage, "type">;
 
 export type WsMessage =
-    | GraphMessage | RunStartMessage | RunEndMessage | NodeStartMessage
-    | NodeEndMessage | EdgeActiveMessage | ErrorMessage | NodeMessage;
+    | GraphMessage | SnapshotMessage | RunStartMessage | RunEndMessage | NodeStartMessage
+    | NodeEndMessage | EdgeActiveMessage | ErrorMessage | NodeMessage | BlobMessage
+    | SubgraphMessage | InternMessage;
+
+export type WsFrame = WsMessage | WsMessage[];
 
 export type ExecutionEvent =
-    | RunStartMessage | RunEndMessage | NodeStartMessage | NodeEndMessage
+    | SnapshotMessage | RunStartMessage | RunEndMessage | NodeStartMessage | NodeEndMessage
     | EdgeActiveMessage | ErrorMessage | NodeMessage;
@@ -12,6 +12,9 @@ export default defineConfig({
         watch: {
             usePolling: true,
         },
+        proxy: {
+            '/blobs': 'http://localhost:8764',
+        },
     },
     test: {
         environment: 'node',
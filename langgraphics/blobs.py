@@ -0,0 +1,54 @@
+import base64
+import binascii
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+DEFAULT_BLOB_STORE_SIZE = 64 * 1024 * 1024
+
+
+class BlobStore:
+    def __init__(self, capacity: int = DEFAULT_BLOB_STORE_SIZE) -> None:
+        self.capacity = capacity
+        self.size = 0
+        self.blobs: OrderedDict[str, str] = OrderedDict()
+        # Written by the tracer (possibly on payload workers) and the drain,
+        # read by the HTTP server's thread.
+        self.lock = threading.Lock()
+        self.on_put: Callable[[str, str], None] | None = None
+
+    def put(self, body: str) -> str:
+        data = body.encode()
+        blob_id = hashlib.blake2b(data, digest_size=12).hexdigest()
+        with self.lock:
+            if blob_id in self.blobs:
+                self.blobs.move_to_end(blob_id)
+                return blob_id
+            self.blobs[blob_id] = body
+            self.size += len(data)
+            while self.size > self.capacity and len(self.blobs) > 1:
+                _, evicted = self.blobs.popitem(last=False)
+                self.size -= len(evicted.encode())
+        if self.on_put is not None:
+            self.on_put(blob_id, body)
+        return blob_id
+
+    def get(self, blob_id: str) -> str | None:
+        with self.lock:
+            body = self.blobs.get(blob_id)
+            if body is not None:
+                self.blobs.move_to_end(blob_id)
+        return body
+
+    def read(self, blob_id: str) -> tuple[bytes, str] | None:
+        # The bytes and content type a blob is served with over HTTP: base64
+        # data URLs (externalized images) are decoded, everything else is JSON.
+        if (body := self.get(blob_id)) is None:
+            return None
+        if body.startswith("data:") and (marker := body.find(";base64,", 0, 256)) != -1:
+            try:
+                return base64.b64decode(body[marker + 8:]), body[5:marker] or "application/octet-stream"
+            except (binascii.Error, ValueError):
+                pass
+        return body.encode(), "application/json; charset=utf-8"
@@ -1,47 +1,500 @@
 import asyncio
 import json
-from typing import Any
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from typing import Any, Literal
+from urllib.parse import parse_qs, urlparse
 
 import websockets
 from websockets.asyncio.server import Server
 
+from .blobs import DEFAULT_BLOB_STORE_SIZE, BlobStore
+from .encoding import ENCODER, PAYLOAD_FIELDS, Encoder, Wire, dumps
+from .snapshot import Snapshot
+from .store import TraceStore
+
+DEFAULT_QUEUE_SIZE = 4096
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_SEND_QUEUE_SIZE = 1024
+DEFAULT_REPLAY_SIZE = 512
+DEFAULT_HISTORY_SIZE = 32
+MAX_LIVE_RUNS = 64
+SHUTDOWN_TIMEOUT = 5
+STRUCTURAL_EVENTS = frozenset({"graph", "snapshot", "run_start", "run_end", "error", "edge_active", "blob", "subgraph", "intern"})
+STORED_EVENTS = frozenset({"run_start", "run_end", "error", "edge_active", "node_output", "node_step", "intern"})
+BLOB_URL = re.compile(r"/blobs/([0-9a-f]{24})")
+
+SlowConsumerPolicy = Literal["drop", "snapshot", "disconnect"]
+PayloadMode = Literal["eager", "lazy", "interned"]
+Detail = Literal["none", "tree", "full"]
+DETAIL_LEVELS: tuple[Detail, ...] = ("none", "tree", "full")
+
+logger = logging.getLogger(__name__)
+
+
+def frame(messages: list[str]) -> str:
+    if len(messages) == 1:
+        return messages[0]
+    return f"[{','.join(messages)}]"
+
+
+class Replay:
+    def __init__(
+        self,
+        topology: dict[str, Any],
+        size: int,
+        blobs: BlobStore,
+        wire: Wire = "structured",
+        encoder: Encoder | None = None,
+    ) -> None:
+        self.events: deque[tuple[int, str, str]] = deque(maxlen=size)
+        # The decoded events alongside, so compaction never re-parses the wire text.
+        self.sources: deque[dict[str, Any] | None] = deque(maxlen=size)
+        self.encoder = encoder or ENCODER
+        self.snapshot = Snapshot(topology, blobs, self.encoder)
+        self.interned: set[str] = set()
+        self.wire = wire
+
+    def record(self, seq: int, msg_type: str, message: str, source: dict[str, Any] | None = None) -> None:
+        if len(self.events) == self.events.maxlen:
+            _, _, evicted = self.events.popleft()
+            self.snapshot.apply(self.sources.popleft() or self.encoder.loads(evicted))
+        self.events.append((seq, msg_type, message))
+        self.sources.append(source)
+
+    def resumable(self, last_seq: int) -> bool:
+        # Runs interleave on the wire, so the ring is not contiguous in seq; it
+        # is enough that nothing newer than `last_seq` was compacted away.
+        return self.snapshot.seq is None or self.snapshot.seq <= last_seq
+
+    def compacted(self) -> list[tuple[str, str]]:
+        # The whole run so far as a single snapshot frame.
+        if not self.events:
+            return self.backlog()
+        snapshot = self.snapshot.fork()
+        for (_, _, message), source in zip(self.events, self.sources):
+            snapshot.apply(source or self.encoder.loads(message))
+        return [("snapshot", dumps(snapshot.to_message(), self.wire, self.encoder))]
+
+    def backlog(self, last_seq: int | None = None) -> list[tuple[str, str]]:
+        if last_seq is not None:
+            return [(t, m) for seq, t, m in self.events if seq > last_seq]
+        events = [(t, m) for _, t, m in self.events]
+        if self.snapshot.size == 0:
+            return events
+        return [("snapshot", dumps(self.snapshot.to_message(), self.wire, self.encoder)), *events]
+
+
+class Connection:
+    def __init__(self, websocket: Any, manager: "Broadcaster", channel: str | None = None) -> None:
+        self.websocket = websocket
+        self.manager = manager
+        self.channel = channel
+        self.queue: deque[tuple[str, str, float]] = deque()
+        self.wakeup = asyncio.Event()
+        self.closing = False
+        self.evicted = False
+        self.sent = 0
+        self.dropped = 0
+        self.detail: Detail = "full"
+        self.writer: asyncio.Task | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "peer": str(getattr(self.websocket, "remote_address", None)),
+            "detail": self.detail,
+            "channel": self.channel,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "pending": len(self.queue),
+            "lag": time.monotonic() - self.queue[0][2] if self.queue else 0.0,
+        }
+
+    def extend(self, messages: list[tuple[str, str]]) -> None:
+        now = time.monotonic()
+        self.queue.extend((msg_type, message, now) for msg_type, message in messages)
+        self.wakeup.set()
+
+    def put(self, msg_type: str, message: str) -> None:
+        # A viewer that falls `send_queue_size` events behind is handled by the
+        # slow-consumer policy: "drop" discards its oldest payload event, "snapshot"
+        # replaces its backlog with a snapshot of its run (the current one without
+        # a channel), "disconnect" closes it.
+        if self.evicted:
+            return
+        if len(self.queue) >= self.manager.send_queue_size:
+            policy = self.manager.slow_consumer
+            if policy == "disconnect":
+                self.evicted = True
+                self.dropped += len(self.queue) + 1
+                self.queue.clear()
+                asyncio.create_task(self.websocket.close())
+                return
+            if policy == "snapshot":
+                self.dropped += len(self.queue)
+                self.queue.clear()
+                self.extend([*self.manager.compacted(self.channel), (msg_type, message)])
+                return
+            for i, (queued_type, _, _) in enumerate(self.queue):
+                if queued_type not in STRUCTURAL_EVENTS:
+                    del self.queue[i]
+                    self.dropped += 1
+                    break
+        self.queue.append((msg_type, message, time.monotonic()))
+        self.wakeup.set()
+
+    async def write(self) -> None:
+        try:
+            while True:
+                if not self.queue:
+                    if self.closing:
+                        return
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                    continue
+                batch = []
+                while self.queue and len(batch) < self.manager.batch_size:
+                    batch.append(self.queue.popleft()[1])
+                await self.websocket.send(frame(batch))
+                self.sent += len(batch)
+        except websockets.exceptions.ConnectionClosed:
+            self.queue.clear()
+
 
 class Broadcaster:
-    def __init__(self, topology: dict[str, Any]) -> None:
-        self.connections: set[Any] = set()
-        self.topology_json = json.dumps(topology)
-        self.replay: list[str] = []
+    def __init__(
+        self,
+        topology: dict[str, Any],
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_ms: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        send_queue_size: int = DEFAULT_SEND_QUEUE_SIZE,
+        slow_consumer: SlowConsumerPolicy = "drop",
+        replay_size: int = DEFAULT_REPLAY_SIZE,
+        payloads: PayloadMode = "eager",
+        blob_store_size: int = DEFAULT_BLOB_STORE_SIZE,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        wire: Wire = "structured",
+        store: TraceStore | None = None,
+        encoder: Encoder | None = None,
+    ) -> None:
+        self.connections: set[Connection] = set()
+        self.encoder = encoder or ENCODER
+        self.topology = topology
+        self.topology_json = self.encoder.raw(topology)
+        self.replays: OrderedDict[str | None, Replay] = OrderedDict()
+        self.replay_size = replay_size
+        self.current: str | None = None
+        self.on_expand: Callable[[str], None] | None = None
+        # Subgraph expansions by seq, resent to viewers resuming from before them.
+        self.expansions: list[tuple[int, str]] = []
+        self.seq = 0
+        self.history: OrderedDict[str, list[tuple[str, str]]] = OrderedDict()
+        self.history_size = history_size
+        self.payloads = payloads
+        self.wire = wire
+        self.store = store
+        self.stored: OrderedDict[str, set[str]] = OrderedDict()
+        self.blobs = BlobStore(blob_store_size)
         self.loop: asyncio.AbstractEventLoop | None = None
         self.server: Server | None = None
+        self.queue: deque[dict[str, Any]] = deque()
+        self.queue_size = queue_size
+        self.batch_ms = batch_ms
+        self.batch_size = batch_size if batch_ms else 1
+        self.send_queue_size = send_queue_size
+        self.slow_consumer = slow_consumer
+        self.detail: Detail = "full" if store is not None else "none"
+        self.queued = 0
+        self.dropped = 0
+        self.idle = False
+        self.closing = False
+        self.wakeup = asyncio.Event()
+        self.drainer: asyncio.Task | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "pending": len(self.queue),
+            "detail": self.detail,
+            "runs": list(self.history),
+            "connections": [c.stats for c in self.connections],
+        }
+
+    def connect(
+        self,
+        websocket: Any,
+        last_seq: int | None = None,
+        run_id: str | None = None,
+        stored: list[tuple[str, str]] | None = None,
+    ) -> Connection:
+        # `stored` holds the events of a run read back from the store, if any.
+        if run_id is not None and run_id in self.history:
+            connection = Connection(websocket, self, channel=run_id)
+            connection.extend([("graph", self.topology_json), *self.history[run_id]])
+        elif run_id is not None and run_id in self.replays:
+            connection = Connection(websocket, self, channel=run_id)
+            connection.extend([("graph", self.topology_json), *self.replays[run_id].backlog()])
+        elif run_id is not None and stored:
+            connection = Connection(websocket, self, channel=run_id)
+            connection.extend([("graph", self.topology_json), *stored])
+        elif self.resumable(last_seq):
+            connection = Connection(websocket, self)
+            missed = [("subgraph", message) for seq, message in self.expansions if seq > last_seq]
+            connection.extend([*missed, *self.backlog(last_seq)])
+        else:
+            connection = Connection(websocket, self)
+            connection.extend([("graph", self.topology_json), *self.backlog()])
+        connection.writer = asyncio.create_task(connection.write())
+        self.connections.add(connection)
+        self.refresh_detail()
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        self.connections.discard(connection)
+        self.refresh_detail()
+        if connection.writer is not None and not connection.closing:
+            connection.writer.cancel()
 
     async def handler(self, websocket: Any) -> None:
-        self.connections.add(websocket)
+        query = parse_qs(urlparse(websocket.request.path).query)
+        try:
+            last_seq = int(query["last_seq"][0])
+        except (KeyError, ValueError):
+            last_seq = None
+        run_id = query.get("run_id", [None])[0]
+        stored = None
+        in_memory = run_id in self.history or run_id in self.replays
+        if self.store is not None and run_id is not None and not in_memory:
+            # Reading a long run back takes a while; other viewers keep being served.
+            stored = await asyncio.get_running_loop().run_in_executor(None, self.store.events, run_id)
+        connection = self.connect(websocket, last_seq, run_id, stored)
         try:
-            await websocket.send(self.topology_json)
-            for message in self.replay:
-                await websocket.send(message)
-            async for _message in websocket:
-                pass
+            async for raw in websocket:
+                self.receive(connection, raw)
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
-            self.connections.discard(websocket)
+            self.disconnect(connection)
 
-    def record(self, message: str) -> None:
-        msg_type = json.loads(message).get("type")
+    def refresh_detail(self) -> None:
+        # Read by the tracer on the graph's thread, so it is kept as a plain
+        # attribute instead of being derived from the connection set on demand.
+        # Stored runs are served later to viewers that were not watching, so with
+        # a store every run is traced in full.
+        if self.store is not None:
+            self.detail = "full"
+            return
+        self.detail = max(
+            (c.detail for c in self.connections), key=DETAIL_LEVELS.index, default="none"
+        )
+
+    def receive(self, connection: Connection, raw: str | bytes) -> None:
+        try:
+            request = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(request, dict):
+            return
+        if request.get("type") == "subscribe" and request.get("detail") in DETAIL_LEVELS:
+            connection.detail = request["detail"]
+            self.refresh_detail()
+        elif request.get("type") == "expand" and isinstance(request.get("id"), str):
+            if self.on_expand is not None:
+                self.loop.run_in_executor(None, self.on_expand, request["id"])
+        elif request.get("type") == "fetch":
+            blob_id = request.get("id")
+            body = self.blobs.get(blob_id) if isinstance(blob_id, str) else None
+            connection.put("blob", self.encoder.raw({"type": "blob", "id": blob_id, "body": body}))
+
+    def expand_topology(self, message: dict[str, Any]) -> None:
+        nodes = self.topology["nodes"]
+        *parents, last = message["id"].split(":")
+        for node_id in parents:
+            nodes = next(n for n in nodes if n["id"] == node_id)["subgraph"]["nodes"]
+        node = next(n for n in nodes if n["id"] == last)
+        node.pop("collapsed", None)
+        node["subgraph"] = message["subgraph"]
+        self.topology_json = self.encoder.raw(self.topology)
+
+    def externalize(self, message: dict[str, Any]) -> None:
+        blobs, sizes = {}, {}
+        for field in PAYLOAD_FIELDS:
+            if body := message.get(field):
+                blobs[field] = self.blobs.put(body)
+                sizes[field] = len(body)
+                message[field] = None
+        if blobs:
+            message["blobs"] = {**(message.get("blobs") or {}), **blobs}
+            message["sizes"] = {**(message.get("sizes") or {}), **sizes}
+
+    def intern(self, message: dict[str, Any]) -> None:
+        # The tracer has already split the payload into content ids (see
+        # Interner). Bodies go out once per run in an "intern" event ahead of
+        # the first node_output referencing them; anything a viewer missed (a
+        # late join after compaction) is served by "fetch" like a lazy payload.
+        bodies = message.pop("interned", None) or {}
+        channel = message.get("channel")
+        live = self.replays.get(channel)
+        sent = live.interned if live is not None else set()
+        if fresh := {k: v for k, v in bodies.items() if k not in sent}:
+            sent.update(fresh)
+            self.seq += 1
+            event = {"type": "intern", "seq": self.seq, "channel": channel, "messages": fresh}
+            self.broadcast("intern", self.encoder.raw(event), channel, event)
+
+    @property
+    def replay(self) -> deque[tuple[int, str, str]]:
+        live = self.replays.get(self.current)
+        return live.events if live is not None else deque()
+
+    def resumable(self, last_seq: int | None) -> bool:
+        live = self.replays.get(self.current)
+        if last_seq is None or live is None or not live.events:
+            return False
+        return live.resumable(last_seq) and last_seq <= self.seq
+
+    def compacted(self, channel: str | None = None) -> list[tuple[str, str]]:
+        live = self.replays.get(self.current if channel is None else channel)
+        return live.compacted() if live is not None else []
+
+    def backlog(self, last_seq: int | None = None) -> list[tuple[str, str]]:
+        live = self.replays.get(self.current)
+        return live.backlog(last_seq) if live is not None else []
+
+    def archive(self, run_id: str, events: list[tuple[str, str]]) -> None:
+        self.history[run_id] = events
+        self.history.move_to_end(run_id)
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+
+    def record(
+        self,
+        seq: int,
+        msg_type: str,
+        message: str,
+        channel: str | None = None,
+        source: dict[str, Any] | None = None,
+    ) -> None:
+        if self.store is not None and channel is not None and msg_type in STORED_EVENTS:
+            self.persist(msg_type, message, channel, source)
+        if msg_type == "subgraph":
+            self.expansions.append((seq, message))
+            return
+        if msg_type in ("run_end", "error"):
+            live = self.replays.pop(channel, None)
+            if live is not None and channel is not None and self.history_size:
+                self.archive(channel, [*live.backlog(), (msg_type, message)])
+            return
         if msg_type == "run_start":
-            self.replay = [message]
-        elif msg_type in ("run_end", "error"):
-            self.replay = []
-        elif msg_type in ("edge_active", "node_output", "node_step"):
-            self.replay.append(message)
-
-    async def broadcast(self, message: str) -> None:
-        if self.connections:
-            await asyncio.gather(
-                *[c.send(message) for c in self.connections],
-                return_exceptions=True,
-            )
+            self.replays.pop(channel, None)
+            self.current = channel
+        elif msg_type not in ("edge_active", "node_output", "node_step", "intern"):
+            return
+        live = self.replays.get(channel)
+        if live is None:
+            live = self.replays[channel] = Replay(self.topology, self.replay_size, self.blobs, self.wire, self.encoder)
+            while len(self.replays) > MAX_LIVE_RUNS:
+                self.replays.popitem(last=False)
+        live.record(seq, msg_type, message, source)
+
+    def persist(self, msg_type: str, message: str, channel: str, source: dict[str, Any] | None) -> None:
+        # Every blob an event references (externalized and truncated payloads,
+        # /blobs/ URLs of images and long strings) is stored ahead of it as a
+        # "blob" reply, once per run, so a stored run replays without the
+        # in-memory blob store.
+        source = source or {}
+        ids = [*(source.get("blobs") or {}).values()]
+        ids.extend(t["id"] for t in (source.get("truncated") or {}).values())
+        if "/blobs/" in message:
+            ids.extend(BLOB_URL.findall(message))
+        if ids:
+            stored = self.stored.get(channel)
+            if stored is None:
+                stored = self.stored[channel] = set()
+                while len(self.stored) > MAX_LIVE_RUNS:
+                    self.stored.popitem(last=False)
+            for blob_id in ids:
+                if blob_id not in stored and (body := self.blobs.get(blob_id)) is not None:
+                    stored.add(blob_id)
+                    self.store.append(channel, "blob", self.encoder.raw({"type": "blob", "id": blob_id, "body": body}))
+        self.store.append(channel, msg_type, message, source)
+        if msg_type in ("run_end", "error"):
+            self.stored.pop(channel, None)
+
+    def publish(self, message: dict[str, Any]) -> None:
+        # Called from the agent's thread and never waits on the sockets. Once the
+        # queue holds `queue_size` events, payload events are dropped (and counted)
+        # while structural events are always kept, so the graph stays consistent.
+        # After shutdown (a finished non-persistent run) nothing drains the queue
+        # anymore: events are still queued, up to `queue_size`, but the loop that
+        # is gone is not woken.
+        full = len(self.queue) >= self.queue_size
+        if full and (self.closing or message["type"] not in STRUCTURAL_EVENTS):
+            self.dropped += 1
+            return
+        self.queue.append(message)
+        self.queued += 1
+        loop = self.loop
+        if loop is None or self.closing:
+            return
+        if self.idle:
+            self.idle = False
+            loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def drain(self) -> None:
+        while True:
+            if self.queue and self.batch_ms and not self.closing:
+                await asyncio.sleep(self.batch_ms / 1000)
+            while self.queue:
+                for _ in range(min(self.batch_size, len(self.queue))):
+                    message = self.queue.popleft()
+                    # One event that cannot be encoded is dropped (and counted);
+                    # it must not end the drain for every viewer.
+                    try:
+                        self.send(message)
+                    except Exception as e:
+                        self.dropped += 1
+                        logger.warning("Dropped %s event: %r", message.get("type"), e)
+                if self.store is not None:
+                    self.store.flush()
+                await asyncio.sleep(0)
+            if self.closing:
+                return
+            self.idle = True
+            if self.queue:
+                self.idle = False
+                continue
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+    def send(self, message: dict[str, Any]) -> None:
+        if self.payloads == "interned" and message["type"] == "node_output":
+            self.intern(message)
+        self.seq = message["seq"] = self.seq + 1
+        if self.payloads == "lazy" and message["type"] == "node_output":
+            self.externalize(message)
+        elif message["type"] == "subgraph":
+            self.expand_topology(message)
+        self.broadcast(message["type"], dumps(message, self.wire, self.encoder), message.get("channel"), message)
+
+    def broadcast(
+        self,
+        msg_type: str,
+        message: str,
+        channel: str | None = None,
+        source: dict[str, Any] | None = None,
+    ) -> None:
+        for connection in self.connections:
+            if connection.channel is None or connection.channel == channel:
+                connection.put(msg_type, message)
+        self.record(self.seq, msg_type, message, channel, source)
 
     async def shutdown(self) -> None:
         loop = self.loop
@@ -49,15 +502,27 @@ class Broadcaster:
             return
 
         async def _shutdown() -> None:
+            if self.drainer is not None:
+                self.closing = True
+                self.wakeup.set()
+                await self.drainer
             if self.connections:
+                for connection in self.connections:
+                    connection.closing = True
+                    connection.wakeup.set()
+                await asyncio.wait(
+                    [c.writer for c in self.connections], timeout=SHUTDOWN_TIMEOUT
+                )
                 await asyncio.gather(
-                    *[c.close() for c in list(self.connections)],
+                    *[c.websocket.close() for c in list(self.connections)],
                     return_exceptions=True,
                 )
                 self.connections.clear()
             if self.server is not None:
                 self.server.close()
                 await self.server.wait_closed()
+            if self.store is not None:
+                self.store.close()
 
         await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_shutdown(), loop))
         self.loop = None
@@ -0,0 +1,147 @@
+import bisect
+from itertools import accumulate
+from typing import Any
+
+from .blobs import BlobStore
+from .encoding import ENCODER, PAYLOAD_FIELDS, Encoder
+
+DEFAULT_FIELD_BUDGET = 256 * 1024
+DEFAULT_EVENT_BUDGET = 1024 * 1024
+MIN_KEPT = 256
+MIN_IMAGE = 1024
+
+
+def _truncated(text: str, keep: int) -> str:
+    tail = keep // 3
+    head = keep - tail
+    return f"{text[:head]}\n… [{len(text) - keep} chars truncated] …\n{text[len(text) - tail:]}"
+
+
+class Budget:
+    # Byte budgets for node_output payloads. Base64 images are always moved to
+    # the blob store and replaced by their /blobs/ URL; a field over
+    # `field_bytes` keeps the head and tail of its longest strings, with the
+    # full body in the blob store; an event still over `event_bytes` has its
+    # largest fields externalized like lazy payloads. 0 disables a budget.
+    def __init__(
+        self,
+        blobs: BlobStore,
+        field_bytes: int = DEFAULT_FIELD_BUDGET,
+        event_bytes: int = DEFAULT_EVENT_BUDGET,
+        encoder: Encoder | None = None,
+    ) -> None:
+        self.blobs = blobs
+        self.encoder = encoder or ENCODER
+        self.field_bytes = field_bytes
+        self.event_bytes = event_bytes
+
+    def fits(self, value: Any) -> bool:
+        # Whether a value sent outside the payload fields (a state patch) stays
+        # within budget as is: small enough and free of base64 images.
+        limits = [b for b in (self.field_bytes, self.event_bytes) if b]
+        if not limits:
+            return True
+        text = self.encoder.raw(value)
+        return "base64" not in text and len(text.encode()) <= min(limits)
+
+    def shrink(self, body: str) -> str:
+        # A single body (an interned message) within the field budget: images
+        # moved to the blob store, the head and tail of long strings kept.
+        if "base64" in body:
+            body = self._images(body)
+        size = len(body.encode())
+        if not self.field_bytes or size <= self.field_bytes:
+            return body
+        return self._truncate(body, size)
+
+    def fit(self, message: dict[str, Any]) -> dict[str, Any]:
+        sizes: dict[str, int] = {}
+        for field in PAYLOAD_FIELDS:
+            if not isinstance(body := message.get(field), str):
+                continue
+            if "base64" in body:
+                message[field] = body = self._images(body)
+            size = len(body.encode())
+            if self.field_bytes and size > self.field_bytes:
+                truncated = self._truncate(body, size)
+                if len(truncated.encode()) > self.field_bytes:
+                    # Mostly structure (many short items): nothing to cut.
+                    self._externalize(message, field, size)
+                    continue
+                message.setdefault("truncated", {})[field] = {"id": self.blobs.put(body), "size": size}
+                message[field] = truncated
+                size = len(truncated.encode())
+            sizes[field] = size
+        total = sum(sizes.values())
+        for field in sorted(sizes, key=sizes.__getitem__, reverse=True):
+            if not self.event_bytes or total <= self.event_bytes:
+                break
+            self._externalize(message, field, sizes[field])
+            total -= sizes[field]
+        return message
+
+    def _externalize(self, message: dict[str, Any], field: str, size: int) -> None:
+        message.setdefault("blobs", {})[field] = self.blobs.put(message[field])
+        message.setdefault("sizes", {})[field] = size
+        message[field] = None
+
+    def _images(self, body: str) -> str:
+        return self.encoder.raw(self._walk(self.encoder.loads(body)))
+
+    def _walk(self, value: Any) -> Any:
+        if isinstance(value, str):
+            if len(value) >= MIN_IMAGE and value.startswith("data:") and ";base64," in value[:256]:
+                return f"/blobs/{self.blobs.put(value)}"
+            return value
+        if isinstance(value, list):
+            return [self._walk(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        # Standard and Anthropic-style image blocks carry bare base64 `data`.
+        data = value.get("data")
+        if (
+            isinstance(data, str)
+            and len(data) >= MIN_IMAGE
+            and "base64" in (value.get("source_type"), value.get("type"))
+        ):
+            mime = value.get("mime_type") or value.get("media_type") or "application/octet-stream"
+            return {**value, "data": f"/blobs/{self.blobs.put(f'data:{mime};base64,{data}')}"}
+        return {key: self._walk(item) for key, item in value.items()}
+
+    def _truncate(self, body: str, size: int) -> str:
+        # Every string longer than a common cap keeps its head and tail; the cap
+        # is the largest one that brings the field within budget.
+        value = self.encoder.loads(body)
+        lengths: list[int] = []
+        self._lengths(value, lengths)
+        lengths.sort()
+        prefix = [0, *accumulate(lengths)]
+        room = self.field_bytes - (size - prefix[-1])
+        low, high = MIN_KEPT, lengths[-1] if lengths else MIN_KEPT
+        while low < high:
+            cap = (low + high + 1) // 2
+            over = bisect.bisect_right(lengths, cap)
+            if prefix[over] + (cap + 40) * (len(lengths) - over) <= room:
+                low = cap
+            else:
+                high = cap - 1
+        return self.encoder.raw(self._shorten(value, low))
+
+    def _lengths(self, value: Any, out: list[int]) -> None:
+        if isinstance(value, str):
+            out.append(len(value))
+        elif isinstance(value, list):
+            for item in value:
+                self._lengths(item, out)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self._lengths(item, out)
+
+    def _shorten(self, value: Any, cap: int) -> Any:
+        if isinstance(value, str):
+            return _truncated(value, cap) if len(value) > cap else value
+        if isinstance(value, list):
+            return [self._shorten(item, cap) for item in value]
+        if isinstance(value, dict):
+            return {key: self._shorten(item, cap) for key, item in value.items()}
+        return value
@@ -0,0 +1,286 @@
+import dataclasses
+import datetime
+import enum
+import json
+import os
+import re
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from functools import partial
+from pathlib import PurePath
+from typing import Any, Literal
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PAYLOAD_FIELDS = ("input", "output", "state")
+DEFAULT_MAX_DEPTH = 32
+DEFAULT_MAX_STRING = 1024 * 1024
+DEFAULT_MAX_ITEMS = 10_000
+MAX_MESSAGES = 4096
+
+Wire = Literal["structured", "string"]
+Backend = Literal["auto", "orjson", "json"]
+
+Splice = Callable[[str], Any]
+
+_SEQUENCES = (list, tuple, set, frozenset)
+
+
+def message_key(message: Any) -> tuple | None:
+    # Stable id plus a hash of the content and tool calls, the parts of a
+    # message that change when it is edited.
+    if not isinstance(message, BaseMessage) or not message.id:
+        return None
+    fields = message.__dict__
+    content = fields["content"] if isinstance(fields["content"], str) else repr(fields["content"])
+    tool_calls = fields.get("tool_calls")
+    return message.id, hash((message.type, content, repr(tool_calls) if tool_calls else None))
+
+
+class Encoder:
+    # Turns tracer payloads (graph state, run inputs/outputs) into JSON. Values
+    # are first reduced to plain data: models and dataclasses become their
+    # public fields, other objects their public attributes, and depth, string
+    # length and collection size are capped so huge or cyclic state stays bounded.
+    def __init__(
+        self,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        max_string: int = DEFAULT_MAX_STRING,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        backend: Backend = "auto",
+    ) -> None:
+        # orjson >= 3.9 is needed for splicing pre-encoded payloads (Fragment).
+        available = getattr(orjson, "Fragment", None) is not None
+        if backend == "orjson" and not available:
+            raise ImportError("the orjson backend requires orjson>=3.9")
+        self.max_depth = max_depth
+        self.max_string = max_string
+        self.max_items = max_items
+        self.backend = "orjson" if backend == "auto" and available else backend
+        self.messages: OrderedDict[tuple, Any] = OrderedDict()
+        self.seen: dict[int, tuple] = {}
+        self.texts: dict[int, tuple[Any, str]] = {}
+        # Reduced data is acyclic by construction, so the stdlib encoder can skip
+        # its circular-reference bookkeeping.
+        self.json = json.JSONEncoder(ensure_ascii=False, check_circular=False)
+
+    def plain(self, value: Any) -> Any:
+        return self._plain(value, 0, set(), None)
+
+    def _plain(self, value: Any, depth: int, path: set[int], splice: Splice | None) -> Any:
+        kind = type(value)
+        if kind is str:
+            if len(value) > self.max_string:
+                return f"{value[:self.max_string]}… ({len(value) - self.max_string} more chars)"
+            return value
+        if kind in (int, float, bool) or value is None:
+            return value
+        if depth >= self.max_depth:
+            return f"<{kind.__name__}>"
+        if id(value) in path:
+            return f"<cycle: {kind.__name__}>"
+        if kind is dict or isinstance(value, Mapping):
+            return self._fields(value, value.items(), len(value), False, depth, path, splice)
+        if kind is list or isinstance(value, _SEQUENCES):
+            return self._items(value, depth, path, splice)
+        if isinstance(value, BaseMessage):
+            return self._message(value, depth, path, splice)
+        if isinstance(value, BaseModel):
+            return self._fields(value, value.__dict__.items(), len(value.__dict__), True, depth, path, splice)
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            fields = dataclasses.fields(value)
+            items = ((f.name, getattr(value, f.name)) for f in fields)
+            return self._fields(value, items, len(fields), True, depth, path, splice)
+        return self._other(value, depth, path, splice)
+
+    def _message(self, value: BaseMessage, depth: int, path: set[int], splice: Splice | None) -> Any:
+        # State carries the whole conversation on every step, so reduced
+        # messages are memoized in a bounded LRU. The same message object seen
+        # again unedited returns its reduction straight away, without hashing
+        # its content or touching the LRU.
+        fields = value.__dict__
+        seen = self.seen.get(id(value))
+        if (
+            seen
+            and seen[0] is value
+            and seen[1] is fields["content"]
+            and seen[2] is fields.get("tool_calls")
+            and seen[3] == depth
+        ):
+            plain = seen[4]
+        elif (key := message_key(value)) is None:
+            return self._fields(value, fields.items(), len(fields), True, depth, path, splice)
+        else:
+            key = (*key, depth)
+            if (plain := self.messages.get(key)) is None:
+                plain = self.messages[key] = self._fields(value, fields.items(), len(fields), True, depth, path, None)
+                while len(self.messages) > MAX_MESSAGES:
+                    try:
+                        self.messages.popitem(last=False)
+                    except KeyError:
+                        break
+            else:
+                try:
+                    self.messages.move_to_end(key)
+                except KeyError:
+                    pass
+            if len(self.seen) >= MAX_MESSAGES:
+                self.seen.clear()
+            self.seen[id(value)] = (value, fields["content"], fields.get("tool_calls"), depth, plain)
+        if splice is None:
+            return plain
+        # `dumps` splices in the memoized encoding instead of encoding it again.
+        text = self.texts.get(id(plain))
+        if text is None or text[0] is not plain:
+            if len(self.texts) >= MAX_MESSAGES:
+                self.texts.clear()
+            text = self.texts[id(plain)] = (plain, self.raw(plain))
+        return splice(text[1])
+
+    def _fields(
+        self, owner, items, size: int, public: bool, depth: int, path: set[int], splice: Splice | None
+    ) -> dict[str, Any]:
+        path.add(id(owner))
+        if not public and size <= self.max_items:
+            # Fast path for plain mappings within limits: no per-item bookkeeping.
+            plain = self._plain
+            out = {k if type(k) is str else str(k): plain(v, depth + 1, path, splice) for k, v in items}
+            path.discard(id(owner))
+            return out
+        out: dict[str, Any] = {}
+        for i, (key, item) in enumerate(items):
+            if i == self.max_items:
+                out["…"] = f"{size - i} more items"
+                break
+            if type(key) is not str:
+                key = str(key)
+            if public and key.startswith("_"):
+                continue
+            out[key] = self._plain(item, depth + 1, path, splice)
+        path.discard(id(owner))
+        return out
+
+    def _items(self, value, depth: int, path: set[int], splice: Splice | None) -> list[Any]:
+        path.add(id(value))
+        if len(value) <= self.max_items:
+            plain = self._plain
+            out = [plain(item, depth + 1, path, splice) for item in value]
+            path.discard(id(value))
+            return out
+        out = []
+        for i, item in enumerate(value):
+            if i == self.max_items:
+                out.append(f"… ({len(value) - i} more items)")
+                break
+            out.append(self._plain(item, depth + 1, path, splice))
+        path.discard(id(value))
+        return out
+
+    def _other(self, value: Any, depth: int, path: set[int], splice: Splice | None) -> Any:
+        if isinstance(value, enum.Enum):
+            return self._plain(value.value, depth, path, splice)
+        if isinstance(value, str):
+            return self._plain(str(value), depth, path, splice)
+        if isinstance(value, bool):
+            return bool(value)
+        if isinstance(value, int):
+            return int(value)
+        if isinstance(value, float):
+            return float(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f"<{len(value)} bytes>"
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (uuid.UUID, PurePath, datetime.timedelta)):
+            return str(value)
+        # Arbitrary objects (clients, handles) only contribute public attributes.
+        attrs = getattr(value, "__dict__", None)
+        if isinstance(attrs, dict):
+            return self._fields(value, attrs.items(), len(attrs), True, depth, path, splice)
+        return f"<{type(value).__name__}>"
+
+    def raw(self, value: Any) -> str:
+        # Encodes data that is already plain.
+        if self.backend == "orjson":
+            try:
+                return orjson.dumps(value).decode()
+            except TypeError:
+                # e.g. integers beyond 64 bits, which orjson refuses.
+                pass
+        return self.json.encode(value)
+
+    def dumps(self, value: Any) -> str:
+        # Reduces and encodes in one go, splicing in memoized message encodings.
+        if self.backend == "orjson":
+            try:
+                return orjson.dumps(self._plain(value, 0, set(), orjson.Fragment)).decode()
+            except TypeError:
+                pass
+        raw: list[str] = []
+        return _substitute(self.json.encode(self._plain(value, 0, set(), partial(_placeholder, raw))), raw)
+
+    def loads(self, text: str) -> Any:
+        return orjson.loads(text) if self.backend == "orjson" else json.loads(text)
+
+
+ENCODER = Encoder()
+
+
+# Payload fields arrive as JSON text encoded once by the tracer. In the
+# structured wire shape they are spliced into the envelope as JSON values
+# instead of being escaped again as strings: natively with orjson fragments,
+# otherwise by substituting unique placeholders after encoding.
+_NONCE = os.urandom(8).hex()
+_PLACEHOLDER = re.compile(rf'"\\u0000{_NONCE}:(\d+)"')
+
+
+def _placeholder(raw: list[str], body: str) -> str:
+    raw.append(body)
+    return f"\x00{_NONCE}:{len(raw) - 1}"
+
+
+def _substitute(text: str, raw: list[str]) -> str:
+    if not raw:
+        return text
+    return _PLACEHOLDER.sub(lambda m: raw[int(m[1])], text)
+
+
+def _lift(message: dict[str, Any], splice: Splice) -> dict[str, Any]:
+    lifted = message
+    for field in PAYLOAD_FIELDS:
+        if isinstance(body := message.get(field), str):
+            if lifted is message:
+                lifted = dict(message)
+            lifted[field] = splice(body)
+    return lifted
+
+
+def _structured(message: dict[str, Any], splice: Splice) -> dict[str, Any]:
+    lifted = _lift(message, splice)
+    if message.get("type") == "snapshot":
+        lifted = {**lifted, "outputs": [_lift(o, splice) for o in message.get("outputs", [])]}
+        if isinstance(state := message.get("state"), dict) and isinstance(state.get("value"), str):
+            lifted["state"] = {**state, "value": splice(state["value"])}
+    return lifted
+
+
+def dumps(message: dict[str, Any], wire: Wire = "structured", encoder: Encoder | None = None) -> str:
+    encoder = encoder or ENCODER
+    if wire == "string":
+        return encoder.raw(message)
+    if encoder.backend == "orjson":
+        try:
+            return orjson.dumps(_structured(message, orjson.Fragment)).decode()
+        except TypeError:
+            # Something orjson refuses outside the payloads (a huge integer in
+            # a state patch): the placeholder path below handles it.
+            pass
+    raw: list[str] = []
+    return _substitute(encoder.json.encode(_structured(message, partial(_placeholder, raw))), raw)
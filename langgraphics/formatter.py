@@ -1,29 +1,30 @@
-import json
-import pathlib
-from collections import deque
+from collections import OrderedDict, deque
 from typing import Any
 
-from langchain_core.messages import messages_to_dict
+from langchain_core.messages import message_to_dict
 from langchain_core.tracers.schemas import Run
 
+from .encoding import ENCODER, Encoder, message_key
+from .pricing import prices
+
+MAX_NORMALIZED = 4096
+
 
 class Formatter:
-    models: dict = None
+    normalized: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
 
     @classmethod
     def costs(cls, model: str, cached: int, total: int):
-        if cls.models is None:
-            datadir_path = pathlib.Path(__file__).parent / "metadata"
-            with open(datadir_path / "models.json", encoding="utf-8") as fp:
-                cls.models = json.load(fp)
-        metadata = cls.models.get(model.lower(), {})
-        cost = metadata.get("cost", {"cache_read": 0, "output": 0})
-        fmt = lambda x: "0.0" if x == 0 else f"{x:.8f}".rstrip("0").rstrip(".")
+        cost = prices().lookup(model) or {"cache_read": 0, "output": 0}
         return {
-            "cached": fmt((cached / 1e6) * cost["cache_read"]),
-            "total": fmt((total / 1e6) * cost["output"]),
+            "cached": cls.price((cached / 1e6) * cost["cache_read"]),
+            "total": cls.price((total / 1e6) * cost["output"]),
         }
 
+    @staticmethod
+    def price(amount: float) -> str:
+        return "0.0" if amount == 0 else f"{amount:.8f}".rstrip("0").rstrip(".")
+
     @staticmethod
     def latency(seconds: float) -> str:
         if seconds >= 60:
@@ -39,12 +40,9 @@ class Formatter:
 
     @staticmethod
     def serialize(func):
-        def wrapper(*args, **kwargs):
-            return json.dumps(
-                ensure_ascii=False,
-                obj=func(*args, **kwargs),
-                default=lambda x: x.__dict__,
-            )
+        def wrapper(*args, encoder: Encoder = ENCODER, plain: bool = False, **kwargs):
+            value = func(*args, **kwargs)
+            return encoder.plain(value) if plain else encoder.dumps(value)
 
         return wrapper
 
@@ -63,11 +61,52 @@ class Formatter:
 
         return next(bfs(), None)
 
+    @staticmethod
+    def collect(data: Any, keys: tuple[str, ...]) -> dict[str, Any]:
+        # One BFS for several keys: the same first matches as `extract` per key.
+        found: dict[str, Any] = {}
+        queue = deque([data])
+        while queue and len(found) < len(keys):
+            current = queue.popleft()
+            if isinstance(current, dict):
+                for key in keys:
+                    if key not in found and key in current:
+                        found[key] = current[key]
+                queue.extend(current.values())
+            elif isinstance(current, (list, tuple)):
+                queue.extend(current)
+        return found
+
+    @classmethod
+    def usage(cls, outputs: Any) -> tuple[int, int]:
+        # Fast paths for OpenAI-style `llm_output.token_usage` and LangChain's
+        # standard `usage_metadata`; anything else gets a single generic walk.
+        if isinstance(outputs, dict):
+            llm_output = outputs.get("llm_output")
+            token_usage = llm_output.get("token_usage") if isinstance(llm_output, dict) else None
+            if isinstance(token_usage, dict) and "total_tokens" in token_usage:
+                details = token_usage.get("prompt_tokens_details")
+                if isinstance(details, dict) and "cached_tokens" in details:
+                    return token_usage["total_tokens"] or 0, details["cached_tokens"] or 0
+            else:
+                try:
+                    usage = outputs["generations"][0][0]["message"]["kwargs"]["usage_metadata"]
+                except (KeyError, IndexError, TypeError):
+                    usage = None
+                if isinstance(usage, dict) and "total_tokens" in usage:
+                    details = usage.get("input_token_details") or {}
+                    return usage["total_tokens"] or 0, details.get("cache_read") or 0
+        found = cls.collect(outputs, ("total_tokens", "cached_tokens"))
+        return found.get("total_tokens") or 0, found.get("cached_tokens") or 0
+
     @classmethod
     def metrics(cls, run: Run) -> dict[str, Any]:
-        model_name = cls.extract(run.extra, "ls_model_name") or "unknown"
-        total_tokens = cls.extract(run.outputs, "total_tokens") or 0
-        cached_tokens = cls.extract(run.outputs, "cached_tokens") or 0
+        metadata = run.extra.get("metadata") if isinstance(run.extra, dict) else None
+        if isinstance(metadata, dict) and "ls_model_name" in metadata:
+            model_name = metadata["ls_model_name"] or "unknown"
+        else:
+            model_name = cls.extract(run.extra, "ls_model_name") or "unknown"
+        total_tokens, cached_tokens = cls.usage(run.outputs)
         return {
             "latency": cls.latency((run.end_time - run.start_time).total_seconds()),
             "costs": cls.costs(model_name, cached_tokens, total_tokens),
@@ -96,22 +135,47 @@ class Formatter:
             content = content[-1].get("text", "")
         return {"role": role, "content": str(content)}
 
+    @classmethod
+    def normalize(cls, messages: list[Any]) -> list[dict[str, Any]]:
+        # Every run sees the whole conversation, so normalized messages are
+        # memoized in a bounded LRU and only new or edited ones are converted.
+        result = []
+        for message in messages:
+            if (key := message_key(message)) is None:
+                result.append(cls.norm(message if isinstance(message, dict) else message_to_dict(message)))
+                continue
+            # Single OrderedDict operations are atomic; a racing eviction only
+            # costs a recomputation, so the hot path takes no lock.
+            if (normalized := cls.normalized.get(key)) is None:
+                normalized = cls.normalized[key] = cls.norm(message_to_dict(message))
+                while len(cls.normalized) > MAX_NORMALIZED:
+                    try:
+                        cls.normalized.popitem(last=False)
+                    except KeyError:
+                        break
+            else:
+                try:
+                    cls.normalized.move_to_end(key)
+                except KeyError:
+                    pass
+            result.append(normalized)
+        return result
+
     @classmethod
     @serialize
     def inputs(cls, run: Run) -> list[dict[str, Any]]:
         data: dict[str, Any] = run.inputs or {}
         if run.run_type == "chat_model":
             try:
-                messages = messages_to_dict(data["messages"])
-            except AttributeError:
-                messages = data["messages"][0]
+                messages = data["messages"]
             except KeyError:
                 return [data]
-            return list(map(cls.norm, messages))
+            if messages and isinstance(messages[0], list):
+                messages = messages[0]
+            return cls.normalize(messages)
         elif run.run_type == "chain":
             default = [cls.norm(data)] if "tool_call" in data else [data] if data else []
-            messages = messages_to_dict(data.get("messages", []))
-            return list(map(cls.norm, messages)) or default
+            return cls.normalize(data.get("messages", [])) or default
         elif run.run_type == "tool":
             return [{"role": "input", "content": str(data.get("input", ""))}]
         elif run.run_type == "retriever":
@@ -132,12 +196,10 @@ class Formatter:
             return [cls.norm(cls.extract(data, "message"))]
         elif run.run_type == "chain":
             try:
-                messages = messages_to_dict(data["messages"].value)
-            except AttributeError:
-                messages = messages_to_dict(data["messages"])
+                messages = data["messages"]
             except KeyError:
                 return [data]
-            return list(map(cls.norm, messages))
+            return cls.normalize(getattr(messages, "value", messages))
         elif run.run_type == "llm":
             return [{"role": "text", "content": data["generations"][0]["text"]}]
         elif run.run_type == "tool":
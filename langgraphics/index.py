@@ -0,0 +1,73 @@
+from array import array
+from typing import Any
+
+
+class TopologyIndex:
+    # Never changed once built: `extend` returns a new index, so a viewport
+    # swaps it in with one assignment and executions reading it without a lock
+    # always see matching names, flags and adjacency arrays.
+    def __init__(self, edge_lookup: dict[tuple[str, str], str], base: "TopologyIndex | None" = None) -> None:
+        self.names: list[str] = list(base.names) if base else []
+        self.ids: dict[str, int] = dict(base.ids) if base else {}
+        self.edge_ids: list[str] = list(base.edge_ids) if base else []
+        self.sources = array("i", base.sources if base else [])
+        self.targets = array("i", base.targets if base else [])
+        self.start_nodes: list[int] = list(base.start_nodes) if base else []
+        self.top_level: list[bool] = list(base.top_level) if base else []
+        node_names = set(base.node_names) if base else set()
+        known = len(self.names)
+        for (source, target), edge_id in edge_lookup.items():
+            self.sources.append(self._intern(source))
+            self.targets.append(self._intern(target))
+            self.edge_ids.append(edge_id)
+        for node in range(known, len(self.names)):
+            name = self.names[node]
+            if name == "__start__" or name.endswith(":__start__"):
+                self.start_nodes.append(node)
+            top = ":" not in name and name not in ("__start__", "__end__")
+            self.top_level.append(top)
+            if top:
+                node_names.add(name)
+        self.node_names = frozenset(node_names)
+        self.pred_offsets, self.pred_edges = self._csr(self.targets)
+        self.succ_offsets, self.succ_edges = self._csr(self.sources)
+        self.incoming = frozenset(self.names[t] for t in self.targets)
+
+    def extend(self, edge_lookup: dict[tuple[str, str], str]) -> "TopologyIndex":
+        # Appends edges (e.g. of a lazily expanded subgraph); existing node and
+        # edge numbers never change, so executions only need to grow.
+        return TopologyIndex(edge_lookup, self)
+
+    def _intern(self, name: str) -> int:
+        if (node := self.ids.get(name)) is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def _csr(self, keys: array) -> tuple[array, array]:
+        # Edges grouped by node, keeping edge_lookup order within each group.
+        offsets = array("i", [0] * (len(self.names) + 1))
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(len(self.names)):
+            offsets[i + 1] += offsets[i]
+        fill = offsets[:-1]
+        edges = array("i", [0] * len(keys))
+        for edge, key in enumerate(keys):
+            edges[fill[key]] = edge
+            fill[key] += 1
+        return offsets, edges
+
+    def predecessors(self, node: int) -> array:
+        return self.pred_edges[self.pred_offsets[node]:self.pred_offsets[node + 1]]
+
+    def successors(self, node: int) -> array:
+        return self.succ_edges[self.succ_offsets[node]:self.succ_offsets[node + 1]]
+
+    def to_message(self) -> dict[str, Any]:
+        return {
+            "edges": [
+                [edge_id, self.names[s], self.names[t]]
+                for edge_id, s, t in zip(self.edge_ids, self.sources, self.targets)
+            ],
+        }
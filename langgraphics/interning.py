@@ -0,0 +1,99 @@
+from collections.abc import Callable
+from typing import Any
+
+from .blobs import BlobStore
+from .encoding import ENCODER, Encoder
+
+
+def _messages(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(i, dict) for i in value)
+
+
+class Interner:
+    # Message lists in one node_output payload, replaced by content ids: `input`
+    # and `output` are lists themselves, `state` has them under top-level keys
+    # (left as null in place so key order survives), and state patch ops that
+    # add or replace one of those messages carry its id as `ref` instead of a
+    # value. Works on plain values, on the payload worker; `bodies` collects
+    # every referenced body for the broadcaster's "intern" events.
+    def __init__(
+        self, blobs: BlobStore, encoder: Encoder | None = None, shrink: Callable[[str], str] | None = None
+    ) -> None:
+        self.blobs = blobs
+        self.encoder = encoder or ENCODER
+        self.shrink = shrink
+        self.bodies: dict[str, str] = {}
+        self.ids: dict[int, str] = {}
+
+    def items(self, items: list[Any]) -> list[str]:
+        refs = []
+        for item in items:
+            body = self.encoder.raw(item)
+            if self.shrink is not None:
+                body = self.shrink(body)
+            refs.append(blob_id := self.blobs.put(body))
+            self.bodies[blob_id] = body
+            self.ids[id(item)] = blob_id
+        return refs
+
+    def field(self, value: Any) -> tuple[str | None, list[str] | None]:
+        if _messages(value):
+            return None, self.items(value)
+        return self.encoder.raw(value), None
+
+    def state(self, value: Any) -> tuple[str, dict[str, list[str]] | None]:
+        if not isinstance(value, dict):
+            return self.encoder.raw(value), None
+        keys = {key: self.items(item) for key, item in value.items() if _messages(item)}
+        if not keys:
+            return self.encoder.raw(value), None
+        return self.encoder.raw({k: None if k in keys else v for k, v in value.items()}), keys
+
+    def patch(self, ops: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        # Patch values are the very objects the state was interned from.
+        out = []
+        for op in ops:
+            if (blob_id := self.ids.get(id(op.get("value")))) is not None:
+                op = {"op": op["op"], "path": op["path"], "ref": blob_id}
+            out.append(op)
+        return out
+
+
+def resolve(ops: list[dict[str, Any]], blobs: BlobStore | None, encoder: Encoder | None = None) -> list[dict[str, Any]] | None:
+    # Patch ops with their interned values filled back in; None if one is gone.
+    if not any("ref" in op for op in ops):
+        return ops
+    encoder = encoder or ENCODER
+    out = []
+    for op in ops:
+        if "ref" in op:
+            if blobs is None or (body := blobs.get(op["ref"])) is None:
+                return None
+            op = {"op": op["op"], "path": op["path"], "value": encoder.loads(body)}
+        out.append(op)
+    return out
+
+
+def restore(message: dict[str, Any], field: str, blobs: BlobStore, encoder: Encoder | None = None) -> str | None:
+    encoder = encoder or ENCODER
+    refs = (message.get("refs") or {}).get(field)
+    if refs is None:
+        return message.get(field)
+    if field == "state":
+        # The rest of the state may itself have been externalized by the budget.
+        body = message.get("state")
+        if body is None and (blob_id := (message.get("blobs") or {}).get("state")):
+            body = blobs.get(blob_id)
+        if body is None:
+            return None
+        state = encoder.loads(body)
+        for key, ids in refs.items():
+            items = [blobs.get(i) for i in ids]
+            if None in items:
+                return None
+            state[key] = [encoder.loads(i) for i in items]
+        return encoder.raw(state)
+    items = [blobs.get(i) for i in refs]
+    if None in items:
+        return None
+    return f"[{','.join(items)}]"
@@ -0,0 +1,68 @@
+from copy import deepcopy
+from typing import Any
+
+
+def escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    if isinstance(new, dict):
+        ops = []
+        for key, value in new.items():
+            child = f"{path}/{escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            elif old[key] != value:
+                ops.extend(diff(old[key], value, child))
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{escape(key)}"})
+        return ops
+    if isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            if old[i] != new[i]:
+                ops.extend(diff(old[i], new[i], f"{path}/{i}"))
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        for value in new[common:]:
+            ops.append({"op": "add", "path": f"{path}/-", "value": value})
+        return ops
+    if old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply(doc: Any, ops: list[dict[str, Any]]) -> Any:
+    # Values are copied in: the document is edited in place by later ops, and
+    # op values may be shared (memoized encodings, the tracer's last state).
+    for op in ops:
+        if op["path"] == "":
+            doc = deepcopy(op.get("value"))
+            continue
+        *parents, last = map(unescape, op["path"].split("/")[1:])
+        target = doc
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            if op["op"] == "remove":
+                del target[int(last)]
+            elif op["op"] == "replace":
+                target[int(last)] = deepcopy(op["value"])
+            elif last == "-":
+                target.append(deepcopy(op["value"]))
+            else:
+                target.insert(int(last), deepcopy(op["value"]))
+        elif op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = deepcopy(op["value"])
+    return doc
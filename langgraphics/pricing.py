@@ -0,0 +1,121 @@
+import bisect
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any
+
+from .cache import read_json, write_json
+
+FIELDS = ("input", "output", "cache_read", "cache_write")
+MAX_RESOLVED = 4096
+
+_SUFFIX = re.compile(r"(?:[-@:_](?:\d{4}-?\d{2}-?\d{2}|\d{4}|v\d+(?::\d+)?|latest|preview))+$")
+_BOUNDARY = re.compile(r"[-.:@_]")
+
+
+def compile_prices(models: dict[str, Any]) -> dict[str, Any]:
+    # Cost rows only, deduplicated, plus bare-name aliases for provider
+    # prefixed ids ("openai/gpt-4o" also answers "gpt-4o" unless it exists).
+    rows: list[list[float]] = []
+    row_ids: dict[tuple, int] = {}
+    names: dict[str, int] = {}
+    for name, metadata in models.items():
+        cost = metadata.get("cost") or {}
+        row = tuple(cost.get(field) or 0 for field in FIELDS)
+        if not any(row):
+            continue
+        if (row_id := row_ids.get(row)) is None:
+            row_id = row_ids[row] = len(rows)
+            rows.append(list(row))
+        names[name.lower()] = row_id
+    aliases: dict[str, int] = {}
+    for name, row_id in names.items():
+        alias = name.rsplit("/", 1)[-1]
+        if alias != name and alias not in names:
+            aliases.setdefault(alias, row_id)
+    return {"fields": list(FIELDS), "rows": rows, "names": {**names, **aliases}}
+
+
+class PriceIndex:
+    def __init__(self, compiled: dict[str, Any]) -> None:
+        self.fields: list[str] = compiled["fields"]
+        self.rows: list[list[float]] = compiled["rows"]
+        self.names: dict[str, int] = compiled["names"]
+        self.resolved: dict[str, dict[str, float] | None] = {}
+        self.sorted: list[str] | None = None
+
+    def lookup(self, model: str) -> dict[str, float] | None:
+        key = model.lower()
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
+        if len(self.resolved) >= MAX_RESOLVED:
+            self.resolved.clear()
+        row_id = self._resolve(key)
+        cost = None if row_id is None else dict(zip(self.fields, self.rows[row_id]))
+        self.resolved[key] = cost
+        return cost
+
+    def _resolve(self, name: str) -> int | None:
+        # Exact, then without provider prefix, then without date/version
+        # suffixes, then the newest dated release of that name, then the
+        # longest known prefix ending at a separator.
+        parts = name.split("/")
+        candidates = ["/".join(parts[i:]) for i in range(len(parts))]
+        for candidate in list(candidates):
+            if (trimmed := _SUFFIX.sub("", candidate)) != candidate:
+                candidates.append(trimmed)
+        for candidate in candidates:
+            if (row_id := self.names.get(candidate)) is not None:
+                return row_id
+        if self.sorted is None:
+            self.sorted = sorted(self.names)
+        for candidate in candidates:
+            start = bisect.bisect_left(self.sorted, candidate)
+            end = bisect.bisect_left(self.sorted, candidate + "\uffff")
+            for known in reversed(self.sorted[start:end]):
+                if _SUFFIX.fullmatch(known[len(candidate):]):
+                    return self.names[known]
+        for candidate in candidates:
+            cuts = [m.start() for m in _BOUNDARY.finditer(candidate)]
+            for cut in reversed(cuts):
+                if (row_id := self.names.get(candidate[:cut])) is not None:
+                    return row_id
+        return None
+
+
+_lock = threading.Lock()
+_index: PriceIndex | None = None
+
+
+def _load() -> dict[str, Any]:
+    compiled = read_json("prices.json")
+    if isinstance(compiled, dict):
+        return compiled
+    with open(Path(__file__).parent / "metadata" / "prices.json", encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def prices() -> PriceIndex:
+    global _index
+    if (index := _index) is None:
+        with _lock:
+            if (index := _index) is None:
+                index = _index = PriceIndex(_load())
+    return index
+
+
+def refresh(models: dict[str, Any]) -> None:
+    # Called after an upstream sync; the next lookup loads the new index.
+    global _index
+    write_json("prices.json", compile_prices(models))
+    with _lock:
+        _index = None
+
+
+def warm() -> threading.Thread:
+    thread = threading.Thread(target=prices, name="langgraphics-prices", daemon=True)
+    thread.start()
+    return thread
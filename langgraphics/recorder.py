@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from .blobs import DEFAULT_BLOB_STORE_SIZE, BlobStore
+from .broadcaster import Detail, PayloadMode
+from .encoding import ENCODER, Encoder, dumps
+
+WRITE_BUFFER = 1024 * 1024
+
+
+class Recorder:
+    # Headless stand-in for the Broadcaster: the tracer's event stream is
+    # appended to a JSON-lines trace file by a single writer thread, with no
+    # sockets. Blobs (externalized bodies, images) are written as "blob" lines
+    # ahead of the events referencing them, so a trace file is self-contained.
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        topology: dict[str, Any],
+        blob_store_size: int = DEFAULT_BLOB_STORE_SIZE,
+        encoder: Encoder | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.encoder = encoder or ENCODER
+        self.topology = topology
+        self.detail: Detail = "full"
+        self.payloads: PayloadMode = "eager"
+        self.on_expand: Callable[[str], None] | None = None
+        self.blobs = BlobStore(blob_store_size)
+        self.blobs.on_put = lambda blob_id, body: self.publish({"type": "blob", "id": blob_id, "body": body})
+        self.seq = 0
+        self.written = 0
+        self.queue: deque[dict[str, Any]] = deque()
+        self.ready = threading.Condition()
+        self.closing = False
+        self.writer: threading.Thread | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"path": str(self.path), "pending": len(self.queue), "written": self.written}
+
+    def publish(self, message: dict[str, Any]) -> None:
+        # Called from the agent's thread; the writer is (re)started on demand,
+        # so a shut-down recorder appends to the same file on the next run.
+        with self.ready:
+            self.queue.append(message)
+            if self.writer is None:
+                self._start()
+            self.ready.notify()
+
+    def _start(self) -> None:
+        self.closing = False
+        self.writer = threading.Thread(target=self.write, name="langgraphics-recorder", daemon=True)
+        self.writer.start()
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8", buffering=WRITE_BUFFER) as fp:
+            fp.write(self.encoder.raw(self.topology) + "\n")
+            while True:
+                with self.ready:
+                    while not self.queue and not self.closing:
+                        self.ready.wait()
+                    if not self.queue:
+                        return
+                    batch = list(self.queue)
+                    self.queue.clear()
+                lines = []
+                for message in batch:
+                    self.seq = message["seq"] = self.seq + 1
+                    lines.append(dumps(message, encoder=self.encoder))
+                fp.write("\n".join(lines) + "\n")
+                fp.flush()
+                self.written += len(batch)
+
+    async def shutdown(self) -> None:
+        # Flushes everything queued and closes the file.
+        with self.ready:
+            writer = self.writer
+            self.closing = True
+            self.ready.notify()
+        if writer is None:
+            return
+        writer.join()
+        with self.ready:
+            self.writer = None
+            if self.queue:
+                self._start()
@@ -0,0 +1,152 @@
+from copy import deepcopy
+from typing import Any
+
+from .blobs import BlobStore
+from .encoding import ENCODER, Encoder
+from .formatter import Formatter
+from .interning import resolve, restore
+from .patch import apply
+
+
+def collect_containers(nodes: list[dict[str, Any]], prefix: str, out: set[str]) -> set[str]:
+    for node in nodes:
+        node_id = f"{prefix}:{node['id']}" if prefix else node["id"]
+        if node.get("node_type") == "subgraph":
+            out.add(node_id)
+            if node.get("subgraph"):
+                collect_containers(node["subgraph"]["nodes"], node_id, out)
+    return out
+
+
+class Snapshot:
+    def __init__(
+        self, topology: dict[str, Any], blobs: BlobStore | None = None, encoder: Encoder | None = None
+    ) -> None:
+        self.blobs = blobs
+        self.encoder = encoder or ENCODER
+        self.containers = collect_containers(topology["nodes"], "", set())
+        self.edge_index = topology.get("index", {}).get("edges", [])
+        self.reset()
+
+    def reset(self) -> None:
+        self.run_id: str | None = None
+        self.seq: int | None = None
+        self.size = 0
+        self.nodes: dict[str, str] = {}
+        self.edges: dict[str, dict[str, str]] = {}
+        self.outputs: dict[str, dict[str, Any]] = {}
+        self.tokens = {"cached": 0, "total": 0}
+        self.costs = {"cached": 0.0, "total": 0.0}
+        self.state_id: int | None = None
+        self.state: Any = None
+
+    def fork(self) -> "Snapshot":
+        # An independent copy that further events can be applied to.
+        fork = object.__new__(Snapshot)
+        fork.__dict__.update(self.__dict__)
+        fork.nodes = dict(self.nodes)
+        fork.edges = {k: dict(v) for k, v in self.edges.items()}
+        fork.outputs = dict(self.outputs)
+        fork.tokens = dict(self.tokens)
+        fork.costs = dict(self.costs)
+        fork.state = deepcopy(self.state)
+        return fork
+
+    def _body(self, message: dict[str, Any], field: str) -> str | None:
+        if self.blobs is None:
+            return message.get(field)
+        if (message.get("refs") or {}).get(field) is not None:
+            return restore(message, field, self.blobs, self.encoder)
+        if message.get(field) is not None:
+            return message.get(field)
+        blob_id = (message.get("blobs") or {}).get(field)
+        return self.blobs.get(blob_id) if blob_id else None
+
+    def _materialize(self, message: dict[str, Any]) -> dict[str, Any]:
+        if (body := self._body(message, "state")) is not None:
+            self.state = self.encoder.loads(body)
+        elif (
+            message.get("state_base") == self.state_id
+            and self.state is not None
+            and (ops := resolve(message["state_patch"], self.blobs, self.encoder)) is not None
+        ):
+            self.state = apply(self.state, ops)
+        else:
+            self.state = None
+        self.state_id = message["state_id"]
+        if message.get("state_patch") is None or self.state is None:
+            return message
+        return {
+            **message,
+            "state": self.encoder.raw(self.state),
+            "state_base": None,
+            "state_patch": None,
+        }
+
+    def _traverse_into(self, target: str) -> None:
+        for edge in self.edges.values():
+            if edge["target"] == target and edge["status"] == "active":
+                edge["status"] = "traversed"
+
+    def apply(self, message: dict[str, Any]) -> None:
+        self.size += 1
+        self.seq = message.get("seq")
+        msg_type = message["type"]
+        if msg_type == "run_start":
+            self.run_id = message["run_id"]
+        elif msg_type == "edge_active":
+            if "edge" in message:
+                edge_id, source, target = self.edge_index[message["edge"]]
+                message = {**message, "edge_id": edge_id}
+            else:
+                source, target = message["source"], message["target"]
+            if self.nodes.get(source) == "active":
+                self.nodes[source] = "completed"
+                end_child = f"{source}:__end__"
+                if self.nodes.get(end_child) == "active":
+                    self.nodes[end_child] = "completed"
+                    self._traverse_into(end_child)
+            self._traverse_into(source)
+            parent, _, _ = target.rpartition(":")
+            parent_completed = bool(parent) and self.nodes.get(parent) == "completed"
+            self.edges[message["edge_id"]] = {
+                "source": source,
+                "target": target,
+                "status": "traversed" if parent_completed else "active",
+            }
+            if self.nodes.get(target) != "error":
+                self.nodes[target] = "completed" if parent_completed else "active"
+                if not parent_completed and target in self.containers:
+                    self.nodes[f"{target}:__start__"] = "active"
+        elif msg_type == "node_output":
+            if message.get("state_id") is not None:
+                message = self._materialize(message)
+            if message.get("status") == "ok" and self.nodes.get(message["node_id"]) == "active":
+                self.nodes[message["node_id"]] = "completed"
+                self._traverse_into(message["node_id"])
+            if metrics := message.get("metrics"):
+                for key in ("cached", "total"):
+                    self.tokens[key] += metrics["tokens"][key]
+                    self.costs[key] += float(metrics["costs"][key])
+            if not message.get("parent_run_id"):
+                self.outputs[message["node_id"]] = {
+                    k: v for k, v in message.items() if k != "type"
+                }
+
+    def to_message(self) -> dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "run_id": self.run_id,
+            "seq": self.seq,
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "outputs": list(self.outputs.values()),
+            "state": {
+                "id": self.state_id,
+                "value": self.encoder.raw(self.state),
+            } if self.state is not None else None,
+            "metrics": {
+                "tokens": self.tokens,
+                "costs": {k: Formatter.price(v) for k, v in self.costs.items()},
+            },
+        }
@@ -0,0 +1,215 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+DEFAULT_RETENTION_RUNS = 1000
+DEFAULT_RETENTION_BYTES = 1024 * 1024 * 1024
+
+STATUSES = ("running", "ok", "error", "interrupted")
+# run_id, status, events, started, duration, cost, tokens,
+# first_segment, last_segment, first_offset, end_offset
+RECORD = struct.Struct("<16sB3xIdddQIIQQ")
+
+
+class RunRecord:
+    __slots__ = ("run_id", "status", "events", "started", "duration", "cost", "tokens",
+                 "first_segment", "last_segment", "first_offset", "end_offset")
+
+    def __init__(self, *fields: Any) -> None:
+        for name, value in zip(self.__slots__, fields):
+            setattr(self, name, value)
+
+    def pack(self) -> bytes:
+        return RECORD.pack(self.run_id.encode(), *(getattr(self, name) for name in self.__slots__[1:]))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "status": STATUSES[self.status],
+            "events": self.events,
+            "started": self.started,
+            "duration": self.duration,
+            "cost": self.cost,
+            "tokens": self.tokens,
+        }
+
+
+class TraceStore:
+    # Finished and running runs on disk. Events are appended to numbered
+    # segment files as `run_id \t type \t event` lines, so a run is read back
+    # without parsing any JSON; `runs.idx` holds one fixed-size record per run
+    # (where its events live plus status, timing and cost) and is read through
+    # mmap. Segments rotate at `segment_size`; past the retention limits the
+    # oldest finished runs are dropped, segments nothing refers to anymore are
+    # deleted and the index is rewritten.
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        retention_runs: int = DEFAULT_RETENTION_RUNS,
+        retention_bytes: int = DEFAULT_RETENTION_BYTES,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.retention_runs = retention_runs
+        self.retention_bytes = retention_bytes
+        self.lock = threading.Lock()
+        self.runs: dict[str, RunRecord] = {}
+        self.slots: dict[str, int] = {}
+        for slot, run in enumerate(self._read_index()):
+            self.runs[run.run_id] = run
+            self.slots[run.run_id] = slot
+        self.index = open(self.directory / "runs.idx", "r+b" if self.slots else "w+b")
+        segments = self._segments()
+        self.segment = segments[-1] if segments else 1
+        self.file = open(self._path(self.segment), "ab")
+        self.offset = self.file.tell()
+        self.open: dict[str, RunRecord] = {}
+        self.dirty: set[str] = set()
+        # Runs still running in the index belong to a process that died before
+        # their run_end; they will never finish.
+        for run in self.runs.values():
+            if run.status == STATUSES.index("running"):
+                run.status = STATUSES.index("interrupted")
+                self.dirty.add(run.run_id)
+        self._expire()
+        self.flush()
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}.log"
+
+    def _segments(self) -> list[int]:
+        return sorted(int(p.stem) for p in self.directory.glob("*.log") if p.stem.isdigit())
+
+    def _read_index(self) -> list[RunRecord]:
+        path = self.directory / "runs.idx"
+        if not path.exists() or path.stat().st_size < RECORD.size:
+            return []
+        with open(path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            usable = len(data) - len(data) % RECORD.size
+            return [RunRecord(run_id.rstrip(b"\0").decode(), *rest) for run_id, *rest in RECORD.iter_unpack(data[:usable])]
+
+    def append(self, run_id: str, msg_type: str, message: str, source: dict[str, Any] | None = None) -> None:
+        line = f"{run_id}\t{msg_type}\t{message}\n".encode()
+        with self.lock:
+            # Late events of a finished run extend its record.
+            if (run := self.open.get(run_id) or self.runs.get(run_id)) is None:
+                run = self.open[run_id] = RunRecord(
+                    run_id, 0, 0, time.time(), 0.0, 0.0, 0,
+                    self.segment, self.segment, self.offset, self.offset,
+                )
+                self.runs[run_id] = run
+                self.slots[run_id] = len(self.slots)
+            self.file.write(line)
+            self.offset += len(line)
+            run.events += 1
+            run.last_segment, run.end_offset = self.segment, self.offset
+            if source is not None and (metrics := source.get("metrics")):
+                run.cost += float(metrics["costs"]["total"])
+                run.tokens += metrics["tokens"]["total"]
+            self.dirty.add(run_id)
+            if msg_type in ("run_end", "error"):
+                run.status = STATUSES.index("ok" if msg_type == "run_end" else "error")
+                run.duration = time.time() - run.started
+                del self.open[run_id]
+            if self.offset >= self.segment_size:
+                self._rotate()
+            elif run_id not in self.open and len(self.runs) > self.retention_runs:
+                self._expire()
+
+    def flush(self) -> None:
+        # Called after each batch: segment bytes first, then the index records
+        # that point into them.
+        with self.lock:
+            self.file.flush()
+            for run_id in self.dirty:
+                if (run := self.runs.get(run_id)) is not None:
+                    self.index.seek(self.slots[run_id] * RECORD.size)
+                    self.index.write(run.pack())
+            self.dirty.clear()
+            self.index.flush()
+
+    def _rotate(self) -> None:
+        # Retention is applied on rotation, when a segment may have become
+        # unreferenced, and when finished runs exceed `retention_runs`.
+        self.file.close()
+        self.segment += 1
+        self.file = open(self._path(self.segment), "ab")
+        self.offset = 0
+        self._expire()
+
+    def _expire(self) -> None:
+        finished = [run.run_id for run in self.runs.values() if run.run_id not in self.open]
+        drop = max(len(finished) - self.retention_runs, 0)
+        sizes = {s: self._path(s).stat().st_size for s in self._segments() if s != self.segment}
+        while True:
+            dropped = set(finished[:drop])
+            kept = [run for run in self.runs.values() if run.run_id not in dropped]
+            oldest = min((run.first_segment for run in kept), default=self.segment)
+            unused = [s for s in sizes if s < oldest]
+            total = sum(sizes.values()) - sum(sizes[s] for s in unused)
+            if total <= self.retention_bytes or drop >= len(finished):
+                break
+            drop += 1
+        if not drop and not unused:
+            return
+        for segment in unused:
+            self._path(segment).unlink(missing_ok=True)
+        self.file.flush()
+        self._compact(kept)
+
+    def _compact(self, kept: list[RunRecord]) -> None:
+        # The index is rewritten with the surviving records and swapped in.
+        path = self.directory / "runs.idx"
+        with open(path.with_suffix(".tmp"), "wb") as fp:
+            fp.write(b"".join(run.pack() for run in kept))
+        self.index.close()
+        os.replace(path.with_suffix(".tmp"), path)
+        self.index = open(path, "r+b")
+        self.runs = {run.run_id: run for run in kept}
+        self.slots = {run.run_id: slot for slot, run in enumerate(kept)}
+        self.dirty &= self.runs.keys()
+
+    def list_runs(self) -> list[dict[str, Any]]:
+        # Newest first, straight from the mmap-ed index.
+        self.flush()
+        with self.lock:
+            runs = self._read_index()
+        return [run.to_dict() for run in reversed(runs)]
+
+    def events(self, run_id: str) -> list[tuple[str, str]] | None:
+        with self.lock:
+            if (run := self.runs.get(run_id)) is None:
+                return None
+            self.file.flush()
+            first, last, start, end = run.first_segment, run.last_segment, run.first_offset, run.end_offset
+        prefix = f"{run_id}\t"
+        events: list[tuple[str, str]] = []
+        for segment in range(first, last + 1):
+            try:
+                fp = open(self._path(segment), "rb")
+            except FileNotFoundError:
+                continue
+            with fp:
+                size = os.fstat(fp.fileno()).st_size
+                if size == 0:
+                    continue
+                with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    chunk = data[start if segment == first else 0:end if segment == last else size]
+            for line in chunk.decode().split("\n"):
+                if line.startswith(prefix):
+                    _, msg_type, message = line.split("\t", 2)
+                    events.append((msg_type, message))
+        return events
+
+    def close(self) -> None:
+        self.flush()
+        with self.lock:
+            self.file.close()
+            self.index.close()
@@ -1,140 +1,271 @@
 import asyncio
-import json
+import logging
+import threading
 import uuid
-from collections.abc import AsyncIterator, Iterator
+from array import array
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from socketserver import TCPServer
-from typing import Any
+from typing import Any, Literal
 
 from langchain_core.tracers.base import AsyncBaseTracer
 from langchain_core.tracers.schemas import Run
 
+from .budget import DEFAULT_EVENT_BUDGET, DEFAULT_FIELD_BUDGET, Budget
 from .formatter import Formatter
+from .index import TopologyIndex
+from .interning import Interner
+from .patch import diff
+from .topology import edge_lookup, extract
+
+KEYFRAME_INTERVAL = 16
+DEFAULT_MAX_TRACKED_STATES = 1024
+
+logger = logging.getLogger(__name__)
+
+
+Payload = tuple[Callable[[], Any] | None, Callable[[Any], dict[str, Any]]]
 
 
 class BroadcastingTracer(AsyncBaseTracer):
-    def __init__(self, viewport: "Viewport") -> None:
+    def __init__(self, viewport: "Viewport", execution: "Execution") -> None:
         super().__init__(_schema_format="original+chat")
         self.viewport = viewport
-        self.states = {}
+        self.execution = execution
+        self.states: dict[Any, Any] = {}
+        self.scopes: dict[Any, str | None] = {}
+        self.evicted = 0
+        self.state_id = 0
+        self.keyframe_id = 0
+        self.last_state: Any = None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "states": len(self.states),
+            "scopes": len(self.scopes),
+            "runs": len(self.run_map),
+            "evicted": self.evicted,
+        }
+
+    def _release(self, run: Run) -> None:
+        self.states.pop(run.id, None)
+        self.scopes.pop(run.id, None)
+        if run.parent_run_id is None:
+            self.states.clear()
+            self.scopes.clear()
+
+    def _scope(self, run_id: Any) -> str | None:
+        # The node path a run's children resolve against, computed once from the
+        # parent's cached scope. Entries live as long as the run (see _release).
+        if run_id in self.scopes:
+            return self.scopes[run_id]
+        run = self.run_map.get(str(run_id))
+        if run is None:
+            return None
+        if run.name in self.viewport.node_names:
+            scope = run.name
+        else:
+            parent = self._scope(run.parent_run_id) if run.parent_run_id else None
+            if run.name == "LangGraph" or parent is None:
+                scope = parent
+            else:
+                scope = f"{parent}:{run.name}"
+        self.scopes[run_id] = scope
+        return scope
 
     def _build_full_id(self, run: Run) -> str | None:
-        parts = [run.name]
-        current = run
-        top_container = None
-        while current.parent_run_id:
-            parent = self.run_map.get(str(current.parent_run_id))
-            if parent is None:
-                break
-            if parent.name == "LangGraph":
-                current = parent
-                continue
-            if parent.name in self.viewport.node_names:
-                top_container = parent.name
-                break
-            parts.append(parent.name)
-            current = parent
-        if top_container is None:
+        if not run.parent_run_id or (scope := self._scope(run.parent_run_id)) is None:
             return None
-        parts.reverse()
-        full_id = f"{top_container}:{':'.join(parts)}"
-        if full_id in self.viewport.predecessors:
+        full_id = f"{scope}:{run.name}"
+        if full_id in self.viewport.index.incoming:
             return full_id
 
     async def _persist_run(self, run: Run) -> None:
         pass
 
-    async def _emit_end(self, run: Run) -> None:
-        node_run_id = str(run.parent_run_id) if run.parent_run_id else None
-        if node_run_id is None:
-            return
-        state = self.states.get(run.name)
-        await self.viewport.broadcast(
-            {
-                "type": "node_output",
-                "run_id": str(run.id),
-                "parent_run_id": node_run_id,
-                "node_id": run.name,
-                "node_kind": run.run_type,
-                "status": "error" if run.error else "ok",
-                "input": Formatter.inputs(run),
-                "output": Formatter.outputs(run),
+    def _encode_state(self, current: Any, encoded: str | None, interner: Interner | None = None) -> dict[str, Any]:
+        if current is None:
+            return {"state": None}
+        if self.viewport.state_mode == "full":
+            return {"state": encoded}
+        previous, self.last_state = self.last_state, current
+        self.state_id += 1
+        if previous is not None and self.state_id - self.keyframe_id < KEYFRAME_INTERVAL:
+            ops = diff(previous, current)
+            if interner is not None:
+                ops = interner.patch(ops)
+            # A patch over budget (a huge tool result) goes out as a keyframe
+            # instead, which the budget can truncate or externalize.
+            if not any(op["path"] == "" for op in ops) and self.viewport.budget.fits(ops):
+                return {
+                    "state": None,
+                    "state_id": self.state_id,
+                    "state_base": self.state_id - 1,
+                    "state_patch": ops,
+                }
+        self.keyframe_id = self.state_id
+        return {"state": encoded, "state_id": self.state_id}
+
+    def _payload(self, run: Run) -> Payload:
+        # `build` does the formatting and may run on a worker thread; `finish`
+        # runs in event order, so the delta-state bookkeeping stays sequential.
+        if self.viewport.ws.detail != "full":
+            return None, self._reset
+        state = self.states.get(run.id)
+        encoder = self.viewport.encoder
+        delta = self.viewport.state_mode == "delta"
+        if self.viewport.ws.payloads == "interned":
+            return partial(self._build_interned, run, state), self._finish_interned
+
+        def build() -> tuple[dict[str, Any], Any, str | None]:
+            fields = {
+                "input": Formatter.inputs(run, encoder=encoder),
+                "output": Formatter.outputs(run, encoder=encoder),
                 "metrics": Formatter.metrics(run),
-                "state": json.dumps(
-                    state,
-                    ensure_ascii=False,
-                    default=lambda x: x.__dict__,
-                ) if state else None,
             }
-        )
+            if not state:
+                return fields, None, None
+            if delta:
+                current = encoder.plain(state)
+                return fields, current, encoder.raw(current)
+            # Full states are only sent, never diffed: reduced and encoded in one go.
+            return fields, state, encoder.dumps(state)
+
+        return build, self._finish
+
+    def _build_interned(self, run: Run, state: Any) -> tuple[dict[str, Any], Any, str | None, Interner]:
+        # Interned payloads are split into messages and the rest here, on the
+        # payload worker, from plain values: the drain only picks out the
+        # bodies a run has not been sent yet.
+        viewport = self.viewport
+        encoder = viewport.encoder
+        interner = Interner(viewport.ws.blobs, encoder, viewport.budget.shrink)
+        fields: dict[str, Any] = {"metrics": Formatter.metrics(run)}
+        refs: dict[str, Any] = {}
+        for field, formatted in (("input", Formatter.inputs), ("output", Formatter.outputs)):
+            fields[field], ids = interner.field(formatted(run, encoder=encoder, plain=True))
+            if ids is not None:
+                refs[field] = ids
+        current = encoded = None
+        if state:
+            current = encoder.plain(state)
+            encoded, keys = interner.state(current)
+            if keys is not None:
+                refs["state"] = keys
+        fields["refs"] = refs
+        return fields, current, encoded, interner
+
+    def _finish_interned(self, built: tuple[dict[str, Any], Any, str | None, Interner]) -> dict[str, Any]:
+        fields, current, encoded, interner = built
+        message = {**fields, **self._encode_state(current, encoded, interner)}
+        refs = message.pop("refs")
+        if message["state"] is None:
+            refs.pop("state", None)
+        if refs:
+            message["refs"] = refs
+        message["interned"] = interner.bodies
+        return self.viewport.budget.fit(message)
+
+    def _reset(self, built: None) -> dict[str, Any]:
+        self.last_state = None
+        return {}
+
+    def _finish(self, built: tuple[dict[str, Any], Any, str | None]) -> dict[str, Any]:
+        fields, current, encoded = built
+        return self.viewport.budget.fit({**fields, **self._encode_state(current, encoded)})
+
+    async def _emit_end(self, run: Run) -> None:
+        node_run_id = str(run.parent_run_id) if run.parent_run_id else None
+        if node_run_id is not None and self.viewport.ws.detail != "none":
+            await self.execution.broadcast(
+                {
+                    "type": "node_output",
+                    "run_id": str(run.id),
+                    "parent_run_id": node_run_id,
+                    "node_id": run.name,
+                    "node_kind": run.run_type,
+                    "status": "error" if run.error else "ok",
+                },
+                self._payload(run),
+            )
+        self._release(run)
+
+    def _evict(self, run: Run) -> None:
+        # Entries live until their run ends, so all of them are running. The
+        # new run's ancestors (the long-running nodes whose node_output still
+        # needs their state) go last: the oldest other entry is evicted first.
+        ancestors = set()
+        parent_id = run.parent_run_id
+        while parent_id is not None and parent_id not in ancestors:
+            ancestors.add(parent_id)
+            parent = self.run_map.get(str(parent_id))
+            parent_id = parent.parent_run_id if parent is not None else None
+        victim = next((k for k in self.states if k not in ancestors), None)
+        del self.states[next(iter(self.states)) if victim is None else victim]
+        self.evicted += 1
 
     async def _on_chain_start(self, run: Run) -> None:
-        self.states[run.name] = run.inputs
+        if len(self.states) >= self.viewport.max_tracked_states:
+            self._evict(run)
+        self.states[run.id] = run.inputs
         if run.name in self.viewport.node_names:
-            self.viewport.node_current = run.name
-            await self.viewport._emit_edge(run.name)
+            self.execution.node_current = run.name
+            await self.execution._emit_edge(run.name)
+            self.viewport.expand(run.name)
         else:
             if (full_id := self._build_full_id(run)) is not None:
-                await self.viewport._emit_edge(full_id)
+                await self.execution._emit_edge(full_id)
+                self.viewport.expand(full_id)
 
     async def _on_chain_end(self, run: Run) -> None:
         async def emit_last_edge(run_name):
             end_id = f"{run_name}:__end__"
-            if end_id in self.viewport.predecessors:
-                await self.viewport._emit_edge(end_id)
+            if end_id in self.viewport.index.incoming:
+                await self.execution._emit_edge(end_id)
 
         if run.name in self.viewport.node_names:
             parent = (
                 self.run_map.get(str(run.parent_run_id)) if run.parent_run_id else None
             )
             if parent is None or parent.name not in self.viewport.node_names:
-                self.viewport.completed_nodes.add(run.name)
-                state = self.states.get(run.name)
-                await self.viewport.broadcast(
+                self.execution.complete(run.name)
+                await self.execution.broadcast(
                     {
                         "type": "node_output",
                         "node_id": run.name,
                         "run_id": str(run.id),
                         "node_kind": run.run_type,
                         "status": "error" if run.error else "ok",
-                        "input": Formatter.inputs(run),
-                        "output": Formatter.outputs(run),
-                        "metrics": Formatter.metrics(run),
-                        "state": json.dumps(
-                            state,
-                            ensure_ascii=False,
-                            default=lambda x: x.__dict__,
-                        ) if state else None,
-                    }
+                    },
+                    self._payload(run),
                 )
                 await emit_last_edge(run.name)
         else:
             if (full_id := self._build_full_id(run)) is not None:
                 await emit_last_edge(full_id)
             await self._emit_end(run)
+        self._release(run)
 
     async def _on_chain_error(self, run: Run) -> None:
         if run.name in self.viewport.node_names:
             parent = self.run_map.get(str(run.parent_run_id)) if run.parent_run_id else None
             if parent is None or parent.name not in self.viewport.node_names:
-                await self.viewport.broadcast(
+                await self.execution.broadcast(
                     {
                         "type": "node_output",
                         "node_id": run.name,
                         "run_id": str(run.id),
                         "node_kind": run.run_type,
                         "status": "error" if run.error else "ok",
-                        "input": Formatter.inputs(run),
-                        "output": Formatter.outputs(run),
-                        "metrics": Formatter.metrics(run),
-                        "state": json.dumps(
-                            self.states.get(run.name),
-                            ensure_ascii=False,
-                            default=lambda x: x.__dict__,
-                        ) if self.states.get(run.name) else None,
-                    }
+                    },
+                    self._payload(run),
                 )
         else:
             await self._emit_end(run)
+        self._release(run)
 
     async def _on_llm_end(self, run: Run) -> None:
         await self._emit_end(run)
@@ -155,109 +286,214 @@ class BroadcastingTracer(AsyncBaseTracer):
         await self._emit_end(run)
 
 
+class Execution:
+    def __init__(self, viewport: "Viewport") -> None:
+        index = viewport.index
+        self.viewport = viewport
+        self.run_id = uuid.uuid4().hex[:8]
+        self.node_current: str | None = None
+        self.generation = array("i", [-1] * len(index.names))
+        for node in index.start_nodes:
+            self.generation[node] = 0
+        self.linked = array("i", [-1] * len(index.edge_ids))
+        self.active: dict[int, int] = {}
+        self.tracer: BroadcastingTracer | None = None
+        self.ordered: deque[tuple[dict[str, Any], Future | None, Callable[[Any], dict[str, Any]] | None]] = deque()
+        self.ordering = threading.Lock()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "active": len(self.active),
+            "formatting": len(self.ordered),
+            **(self.tracer.stats if self.tracer is not None else {}),
+        }
+
+    async def broadcast(self, message: dict[str, Any], payload: Payload | None = None) -> None:
+        message["channel"] = self.run_id
+        build, finish = payload or (None, None)
+        pool = self.viewport.payload_pool()
+        if pool is None:
+            if finish is not None:
+                message.update(finish(build() if build is not None else None))
+            self.viewport.ws.publish(message)
+            return
+        # With a pool, events queue behind payloads still being formatted and
+        # are published strictly in the order the tracer produced them.
+        future = pool.submit(build) if build is not None else None
+        with self.ordering:
+            self.ordered.append((message, future, finish))
+        if future is None:
+            self._flush()
+        else:
+            future.add_done_callback(self._flush)
+
+    def _flush(self, _: Future | None = None) -> None:
+        with self.ordering:
+            while self.ordered:
+                message, future, finish = self.ordered[0]
+                if future is not None and not future.done():
+                    return
+                self.ordered.popleft()
+                if finish is not None:
+                    # The event still goes out, without its payload.
+                    try:
+                        message.update(finish(future.result() if future is not None else None))
+                    except Exception as e:
+                        logger.warning("Error formatting %s payload: %r", message["type"], e)
+                self.viewport.ws.publish(message)
+
+    async def settle(self) -> None:
+        with self.ordering:
+            futures = [asyncio.wrap_future(f) for _, f, _ in self.ordered if f is not None]
+        if futures:
+            await asyncio.wait(futures)
+        self._flush()
+
+    def _edge_message(self, msg_type: str, edge: int) -> dict[str, Any]:
+        index = self.viewport.index
+        if self.viewport.compact_ids:
+            return {"type": msg_type, "edge": edge}
+        return {
+            "type": msg_type,
+            "source": index.names[index.sources[edge]],
+            "target": index.names[index.targets[edge]],
+            "edge_id": index.edge_ids[edge],
+        }
+
+    def complete(self, node_name: str) -> None:
+        self.active.pop(self.viewport.index.ids.get(node_name, -1), None)
+
+    def _grow(self, index: TopologyIndex) -> None:
+        known = len(self.generation)
+        self.generation.extend([-1] * (len(index.names) - known))
+        for node in index.start_nodes:
+            if node >= known:
+                self.generation[node] = 0
+        self.linked.extend([-1] * (len(index.edge_ids) - len(self.linked)))
+
+    async def _emit_edge(self, target: str) -> None:
+        index = self.viewport.index
+        if len(self.generation) < len(index.names) or len(self.linked) < len(index.edge_ids):
+            self._grow(index)
+        if (node := index.ids.get(target)) is None:
+            return
+        for edge in index.predecessors(node):
+            src_gen = self.generation[index.sources[edge]]
+            if src_gen < 0 or self.linked[edge] == src_gen:
+                continue
+            self.linked[edge] = src_gen
+            if index.top_level[node]:
+                self.active[node] = edge
+            await self.broadcast(self._edge_message("edge_active", edge))
+        self.generation[node] += 1
+
+    async def _emit_error(self, last_node: str) -> None:
+        # `active` holds top-level targets entered but not completed, mapped to
+        # the edge that entered them, so both branches are O(degree).
+        for edge in self.active.values():
+            await self.broadcast(self._edge_message("error", edge))
+            return
+        index = self.viewport.index
+        if (node := index.ids.get(last_node)) is not None:
+            for edge in index.successors(node):
+                await self.broadcast(self._edge_message("error", edge))
+                return
+
+
 class Viewport:
     def __init__(
         self,
         graph: Any,
         ws: Any,
-        edge_lookup: dict[tuple[str, str], str],
-        http_server: TCPServer,
+        index: TopologyIndex,
+        http_server: TCPServer | None,
+        state_mode: Literal["full", "delta"] = "full",
+        persistent: bool = False,
+        max_tracked_states: int = DEFAULT_MAX_TRACKED_STATES,
+        compact_ids: bool = False,
+        pending: dict[str, Any] | None = None,
+        payload_workers: int = 0,
+        field_budget: int = DEFAULT_FIELD_BUDGET,
+        event_budget: int = DEFAULT_EVENT_BUDGET,
     ) -> None:
         self.ws = ws
+        self.state_mode = state_mode
+        self.persistent = persistent
+        self.max_tracked_states = max_tracked_states
+        self.compact_ids = compact_ids
+        self.executions: set[Execution] = set()
         self.graph = graph
-        self.node_current = None
-        self.edge_lookup = edge_lookup
+        self.index = index
         self.http_server = http_server
-        self.predecessors: dict[str, set[str]] = {}
-        for src, tgt in edge_lookup:
-            self.predecessors.setdefault(tgt, set()).add(src)
-        self.generation: dict[str, int] = {
-            n: 0 for pair in edge_lookup for n in pair
-            if n == "__start__" or n.endswith(":__start__")
-        }
-        self.node_names: set[str] = {
-            n for pair in edge_lookup for n in pair
-            if ":" not in n and n not in {"__start__", "__end__"}
-        }
-        self.completed_nodes: set[str] = set()
-        self.linked: set[tuple[str, int, str]] = set()
+        self.pending = pending if pending is not None else {}
+        self.expanding = threading.Lock()
+        self.encoder = ws.encoder
+        self.budget = Budget(ws.blobs, field_budget, event_budget, ws.encoder)
+        self.payload_workers = payload_workers
+        self.pool: ThreadPoolExecutor | None = None
+        self.pooling = threading.Lock()
+        ws.on_expand = self.expand
 
     def __getattr__(self, name: str) -> Any:
         return getattr(self.graph, name)
 
-    async def broadcast(self, message: dict[str, Any]) -> None:
-        message_str = json.dumps(message)
-        self.ws.record(message_str)
-        if self.ws.loop is None:
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"executions": [e.stats for e in list(self.executions)]}
+
+    def payload_pool(self) -> ThreadPoolExecutor | None:
+        # Created on first use, and again after a shutdown: the viewport stays
+        # usable once a non-persistent run has ended.
+        if not self.payload_workers or self.pool is not None:
+            return self.pool
+        with self.pooling:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.payload_workers, "langgraphics-payload")
+            return self.pool
+
+    @property
+    def node_names(self) -> frozenset[str]:
+        return self.index.node_names
+
+    def expand(self, node_id: str) -> None:
+        # Runs on invoking threads and, for client requests, on an executor
+        # thread. The extended index is swapped in by a single assignment, and
+        # the event is published under the lock so a nested subgraph never
+        # reaches the drain ahead of the one containing it.
+        if node_id not in self.pending:
             return
-        try:
-            await asyncio.wrap_future(
-                asyncio.run_coroutine_threadsafe(
-                    self.ws.broadcast(message_str), self.ws.loop
-                )
-            )
-        except Exception:
-            pass
-
-    async def _emit_edge(self, target: str) -> None:
-        for source in self.predecessors.get(target, set()):
-            if (src_gen := self.generation.get(source)) is None:
-                continue
-            if (key := (source, src_gen, target)) in self.linked:
-                continue
-            self.linked.add(key)
-            if edge_id := self.edge_lookup.get((source, target)):
-                await self.broadcast(
-                    {
-                        "type": "edge_active",
-                        "source": source,
-                        "target": target,
-                        "edge_id": edge_id,
-                    }
-                )
-        self.generation[target] = self.generation.get(target, -1) + 1
-
-    async def _emit_error(self, last_node: str) -> None:
-        for target in {tgt for src, gen, tgt in self.linked if all([
-            tgt in self.node_names, tgt not in self.completed_nodes,
-        ])}:
-            for source in self.predecessors.get(target, set()):
-                if any(k[0] == source and k[2] == target for k in self.linked):
-                    if eid := self.edge_lookup.get((source, target)):
-                        await self.broadcast({
-                            "type": "error",
-                            "edge_id": eid,
-                            "source": source,
-                            "target": target,
-                        })
-                        return
-        for (src, tgt), eid in self.edge_lookup.items():
-            if src == last_node:
-                await self.broadcast({
-                    "type": "error",
-                    "edge_id": eid,
-                    "source": last_node,
-                    "target": tgt,
-                })
-                break
-
-    def _make_config(self, config: Any) -> dict[str, Any]:
-        tracer = BroadcastingTracer(self)
+        with self.expanding:
+            if (graph := self.pending.pop(node_id, None)) is None:
+                return
+            subgraph = extract(graph, self.pending, node_id)
+            self.index = self.index.extend(edge_lookup(subgraph, node_id))
+            self.ws.publish({"type": "subgraph", "id": node_id, "subgraph": subgraph})
+
+    def _make_config(self, config: Any, execution: Execution) -> dict[str, Any]:
+        tracer = execution.tracer = BroadcastingTracer(self, execution)
         merged: dict[str, Any] = dict(config or {})
         merged["callbacks"] = list(merged.get("callbacks") or []) + [tracer]
         return merged
 
     async def shutdown(self) -> None:
         await self.ws.shutdown()
-        self.http_server.shutdown()
+        if self.http_server is not None:
+            self.http_server.shutdown()
+        with self.pooling:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
 
     async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
-        run_id = uuid.uuid4().hex[:8]
-        await self.broadcast({"type": "run_start", "run_id": run_id})
+        execution = Execution(self)
+        self.executions.add(execution)
+        await execution.broadcast({"type": "run_start", "run_id": execution.run_id})
 
         result: Any = None
         last_node = "__start__"
-        merged_config = self._make_config(config)
+        merged_config = self._make_config(config, execution)
         kwargs.pop("subgraphs", None)
 
         try:
@@ -271,13 +507,16 @@ class Viewport:
                         last_node = node_name
                         result = node_result
 
-            await self._emit_edge("__end__")
-            await self.broadcast({"type": "run_end", "run_id": run_id})
+            await execution._emit_edge("__end__")
+            await execution.broadcast({"type": "run_end", "run_id": execution.run_id})
         except Exception:
-            await self._emit_error(last_node)
+            await execution._emit_error(last_node)
             raise
         finally:
-            await self.shutdown()
+            await execution.settle()
+            self.executions.discard(execution)
+            if not self.persistent:
+                await self.shutdown()
 
         return result
 
@@ -287,11 +526,12 @@ class Viewport:
     async def astream(
         self, input: Any, config: Any = None, **kwargs: Any
     ) -> AsyncIterator:
-        run_id = uuid.uuid4().hex[:8]
-        await self.broadcast({"type": "run_start", "run_id": run_id})
+        execution = Execution(self)
+        self.executions.add(execution)
+        await execution.broadcast({"type": "run_start", "run_id": execution.run_id})
 
         last_node = "__start__"
-        merged_config = self._make_config(config)
+        merged_config = self._make_config(config, execution)
         stream_mode = kwargs.get("stream_mode", "values")
         kwargs.pop("subgraphs", None)
 
@@ -307,12 +547,15 @@ class Viewport:
                 if not namespace:
                     yield chunk
 
-            await self._emit_edge("__end__")
+            await execution._emit_edge("__end__")
 
-            await self.broadcast({"type": "run_end", "run_id": run_id})
+            await execution.broadcast({"type": "run_end", "run_id": execution.run_id})
         except Exception:
-            await self._emit_error(last_node)
+            await execution._emit_error(last_node)
             raise
+        finally:
+            await execution.settle()
+            self.executions.discard(execution)
 
     def stream(self, input: Any, config: Any = None, **kwargs: Any) -> Iterator:
         loop = asyncio.new_event_loop()
@@ -1,28 +1,43 @@
+import hashlib
+import json
+from importlib import metadata
 from typing import Any
 
 from langgraph.graph.state import CompiledStateGraph
 
+from .cache import read_json, write_json
 
-def extract(graph: Any) -> dict[str, Any]:
+
+def extract(
+    graph: Any, pending: dict[str, Any] | None = None, prefix: str = ""
+) -> dict[str, Any]:
+    # With `pending`, subgraph bodies are left collapsed and their compiled graphs
+    # are collected by full node id so they can be extracted on demand.
     raw = graph.get_graph()
 
+    nodes = []
+    for node_id, node in raw.nodes.items():
+        entry: dict[str, Any] = {
+            "id": node_id,
+            "name": node.name,
+            "node_type": {
+                "__end__": "end",
+                "__start__": "start",
+            }.get(node.name, "node"),
+        }
+        if isinstance(node.data, CompiledStateGraph):
+            path = f"{prefix}:{node_id}" if prefix else node_id
+            entry["node_type"] = "subgraph"
+            if pending is None:
+                entry["subgraph"] = extract(node.data, None, path)
+            else:
+                pending[path] = node.data
+                entry["collapsed"] = True
+        nodes.append(entry)
+
     return {
         "type": "graph",
-        "nodes": [
-            {
-                "id": node_id,
-                "name": node.name,
-                "node_type": {
-                    "__end__": "end",
-                    "__start__": "start",
-                }.get(node.name, "node"),
-                **({
-                   "node_type": "subgraph",
-                   "subgraph": extract(node.data),
-               } if isinstance(node.data, CompiledStateGraph) else {})
-            }
-            for node_id, node in raw.nodes.items()
-        ],
+        "nodes": nodes,
         "edges": [
             {
                 "id": f"e{i}",
@@ -34,3 +49,85 @@ def extract(graph: Any) -> dict[str, Any]:
             for i, edge in enumerate(raw.edges)
         ],
     }
+
+
+def edge_lookup(
+    topology: dict[str, Any], prefix: str = "", out: dict[tuple[str, str], str] | None = None
+) -> dict[tuple[str, str], str]:
+    out = {} if out is None else out
+    scope = f"{prefix}:" if prefix else ""
+    for e in topology["edges"]:
+        out[(f"{scope}{e['source']}", f"{scope}{e['target']}")] = f"{scope}{e['id']}"
+    for node in topology["nodes"]:
+        if node.get("node_type") == "subgraph" and node.get("subgraph"):
+            edge_lookup(node["subgraph"], f"{scope}{node['id']}", out)
+    return out
+
+
+def _structure(graph: CompiledStateGraph) -> dict[str, Any]:
+    builder = graph.builder
+    return {
+        "nodes": {
+            name: [
+                _structure(spec.runnable) if isinstance(spec.runnable, CompiledStateGraph) else None,
+                sorted(map(str, spec.ends or ())),
+            ]
+            for name, spec in builder.nodes.items()
+        },
+        "edges": sorted(builder.edges),
+        "waiting": sorted([sorted(starts), end] for starts, end in builder.waiting_edges),
+        "branches": {
+            source: {
+                name: [
+                    sorted(map(str, branch.ends.items())) if branch.ends else None,
+                    repr(getattr(getattr(branch.path, "func", None), "__annotations__", {}).get("return")),
+                ]
+                for name, branch in branches.items()
+            }
+            for source, branches in builder.branches.items()
+        },
+    }
+
+
+def fingerprint(graph: Any) -> str | None:
+    if not isinstance(graph, CompiledStateGraph):
+        return None
+    versions = []
+    for package in ("langgraph", "langgraphics"):
+        try:
+            versions.append(metadata.version(package))
+        except metadata.PackageNotFoundError:
+            versions.append(None)
+    try:
+        spec = json.dumps([versions, _structure(graph)], default=str)
+    except (AttributeError, TypeError):
+        return None
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def _collapsed(graph: CompiledStateGraph, topology: dict[str, Any], pending: dict[str, Any]) -> bool:
+    # The compiled graphs behind a cached lazy topology's collapsed nodes,
+    # found again by node name; False if one of them cannot be.
+    found = {}
+    for node in topology["nodes"]:
+        if node.get("collapsed"):
+            spec = graph.builder.nodes.get(node["id"])
+            if not isinstance(runnable := getattr(spec, "runnable", None), CompiledStateGraph):
+                return False
+            found[node["id"]] = runnable
+    pending.update(found)
+    return True
+
+
+def load(graph: Any, pending: dict[str, Any] | None = None) -> dict[str, Any]:
+    # Eager and lazy topologies are cached apart: a lazy one keeps its
+    # subgraphs collapsed, and their compiled graphs are collected on a hit.
+    key = fingerprint(graph)
+    name = f"topology/{key}.json" if pending is None else f"topology/{key}.lazy.json"
+    if key is not None and (cached := read_json(name)) is not None:
+        if pending is None or _collapsed(graph, cached, pending):
+            return cached
+    topology = extract(graph, pending)
+    if key is not None:
+        write_json(name, topology)
+    return topology
@@ -1,30 +1,69 @@
 import json
+import threading
 import time
+import urllib.error
 import urllib.request
-from pathlib import Path
 
+from .cache import read_json, write_bytes, write_json
+from .pricing import refresh
 
-def sync() -> None:
+MODELS_URL = (
+    "https://raw.githubusercontent.com/"
+    "proactive-agent/langgraphics/main/"
+    "langgraphics/metadata/models.json"
+)
+SYNC_INTERVAL = 24 * 60 * 60
+SYNC_TIMEOUT = 5
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+
+
+def sync(url: str = MODELS_URL, timeout: float = SYNC_TIMEOUT) -> bool:
+    # Conditional refresh of the models metadata into the user cache dir;
+    # returns whether a new copy was stored.
     now = time.time()
-    metadata_dir = Path(__file__).parent / "metadata"
-    sync_time = metadata_dir / ".sync_time"
-    if sync_time.exists():
-        try:
-            last = float(sync_time.read_text().strip())
-            if now - last < 24 * 60 * 60:
-                return
-        except (ValueError, OSError):
-            pass
+    meta = read_json("models.meta.json")
+    meta = meta if isinstance(meta, dict) else {}
+    if now - meta.get("checked", 0) < SYNC_INTERVAL:
+        return False
 
+    request = urllib.request.Request(url)
+    if read_json("models.json") is not None:
+        if meta.get("etag"):
+            request.add_header("If-None-Match", meta["etag"])
+        if meta.get("last_modified"):
+            request.add_header("If-Modified-Since", meta["last_modified"])
     try:
-        with urllib.request.urlopen((
-                "https://raw.githubusercontent.com/"
-                "proactive-agent/langgraphics/main/"
-                "langgraphics/metadata/models.json"
-        ), timeout=5) as models:
-            data = models.read()
-        json.loads(data)
-        (metadata_dir / "models.json").write_bytes(data)
-        sync_time.write_text(str(now))
-    except (TypeError, Exception):
-        pass
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+            headers = response.headers
+        models = json.loads(data)
+        if not isinstance(models, dict):
+            return False
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            write_json("models.meta.json", {**meta, "checked": now})
+        return False
+    except (OSError, ValueError):
+        return False
+
+    write_bytes("models.json", data)
+    write_json("models.meta.json", {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "checked": now,
+    })
+    refresh(models)
+    return True
+
+
+def sync_in_background(url: str = MODELS_URL, timeout: float = SYNC_TIMEOUT) -> threading.Thread:
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(
+                target=sync, args=(url, timeout), name="langgraphics-sync", daemon=True
+            )
+            _thread.start()
+        return _thread
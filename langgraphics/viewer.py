@@ -0,0 +1,83 @@
+import argparse
+import os
+import threading
+import webbrowser
+from pathlib import Path
+from typing import Any
+
+from .broadcaster import DEFAULT_HISTORY_SIZE, Broadcaster
+from .encoding import ENCODER, PAYLOAD_FIELDS
+from .watch import DEFAULT_HTTP_PORT, DEFAULT_WS_PORT, start_http_server, start_ws_server
+
+
+def read_trace(path: str | os.PathLike[str]) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    # The last graph header wins; a line cut short by a crashed writer is skipped.
+    topology: dict[str, Any] | None = None
+    events = []
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                event = ENCODER.loads(line)
+            except ValueError:
+                continue
+            if event.get("type") == "graph":
+                topology = event
+            else:
+                events.append(event)
+    if topology is None:
+        raise ValueError(f"{path} is not a langgraphics trace")
+    return topology, events
+
+
+def replay(path: str | os.PathLike[str], history_size: int = DEFAULT_HISTORY_SIZE) -> Broadcaster:
+    # Loads a recorded trace into a Broadcaster as finished runs, served exactly
+    # like the history of a live viewer.
+    topology, events = read_trace(path)
+    runs = sum(e["type"] == "run_start" for e in events)
+    manager = Broadcaster(topology, queue_size=len(events) + 1, history_size=max(history_size, runs))
+    for event in events:
+        if event["type"] == "blob":
+            manager.blobs.put(event["body"])
+            continue
+        for field in PAYLOAD_FIELDS:
+            if event.get(field) is not None and not isinstance(event[field], str):
+                event[field] = ENCODER.raw(event[field])
+        manager.publish(event)
+    return manager
+
+
+def view(
+    path: str | os.PathLike[str],
+    host: str = "localhost",
+    port: int = DEFAULT_HTTP_PORT,
+    ws_port: int = DEFAULT_WS_PORT,
+    open_browser: bool = True,
+) -> Broadcaster:
+    manager = replay(path)
+    runs = [e["run_id"] for e in manager.queue if e["type"] == "run_start"]
+    start_http_server(host, port, manager.blobs)
+    start_ws_server(manager, host, ws_port)
+    for run_id in runs:
+        print(f"http://{host}:{port}?inspect=full&ws_port={ws_port}&run_id={run_id}")
+    if open_browser and runs:
+        webbrowser.open(f"http://{host}:{port}?inspect=full&ws_port={ws_port}&run_id={runs[-1]}")
+    return manager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="View a trace recorded with watch(record=...).")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_HTTP_PORT)
+    parser.add_argument("--ws-port", type=int, default=DEFAULT_WS_PORT)
+    parser.add_argument("--no-browser", action="store_true")
+    args = parser.parse_args()
+    view(args.path, args.host, args.port, args.ws_port, not args.no_browser)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,130 @@
 import asyncio
+import os
 import threading
 import webbrowser
 from functools import partial
+from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler
 from pathlib import Path
 from socketserver import TCPServer
 from typing import Literal, TypeVar, cast
 from websockets.asyncio.server import serve
 
-from .broadcaster import Broadcaster
-from .streamer import Viewport
-from .topology import extract
-from .upstream import sync
+from .blobs import DEFAULT_BLOB_STORE_SIZE, BlobStore
+from .budget import DEFAULT_EVENT_BUDGET, DEFAULT_FIELD_BUDGET
+from .broadcaster import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_REPLAY_SIZE,
+    DEFAULT_SEND_QUEUE_SIZE,
+    Broadcaster,
+    PayloadMode,
+    SlowConsumerPolicy,
+)
+from .encoding import DEFAULT_MAX_DEPTH, DEFAULT_MAX_ITEMS, DEFAULT_MAX_STRING, ENCODER, Backend, Encoder, Wire
+from .index import TopologyIndex
+from .pricing import warm
+from .recorder import Recorder
+from .store import DEFAULT_RETENTION_BYTES, DEFAULT_RETENTION_RUNS, TraceStore
+from .streamer import DEFAULT_MAX_TRACKED_STATES, Viewport
+from .topology import edge_lookup, load
+from .upstream import sync_in_background
 
 ANY_GRAPH = TypeVar("ANY_GRAPH")
 DEFAULT_HTTP_PORT = 8764
 DEFAULT_WS_PORT = 8765
+STREAM_CHUNK = 1024
 
 
-def start_http_server(host: str, port: int) -> TCPServer:
+class Handler(SimpleHTTPRequestHandler):
+    # Static viewer files, plus /blobs/<id> for externalized payloads and
+    # images, with single byte-range support for partial reads, and /runs
+    # (/runs/<id>) listing and streaming the runs of a trace store.
+    def do_GET(self) -> None:
+        if self.path.startswith("/blobs/"):
+            self.send_blob(head=False)
+        elif self.path == "/runs" or self.path.startswith("/runs/"):
+            self.send_runs()
+        else:
+            super().do_GET()
+
+    def do_HEAD(self) -> None:
+        if self.path.startswith("/blobs/"):
+            self.send_blob(head=True)
+        else:
+            super().do_HEAD()
+
+    def send_blob(self, head: bool) -> None:
+        blob_id = self.path[len("/blobs/"):].split("?", 1)[0]
+        blobs: BlobStore | None = getattr(self.server, "blobs", None)
+        found = blobs.read(blob_id) if blobs is not None else None
+        if found is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        data, content_type = found
+        status, start, end = HTTPStatus.OK, 0, len(data)
+        if (spec := self.headers.get("Range", "")).startswith("bytes=") and "," not in spec:
+            first, _, last = spec[6:].strip().partition("-")
+            try:
+                if first:
+                    start, end = int(first), min(int(last) + 1 if last else len(data), len(data))
+                else:
+                    start = max(len(data) - int(last), 0)
+            except ValueError:
+                start, end = -1, 0
+            if not 0 <= start < end:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            status = HTTPStatus.PARTIAL_CONTENT
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", "max-age=31536000, immutable")
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        if not head:
+            self.wfile.write(data[start:end])
+
+    def send_runs(self) -> None:
+        store: TraceStore | None = getattr(self.server, "store", None)
+        run_id = self.path[len("/runs/"):].split("?", 1)[0] if self.path.startswith("/runs/") else None
+        if store is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if run_id is None:
+            data = ENCODER.raw(store.list_runs()).encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if not (events := store.events(run_id)):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        # One event per line, written in chunks as they are encoded.
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for start in range(0, len(events), STREAM_CHUNK):
+            chunk = events[start:start + STREAM_CHUNK]
+            self.wfile.write("".join(f"{message}\n" for _, message in chunk).encode())
+        self.close_connection = True
+
+
+def start_http_server(
+    host: str, port: int, blobs: BlobStore | None = None, store: TraceStore | None = None
+) -> TCPServer:
     static = Path(__file__).parent / "static"
-    handler = partial(SimpleHTTPRequestHandler, directory=static)
+    handler = partial(Handler, directory=static)
     server = TCPServer((host, port), handler)
+    server.blobs = blobs
+    server.store = store
     threading.Thread(target=server.serve_forever, daemon=True).start()
     return server
 
@@ -29,6 +132,7 @@ def start_http_server(host: str, port: int) -> TCPServer:
 def start_ws_server(manager: Broadcaster, host: str, port: int) -> None:
     async def run() -> None:
         manager.loop = asyncio.get_running_loop()
+        manager.drainer = asyncio.create_task(manager.drain())
         manager.server = await serve(manager.handler, host, port)
         await manager.server.wait_closed()
 
@@ -51,35 +155,86 @@ def watch(
     mode: Literal["auto", "manual"] = "auto",
     inspect: Literal["off", "tree", "full"] = "off",
     theme: Literal["system", "dark", "light"] = "system",
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    batch_ms: int = 0,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    send_queue_size: int = DEFAULT_SEND_QUEUE_SIZE,
+    slow_consumer: SlowConsumerPolicy = "drop",
+    replay_size: int = DEFAULT_REPLAY_SIZE,
+    state_mode: Literal["full", "delta"] = "full",
+    payloads: PayloadMode = "eager",
+    blob_store_size: int = DEFAULT_BLOB_STORE_SIZE,
+    persistent: bool = False,
+    history_size: int = DEFAULT_HISTORY_SIZE,
+    max_tracked_states: int = DEFAULT_MAX_TRACKED_STATES,
+    compact_ids: bool = False,
+    lazy_subgraphs: bool = False,
+    wire: Wire = "structured",
+    encoder: Backend = "auto",
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    max_string: int = DEFAULT_MAX_STRING,
+    max_items: int = DEFAULT_MAX_ITEMS,
+    payload_workers: int = 0,
+    field_budget: int = DEFAULT_FIELD_BUDGET,
+    event_budget: int = DEFAULT_EVENT_BUDGET,
+    record: str | os.PathLike[str] | None = None,
+    store: str | os.PathLike[str] | None = None,
+    retention_runs: int = DEFAULT_RETENTION_RUNS,
+    retention_bytes: int = DEFAULT_RETENTION_BYTES,
 ) -> ANY_GRAPH:
-    sync()
-    topology = extract(graph)
-    manager = Broadcaster(topology)
-
-    def collect_subgraph_edges(nodes: list, prefix: str) -> None:
-        for node in nodes:
-            if node.get("node_type") == "subgraph" and node.get("subgraph"):
-                pid = f"{prefix}:{node['id']}" if prefix else node["id"]
-                for e in node["subgraph"]["edges"]:
-                    edge_lookup[(f"{pid}:{e['source']}", f"{pid}:{e['target']}")] = f"{pid}:{e['id']}"
-                collect_subgraph_edges(node["subgraph"]["nodes"], pid)
-
-    edge_lookup = {(e["source"], e["target"]): e["id"] for e in topology["edges"]}
-    collect_subgraph_edges(topology["nodes"], "")
-
-    http_server = start_http_server(host, port)
-    start_ws_server(manager, host, ws_port)
-
-    if open_browser:
-        defaults = (
-            ("mode", mode, "auto"),
-            ("theme", theme, "system"),
-            ("inspect", inspect, "off"),
-            ("direction", direction, "TB"),
-            ("ws_port", ws_port, DEFAULT_WS_PORT),
+    # Limits and backend belong to this viewer; other watch() calls keep theirs.
+    encoding = Encoder(max_depth, max_string, max_items, encoder)
+    if record is None:
+        warm()
+        sync_in_background()
+    # Compact ids number every edge upfront, so they need the full topology.
+    pending = {} if lazy_subgraphs and not compact_ids else None
+    topology = load(graph, pending)
+    index = TopologyIndex(edge_lookup(topology))
+    if compact_ids:
+        topology = {**topology, "index": index.to_message()}
+
+    manager: Broadcaster | Recorder
+    http_server: TCPServer | None = None
+    if record is not None:
+        # Headless: the event stream goes to a trace file; no servers, no browser.
+        manager = Recorder(record, topology, blob_store_size, encoding)
+    else:
+        manager = Broadcaster(
+            topology,
+            queue_size=queue_size,
+            batch_ms=batch_ms,
+            batch_size=batch_size,
+            send_queue_size=send_queue_size,
+            slow_consumer=slow_consumer,
+            replay_size=replay_size,
+            payloads=payloads,
+            blob_store_size=blob_store_size,
+            history_size=history_size,
+            wire=wire,
+            store=TraceStore(store, retention_runs=retention_runs, retention_bytes=retention_bytes) if store else None,
+            encoder=encoding,
         )
-        params = [f"{k}={v}" for k, v, default in defaults if v != default]
-        query = ("?" + "&".join(params)) if params else ""
-        webbrowser.open(f"http://{host}:{port}{query}")
 
-    return cast(ANY_GRAPH, Viewport(graph, manager, edge_lookup, http_server))
+        http_server = start_http_server(host, port, manager.blobs, manager.store)
+        start_ws_server(manager, host, ws_port)
+
+        if open_browser:
+            defaults = (
+                ("mode", mode, "auto"),
+                ("theme", theme, "system"),
+                ("inspect", inspect, "off"),
+                ("direction", direction, "TB"),
+                ("ws_port", ws_port, DEFAULT_WS_PORT),
+            )
+            params = [f"{k}={v}" for k, v, default in defaults if v != default]
+            query = ("?" + "&".join(params)) if params else ""
+            webbrowser.open(f"http://{host}:{port}{query}")
+
+    return cast(ANY_GRAPH, Viewport(
+        graph, manager, index, http_server,
+        state_mode=state_mode, persistent=persistent,
+        max_tracked_states=max_tracked_states, compact_ids=compact_ids,
+        pending=pending, payload_workers=payload_workers,
+        field_budget=field_budget, event_budget=event_budget,
+    ))
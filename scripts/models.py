@@ -1,5 +1,6 @@
 import json
 import pathlib
+import sys
 
 import requests
 
@@ -33,3 +34,9 @@ datadir_path = rootdir_path / "langgraphics" / "metadata"
 
 with open(datadir_path / "models.json", "w", encoding="utf-8") as fp:
     json.dump(models, fp, ensure_ascii=False, indent=2)
+
+sys.path.insert(0, str(rootdir_path))
+from langgraphics.pricing import compile_prices  # noqa: E402
+
+with open(datadir_path / "prices.json", "w", encoding="utf-8") as fp:
+    json.dump(compile_prices(models), fp, ensure_ascii=False, separators=(",", ":"))
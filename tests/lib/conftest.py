@@ -9,6 +9,15 @@ import pytest
 import websockets
 from langgraph.graph import END, StateGraph
 
+from langgraphics import pricing
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LANGGRAPHICS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(pricing, "_index", None)
+    return tmp_path / "cache"
+
 
 def find_free_port() -> int:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -80,9 +89,38 @@ def error_graph() -> StateGraph:
     return builder.compile()
 
 
+@pytest.fixture
+def nested_graph() -> StateGraph:
+    def step_x(state: SimpleState) -> dict:
+        return {"value": state["value"] + "_x"}
+
+    def step_y(state: SimpleState) -> dict:
+        return {"value": state["value"] + "_y"}
+
+    inner = StateGraph(SimpleState)
+    inner.add_node("x", step_x)
+    inner.add_node("y", step_y)
+    inner.set_entry_point("x")
+    inner.add_edge("x", "y")
+    inner.add_edge("y", END)
+
+    middle = StateGraph(SimpleState)
+    middle.add_node("inner", inner.compile())
+    middle.set_entry_point("inner")
+    middle.add_edge("inner", END)
+
+    builder = StateGraph(SimpleState)
+    builder.add_node("outer", middle.compile())
+    builder.add_node("after", step_y)
+    builder.set_entry_point("outer")
+    builder.add_edge("outer", "after")
+    builder.add_edge("after", END)
+    return builder.compile()
+
+
 @asynccontextmanager
 async def ws_collect(
-    ws_port: int, timeout: float = 15.0
+    ws_port: int, timeout: float = 15.0, detail: str | None = None
 ) -> AsyncIterator[tuple[list[dict], asyncio.Event]]:
     messages: list[dict] = []
     done = asyncio.Event()
@@ -99,15 +137,18 @@ async def ws_collect(
 
         if ws is None:
             raise RuntimeError(f"Could not connect to ws://localhost:{ws_port}")
+        if detail is not None:
+            await ws.send(json.dumps({"type": "subscribe", "detail": detail}))
 
         try:
             async for raw in ws:
-                msg = json.loads(raw)
-                messages.append(msg)
-                if msg["type"] == "graph":
-                    connected.set()
-                if msg["type"] in ("run_end", "error"):
-                    done.set()
+                frame = json.loads(raw)
+                for msg in frame if isinstance(frame, list) else [frame]:
+                    messages.append(msg)
+                    if msg["type"] == "graph":
+                        connected.set()
+                    if msg["type"] in ("run_end", "error"):
+                        done.set()
         except websockets.ConnectionClosed:
             if not done.is_set():
                 done.set()
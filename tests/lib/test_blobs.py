@@ -0,0 +1,20 @@
+from langgraphics.blobs import BlobStore
+
+
+def test_identical_bodies_share_one_blob():
+    store = BlobStore()
+    assert store.put("abc") == store.put("abc")
+    assert len(store.blobs) == 1
+    assert store.size == 3
+
+
+def test_least_recently_used_blobs_are_evicted():
+    store = BlobStore(capacity=8)
+    first, second = store.put("aaaa"), store.put("bbbb")
+    store.get(first)
+    third = store.put("cccc")
+
+    assert store.get(second) is None
+    assert store.get(first) == "aaaa"
+    assert store.get(third) == "cccc"
+    assert store.size == 8
@@ -0,0 +1,474 @@
+import asyncio
+import json
+
+from langgraphics.broadcaster import Broadcaster
+from langgraphics.interning import Interner
+
+TOPOLOGY = {"type": "graph", "nodes": [], "edges": []}
+
+
+class FakeConnection:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.closed = False
+        self.sent: list[str] = []
+
+    async def send(self, message: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def start(manager: Broadcaster, *connections: FakeConnection) -> None:
+    manager.loop = asyncio.get_running_loop()
+    manager.drainer = asyncio.create_task(manager.drain())
+    for connection in connections:
+        manager.connect(connection)
+
+
+def events(connection: FakeConnection) -> list[dict]:
+    out = []
+    for raw in connection.sent:
+        frame = json.loads(raw)
+        out.extend(frame if isinstance(frame, list) else [frame])
+    return out
+
+
+def test_publish_does_not_block_without_loop():
+    manager = Broadcaster(TOPOLOGY)
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+
+    assert manager.stats == {
+        "queued": 2, "dropped": 0, "pending": 2, "detail": "none", "runs": [], "connections": [],
+    }
+
+
+def test_overflow_drops_payload_events_only():
+    manager = Broadcaster(TOPOLOGY, queue_size=2)
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "node_output", "node_id": "a"})
+    manager.publish({"type": "node_output", "node_id": "b"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+
+    assert [m["type"] for m in manager.queue] == ["run_start", "node_output", "edge_active"]
+    assert manager.stats["queued"] == 3
+    assert manager.stats["dropped"] == 1
+
+
+async def test_drain_sends_in_order_and_records_replay():
+    manager = Broadcaster(TOPOLOGY)
+    connection = FakeConnection()
+    start(manager, connection)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    await asyncio.sleep(0)
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+    manager.publish({"type": "node_output", "node_id": "b"})
+    await manager.shutdown()
+
+    assert [m["type"] for m in events(connection)] == [
+        "graph", "run_start", "edge_active", "node_output",
+    ]
+    assert [m for _, _, m in manager.replay] == connection.sent[1:]
+    assert manager.stats["pending"] == 0
+
+
+async def test_event_that_fails_to_encode_is_dropped_not_fatal():
+    manager = Broadcaster(TOPOLOGY)
+    connection = FakeConnection()
+    start(manager, connection)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "node_output", "node_id": "a", "status": object()})
+    manager.publish({"type": "run_end", "run_id": "abc"})
+    await manager.shutdown()
+
+    assert [m["type"] for m in events(connection)] == ["graph", "run_start", "run_end"]
+    assert manager.stats["dropped"] == 1
+
+
+async def test_batching_coalesces_events_into_one_frame():
+    manager = Broadcaster(TOPOLOGY, batch_ms=20)
+    connection = FakeConnection()
+    start(manager, connection)
+    await asyncio.sleep(0.01)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+    manager.publish({"type": "node_output", "node_id": "b"})
+    await asyncio.sleep(0.05)
+    manager.publish({"type": "run_end", "run_id": "abc"})
+    await manager.shutdown()
+
+    assert len(connection.sent) == 3
+    frame = json.loads(connection.sent[1])
+    assert [m["type"] for m in frame] == ["run_start", "edge_active", "node_output"]
+    assert json.loads(connection.sent[2])["type"] == "run_end"
+
+
+async def test_batch_size_splits_frames():
+    manager = Broadcaster(TOPOLOGY, batch_ms=20, batch_size=2)
+    connection = FakeConnection()
+    start(manager, connection)
+    await asyncio.sleep(0.01)
+
+    for i in range(5):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}"})
+    await manager.shutdown()
+
+    assert [len(json.loads(m)) if m.startswith("[") else 1 for m in connection.sent[1:]] == [2, 2, 1]
+
+
+async def test_new_connection_receives_topology_and_replay():
+    manager = Broadcaster(TOPOLOGY)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection)
+    manager.publish({"type": "run_end", "run_id": "abc"})
+    await manager.shutdown()
+
+    assert [m["type"] for m in events(connection)] == [
+        "graph", "run_start", "edge_active", "run_end",
+    ]
+
+
+async def test_slow_connection_does_not_hold_back_fast_one():
+    manager = Broadcaster(TOPOLOGY, send_queue_size=4)
+    fast, slow = FakeConnection(), FakeConnection(delay=1)
+    start(manager, fast, slow)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    for i in range(10):
+        manager.publish({"type": "node_output", "node_id": f"n{i}"})
+    await asyncio.sleep(0.05)
+
+    assert len(events(fast)) == 12
+    lagging = next(s for s in manager.stats["connections"] if s["sent"] == 0)
+    assert lagging["dropped"] > 0
+    assert lagging["lag"] > 0
+
+    for connection in manager.connections:
+        connection.writer.cancel()
+    manager.connections.clear()
+    await manager.shutdown()
+
+
+async def test_drop_policy_keeps_structural_events():
+    manager = Broadcaster(TOPOLOGY, send_queue_size=3)
+    slow = FakeConnection(delay=1)
+    start(manager, slow)
+    await asyncio.sleep(0)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "node_output", "node_id": "a"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+    manager.publish({"type": "node_output", "node_id": "b"})
+    manager.publish({"type": "edge_active", "source": "b", "target": "c", "edge_id": "e1"})
+    await asyncio.sleep(0.01)
+
+    connection = next(iter(manager.connections))
+    assert [t for t, _, _ in connection.queue] == ["run_start", "edge_active", "edge_active"]
+    connection.writer.cancel()
+    manager.connections.clear()
+    await manager.shutdown()
+
+
+async def test_snapshot_policy_collapses_backlog_to_a_snapshot():
+    manager = Broadcaster(TOPOLOGY, send_queue_size=3, slow_consumer="snapshot")
+    slow = FakeConnection(delay=1)
+    start(manager, slow)
+    await asyncio.sleep(0)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    for i in range(3):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}"})
+    await asyncio.sleep(0.01)
+
+    connection = next(iter(manager.connections))
+    assert [t for t, _, _ in connection.queue] == ["snapshot", "edge_active"]
+    snapshot = json.loads(connection.queue[0][1])
+    assert snapshot["run_id"] == "abc" and snapshot["seq"] == 3 and list(snapshot["edges"]) == ["e0", "e1"]
+    assert connection.dropped == 3
+    connection.writer.cancel()
+    manager.connections.clear()
+    await manager.shutdown()
+
+
+async def test_snapshot_policy_snapshots_the_followed_run():
+    manager = Broadcaster(TOPOLOGY, send_queue_size=3, slow_consumer="snapshot")
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "r1", "channel": "r1"})
+    manager.publish({"type": "run_start", "run_id": "r2", "channel": "r2"})
+    await asyncio.sleep(0.01)
+    manager.connect(FakeConnection(delay=1), run_id="r1")
+    for i in range(4):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}", "channel": "r1"})
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"x{i}", "channel": "r2"})
+    await asyncio.sleep(0.01)
+
+    connection = next(iter(manager.connections))
+    assert [t for t, _, _ in connection.queue] == ["snapshot", "edge_active", "edge_active"]
+    snapshot = json.loads(connection.queue[0][1])
+    assert snapshot["run_id"] == "r1" and list(snapshot["edges"]) == ["e0", "e1"]
+    assert [json.loads(m)["edge_id"] for _, m, _ in list(connection.queue)[1:]] == ["e2", "e3"]
+    connection.writer.cancel()
+    manager.connections.clear()
+    await manager.shutdown()
+
+
+async def test_disconnect_policy_closes_slow_connection():
+    manager = Broadcaster(TOPOLOGY, send_queue_size=2, slow_consumer="disconnect")
+    slow = FakeConnection(delay=1)
+    start(manager, slow)
+    await asyncio.sleep(0)
+
+    for i in range(4):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}"})
+    await asyncio.sleep(0.01)
+
+    assert slow.closed
+    connection = next(iter(manager.connections))
+    connection.writer.cancel()
+    manager.connections.clear()
+    await manager.shutdown()
+
+
+async def test_evicted_events_are_compacted_into_snapshot():
+    manager = Broadcaster(TOPOLOGY, replay_size=2)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "__start__", "target": "a", "edge_id": "e0"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e1"})
+    manager.publish({"type": "edge_active", "source": "b", "target": "c", "edge_id": "e2"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection)
+    await manager.shutdown()
+
+    received = events(connection)
+    assert [m["type"] for m in received] == ["graph", "snapshot", "edge_active", "edge_active"]
+    assert received[1]["run_id"] == "abc"
+    assert received[1]["nodes"] == {"a": "active"}
+    assert [m["edge_id"] for m in received[2:]] == ["e1", "e2"]
+    assert len(manager.replay) == 2
+
+
+async def test_events_carry_increasing_sequence_numbers():
+    manager = Broadcaster(TOPOLOGY)
+    connection = FakeConnection()
+    start(manager, connection)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0"})
+    manager.publish({"type": "run_end", "run_id": "abc"})
+    await manager.shutdown()
+
+    assert [m.get("seq") for m in events(connection)] == [None, 1, 2, 3]
+
+
+async def test_reconnect_with_last_seq_receives_only_missing_events():
+    manager = Broadcaster(TOPOLOGY)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    for i in range(4):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection, last_seq=3)
+    await manager.shutdown()
+
+    assert [(m["type"], m["seq"]) for m in events(connection)] == [
+        ("edge_active", 4), ("edge_active", 5),
+    ]
+
+
+async def test_reconnect_receives_subgraphs_expanded_since_last_seq():
+    topology = {"type": "graph", "nodes": [{"id": "sub", "node_type": "subgraph", "collapsed": True}], "edges": []}
+    manager = Broadcaster(topology)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "sub", "edge_id": "e0"})
+    manager.publish({"type": "subgraph", "id": "sub", "subgraph": {"nodes": [], "edges": []}})
+    manager.publish({"type": "edge_active", "source": "sub", "target": "b", "edge_id": "e1"})
+    await asyncio.sleep(0.01)
+    before, after = FakeConnection(), FakeConnection()
+    manager.connect(before, last_seq=2)
+    manager.connect(after, last_seq=3)
+    await manager.shutdown()
+
+    assert [(m["type"], m["seq"]) for m in events(before)] == [("subgraph", 3), ("edge_active", 4)]
+    assert [(m["type"], m["seq"]) for m in events(after)] == [("edge_active", 4)]
+
+
+async def test_reconnect_falls_back_to_snapshot_when_range_evicted():
+    manager = Broadcaster(TOPOLOGY, replay_size=2)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "abc"})
+    for i in range(4):
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": f"e{i}"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection, last_seq=1)
+    await manager.shutdown()
+
+    received = events(connection)
+    assert [m["type"] for m in received] == ["graph", "snapshot", "edge_active", "edge_active"]
+    assert received[1]["seq"] == 3
+    assert [m["seq"] for m in received[2:]] == [4, 5]
+
+
+async def test_lazy_payloads_are_served_on_request():
+    manager = Broadcaster(TOPOLOGY, payloads="lazy")
+    connection = FakeConnection()
+    start(manager, connection)
+
+    body = json.dumps([{"role": "ai", "content": "hello"}])
+    manager.publish({"type": "node_output", "node_id": "a", "input": None, "output": body, "state": None})
+    await asyncio.sleep(0.01)
+    message = events(connection)[-1]
+    assert message["output"] is None
+    assert message["sizes"] == {"output": len(body)}
+
+    live = next(iter(manager.connections))
+    manager.receive(live, json.dumps({"type": "fetch", "id": message["blobs"]["output"]}))
+    manager.receive(live, json.dumps({"type": "fetch", "id": "missing"}))
+    manager.receive(live, "not json")
+    await manager.shutdown()
+
+    assert events(connection)[-2:] == [
+        {"type": "blob", "id": message["blobs"]["output"], "body": body},
+        {"type": "blob", "id": "missing", "body": None},
+    ]
+    assert [t for _, t, _ in manager.replay] == ["node_output"]
+
+
+async def test_interned_payloads_send_each_message_once_per_run():
+    manager = Broadcaster(TOPOLOGY, payloads="interned", replay_size=2)
+    connection = FakeConnection()
+    start(manager, connection)
+
+    history = [{"role": "human", "content": "hi"}, {"role": "ai", "content": "hello"}]
+    state = {"messages": [{"content": "hi"}, {"content": "hello"}], "step": 2}
+    manager.publish({"type": "run_start", "run_id": "r1", "channel": "r1"})
+    for i in (1, 2):
+        # What the tracer's payload worker publishes in interned mode.
+        interner = Interner(manager.blobs)
+        message = {"type": "node_output", "node_id": f"n{i}", "channel": "r1", "state_id": i}
+        message["input"], inputs = interner.field(history[:i])
+        message["output"], outputs = interner.field(history[i - 1:i])
+        message["state"], keys = interner.state({**state, "messages": state["messages"][:i]})
+        message["refs"] = {"input": inputs, "output": outputs, "state": keys}
+        message["interned"] = interner.bodies
+        manager.publish(message)
+    await asyncio.sleep(0.01)
+    await manager.shutdown()
+
+    received = events(connection)
+    assert [m["type"] for m in received] == ["graph", "run_start", "intern", "node_output", "intern", "node_output"]
+    first, second = received[2]["messages"], received[4]["messages"]
+    assert len(first) == 2 and len(second) == 2 and not first.keys() & second.keys()
+    output = received[5]
+    assert output["input"] is None and output["output"] is None and "interned" not in output
+    assert output["state"] == {"messages": None, "step": 2}
+    table = {**first, **second}
+    assert [json.loads(table[i]) for i in output["refs"]["input"]] == history
+    assert [json.loads(table[i]) for i in output["refs"]["state"]["messages"]] == state["messages"]
+    assert [m["seq"] for m in received[1:]] == [1, 2, 3, 4, 5]
+
+    snapshot = manager.replays["r1"].snapshot
+    assert snapshot.state == {"messages": [{"content": "hi"}], "step": 2}
+
+
+async def test_detail_follows_the_most_demanding_subscriber():
+    manager = Broadcaster(TOPOLOGY)
+    start(manager)
+    assert manager.detail == "none"
+
+    first = manager.connect(FakeConnection())
+    second = manager.connect(FakeConnection())
+    assert manager.detail == "full"
+
+    manager.receive(first, json.dumps({"type": "subscribe", "detail": "none"}))
+    manager.receive(second, json.dumps({"type": "subscribe", "detail": "tree"}))
+    manager.receive(second, json.dumps({"type": "subscribe", "detail": "bogus"}))
+    assert manager.detail == "tree"
+
+    manager.disconnect(second)
+    assert manager.detail == "none"
+    await manager.shutdown()
+
+
+async def test_finished_runs_are_kept_in_history():
+    manager = Broadcaster(TOPOLOGY, history_size=1)
+    start(manager)
+
+    for run_id in ("r1", "r2"):
+        manager.publish({"type": "run_start", "run_id": run_id, "channel": run_id})
+        manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0", "channel": run_id})
+        manager.publish({"type": "run_end", "run_id": run_id, "channel": run_id})
+    await asyncio.sleep(0.01)
+    assert list(manager.history) == ["r2"]
+
+    connection = FakeConnection()
+    manager.connect(connection, run_id="r2")
+    manager.publish({"type": "run_start", "run_id": "r3", "channel": "r3"})
+    await manager.shutdown()
+
+    assert [(m["type"], m.get("channel")) for m in events(connection)] == [
+        ("graph", None), ("run_start", "r2"), ("edge_active", "r2"), ("run_end", "r2"),
+    ]
+
+
+async def test_live_run_is_followed_by_id_while_another_starts():
+    manager = Broadcaster(TOPOLOGY)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "r1", "channel": "r1"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0", "channel": "r1"})
+    manager.publish({"type": "run_start", "run_id": "r2", "channel": "r2"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e1", "channel": "r2"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection, run_id="r1")
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e2", "channel": "r2"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e3", "channel": "r1"})
+    manager.publish({"type": "run_end", "run_id": "r1", "channel": "r1"})
+    await manager.shutdown()
+
+    assert [(m["type"], m.get("edge_id"), m.get("channel")) for m in events(connection)] == [
+        ("graph", None, None), ("run_start", None, "r1"), ("edge_active", "e0", "r1"),
+        ("edge_active", "e3", "r1"), ("run_end", None, "r1"),
+    ]
+
+
+async def test_interleaved_runs_keep_separate_replays():
+    manager = Broadcaster(TOPOLOGY)
+    start(manager)
+
+    manager.publish({"type": "run_start", "run_id": "r1", "channel": "r1"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e0", "channel": "r1"})
+    manager.publish({"type": "run_start", "run_id": "r2", "channel": "r2"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e1", "channel": "r1"})
+    manager.publish({"type": "edge_active", "source": "a", "target": "b", "edge_id": "e2", "channel": "r2"})
+    manager.publish({"type": "run_end", "run_id": "r1", "channel": "r1"})
+    await asyncio.sleep(0.01)
+    connection = FakeConnection()
+    manager.connect(connection)
+    await manager.shutdown()
+
+    assert [(m["type"], m.get("edge_id")) for m in events(connection)] == [
+        ("graph", None), ("run_start", None), ("edge_active", "e2"),
+    ]
+    assert [t for t, _ in manager.history["r1"]] == ["run_start", "edge_active", "edge_active", "run_end"]
@@ -0,0 +1,114 @@
+import base64
+import json
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from langgraphics.blobs import BlobStore
+from langgraphics.budget import Budget
+from langgraphics.watch import start_http_server
+from tests.lib.conftest import find_free_port
+
+PNG = "data:image/png;base64," + base64.b64encode(b"\x89PNG" + bytes(2048)).decode()
+
+
+def documents(count: int, size: int) -> str:
+    return json.dumps([{"role": "document", "content": f"<{i}>" + "x" * size + f"</{i}>"} for i in range(count)])
+
+
+def test_small_payloads_are_untouched():
+    message = {"input": documents(2, 10), "output": None, "state": '{"value": "x"}'}
+    assert Budget(BlobStore()).fit(dict(message)) == message
+
+
+def test_patches_fit_only_when_small_and_free_of_images():
+    budget = Budget(BlobStore(), field_bytes=1024)
+    assert budget.fits([{"op": "add", "path": "/messages/-", "value": {"content": "ok"}}])
+    assert not budget.fits([{"op": "add", "path": "/messages/-", "value": {"content": "x" * 2048}}])
+    assert not budget.fits([{"op": "add", "path": "/image", "value": PNG[:512]}])
+    assert Budget(BlobStore(), field_bytes=0, event_bytes=0).fits([{"value": "x" * 2048}])
+
+
+def test_oversized_field_keeps_head_and_tail_of_each_string():
+    blobs = BlobStore()
+    body = documents(8, 20_000)
+    message = Budget(blobs, field_bytes=32 * 1024).fit({"output": body})
+
+    assert len(message["output"].encode()) <= 32 * 1024
+    contents = [d["content"] for d in json.loads(message["output"])]
+    assert all(c.startswith(f"<{i}>xxx") and c.endswith(f"xxx</{i}>") for i, c in enumerate(contents))
+    assert all("chars truncated" in c for c in contents)
+    assert message["truncated"]["output"] == {"id": blobs.put(body), "size": len(body)}
+    assert blobs.get(message["truncated"]["output"]["id"]) == body
+
+
+def test_fields_that_cannot_be_truncated_are_externalized():
+    blobs = BlobStore()
+    body = documents(2000, 20)
+    message = Budget(blobs, field_bytes=32 * 1024).fit({"output": body})
+
+    assert message["output"] is None and "truncated" not in message
+    assert blobs.get(message["blobs"]["output"]) == body
+
+
+def test_event_budget_externalizes_largest_fields():
+    blobs = BlobStore()
+    state = json.dumps({"docs": "y" * 50_000})
+    message = Budget(blobs, field_bytes=0, event_bytes=20_000).fit({"input": documents(1, 100), "state": state})
+
+    assert message["state"] is None and message["input"] is not None
+    assert blobs.get(message["blobs"]["state"]) == state
+    assert message["sizes"] == {"state": len(state)}
+
+
+def test_base64_images_move_to_blobs():
+    blobs = BlobStore()
+    content = [
+        {"type": "text", "text": "look"},
+        {"type": "image_url", "image_url": {"url": PNG}},
+        {"type": "image", "source_type": "base64", "mime_type": "image/jpeg", "data": "A" * 2048},
+    ]
+    message = Budget(blobs).fit({"state": json.dumps({"messages": [{"content": content}]})})
+
+    blocks = json.loads(message["state"])["messages"][0]["content"]
+    assert blocks[0] == {"type": "text", "text": "look"}
+    url, data = blocks[1]["image_url"]["url"], blocks[2]["data"]
+    assert url.startswith("/blobs/") and data.startswith("/blobs/")
+    assert blobs.read(url[len("/blobs/"):]) == (b"\x89PNG" + bytes(2048), "image/png")
+    assert blobs.read(data[len("/blobs/"):])[1] == "image/jpeg"
+
+
+@pytest.fixture
+def served():
+    blobs = BlobStore()
+    port = find_free_port()
+    server = start_http_server("127.0.0.1", port, blobs)
+    yield blobs, f"http://127.0.0.1:{port}/blobs/"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url: str, **headers: str):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+        return response.status, dict(response.headers), response.read()
+
+
+def test_blobs_are_served_with_ranges(served):
+    blobs, base = served
+    blob_id = blobs.put('{"body": "0123456789"}')
+
+    status, headers, body = fetch(base + blob_id)
+    assert (status, body) == (200, b'{"body": "0123456789"}')
+    assert headers["Accept-Ranges"] == "bytes"
+
+    status, headers, body = fetch(base + blob_id, Range="bytes=10-14")
+    assert (status, body, headers["Content-Range"]) == (206, b"01234", "bytes 10-14/22")
+    assert fetch(base + blob_id, Range="bytes=-2")[2] == b'"}'
+
+    with pytest.raises(HTTPError) as error:
+        fetch(base + blob_id, Range="bytes=40-")
+    assert error.value.code == 416
+    with pytest.raises(HTTPError) as error:
+        fetch(base + "missing")
+    assert error.value.code == 404
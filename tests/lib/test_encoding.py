@@ -0,0 +1,129 @@
+import dataclasses
+import json
+from datetime import datetime
+
+import pytest
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel, PrivateAttr
+
+from langgraphics import encoding
+from langgraphics.encoding import Encoder, dumps
+
+
+@pytest.fixture(params=["json", "orjson"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(encoding, "ENCODER", Encoder(backend=request.param))
+    return request.param
+
+
+class Client:
+    def __init__(self):
+        self.base_url = "http://api"
+        self._session = object()
+
+
+class Profile(BaseModel):
+    name: str
+    _token: str = PrivateAttr(default="secret")
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+
+def test_structured_wire_splices_payloads(backend):
+    message = {
+        "type": "node_output",
+        "input": json.dumps([{"role": "human", "content": 'say "hi"\n'}]),
+        "output": None,
+        "state": json.dumps({"value": "\x00x"}),
+    }
+    assert json.loads(dumps(message)) == {
+        "type": "node_output",
+        "input": [{"role": "human", "content": 'say "hi"\n'}],
+        "output": None,
+        "state": {"value": "\x00x"},
+    }
+    assert json.loads(dumps(message, "string")) == message
+
+
+def test_structured_wire_falls_back_for_values_orjson_refuses(backend):
+    message = {
+        "type": "node_output",
+        "state": None,
+        "state_patch": [{"op": "replace", "path": "/n", "value": 2**70}],
+        "input": json.dumps([{"role": "human", "content": "hi"}]),
+    }
+    assert json.loads(dumps(message)) == {**message, "input": [{"role": "human", "content": "hi"}]}
+
+
+def test_structured_snapshot_outputs_and_state(backend):
+    message = {
+        "type": "snapshot",
+        "outputs": [{"node_id": "a", "input": "[1]", "output": None}],
+        "state": {"id": 3, "value": '{"m": [1]}'},
+    }
+    assert json.loads(dumps(message)) == {
+        "type": "snapshot",
+        "outputs": [{"node_id": "a", "input": [1], "output": None}],
+        "state": {"id": 3, "value": {"m": [1]}},
+    }
+    assert message["outputs"][0]["input"] == "[1]"
+
+
+def test_objects_are_reduced_to_public_data(backend):
+    state = {
+        "messages": [AIMessage(content="hi", id="m1")],
+        "profile": Profile(name="ada"),
+        "point": Point(1, 2),
+        "client": Client(),
+        "when": datetime(2025, 1, 1),
+        "raw": b"\x00\x01",
+        "tags": {"a"},
+        1: 2**70,
+    }
+    plain = json.loads(encoding.ENCODER.dumps(state))
+    assert plain["messages"][0]["content"] == "hi" and plain["messages"][0]["type"] == "ai"
+    assert plain["profile"] == {"name": "ada"}
+    assert plain["point"] == {"x": 1, "y": 2}
+    assert plain["client"] == {"base_url": "http://api"}
+    assert plain["when"] == "2025-01-01T00:00:00"
+    assert plain["raw"] == "<2 bytes>"
+    assert plain["tags"] == ["a"]
+    assert plain["1"] == 2**70
+
+
+def test_limits_and_cycles():
+    encoder = Encoder(max_depth=3, max_string=4, max_items=2, backend="json")
+    cyclic: dict = {"name": "abcdefgh"}
+    cyclic["self"] = cyclic
+    assert encoder.plain(cyclic) == {"name": "abcd… (4 more chars)", "self": "<cycle: dict>"}
+    assert encoder.plain([1, 2, 3, 4]) == [1, 2, "… (2 more items)"]
+    assert encoder.plain({"a": {"b": {"c": {"d": 1}}}}) == {"a": {"b": {"c": "<dict>"}}}
+    assert encoder.plain([[1], [1]]) == [[1], [1]]
+
+
+def test_messages_are_memoized_until_edited():
+    encoder = Encoder(backend="json")
+    message = AIMessage(content="draft", id="m1")
+    first = encoder.plain([message])[0]
+    assert encoder.plain([message])[0] is first
+    assert encoder.plain([AIMessage(content="draft", id="m1")])[0] is first
+    message.content = "final"
+    assert encoder.plain([message])[0]["content"] == "final"
+
+
+def test_dumps_splices_memoized_messages(backend):
+    encoder = encoding.ENCODER
+    state = {"messages": [AIMessage(content="hi", id="m1"), AIMessage(content='"x"', id="m2")], "n": 2**70}
+    first = encoder.dumps(state)
+    assert json.loads(encoder.dumps(state)) == json.loads(first) == json.loads(encoder.raw(encoder.plain(state)))
+    assert json.loads(first)["messages"][1]["content"] == '"x"'
+
+
+def test_encoders_keep_their_own_limits():
+    short, default = Encoder(max_string=2), Encoder()
+    assert short.plain("abcd") == "ab… (2 more chars)"
+    assert default.plain("abcd") == "abcd"
@@ -2,11 +2,11 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Any
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from langchain_core.documents import Document
 from langchain_core.load import dumpd
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, message_to_dict
 
 from langgraphics.formatter import Formatter
 
@@ -306,6 +306,11 @@ class TestCosts:
         result = Formatter.costs("openai/gpt-4o-mini", 1000, 2000)
         assert result == {"cached": "0.000075", "total": "0.0012"}
 
+    def test_dated_and_prefixed_model_names(self):
+        expected = Formatter.costs("openai/gpt-4o-mini", 1000, 2000)
+        assert Formatter.costs("openai/gpt-4o-mini-2024-07-18", 1000, 2000) == expected
+        assert Formatter.costs("proxy/openai/gpt-4o-mini", 1000, 2000) == expected
+
 
 class TestMetrics:
     def test_token_counts(self):
@@ -330,3 +335,54 @@ class TestMetrics:
         run = make_metrics_run()
         result = Formatter.metrics(run)
         assert result["costs"] == {"cached": "0.0", "total": "0.0"}
+
+    def test_openai_token_usage(self):
+        run = make_metrics_run(
+            extra={"metadata": {"ls_model_name": "gpt-4o-mini"}},
+            outputs={
+                "generations": [[{"text": "hi"}]],
+                "llm_output": {"token_usage": {"total_tokens": 500, "prompt_tokens_details": {"cached_tokens": 100}}},
+            },
+        )
+        assert Formatter.metrics(run)["tokens"] == {"cached": 100, "total": 500}
+
+    def test_usage_metadata(self):
+        message = {"kwargs": {"usage_metadata": {"total_tokens": 500, "input_token_details": {"cache_read": 100}}}}
+        run = make_metrics_run(outputs={"generations": [[{"message": message}]], "llm_output": None})
+        assert Formatter.metrics(run)["tokens"] == {"cached": 100, "total": 500}
+
+    def test_collect_matches_extract(self):
+        data = {"a": [{"b": {"total_tokens": 3}}, {"cached_tokens": 2}], "total_tokens": None, "c": ({"cached_tokens": 1},)}
+        found = Formatter.collect(data, ("total_tokens", "cached_tokens", "missing"))
+        assert found == {key: Formatter.extract(data, key) for key in ("total_tokens", "cached_tokens")}
+
+
+class TestNormalize:
+    def setup_method(self):
+        Formatter.normalized.clear()
+
+    def test_only_new_messages_are_converted(self):
+        history = [HumanMessage(content="hi", id="m1"), AIMessage(content="hello", id="m2")]
+        with patch("langgraphics.formatter.message_to_dict", wraps=message_to_dict) as convert:
+            first = Formatter.normalize(history)
+            second = Formatter.normalize([*history, HumanMessage(content="bye", id="m3")])
+        assert convert.call_count == 3
+        assert second[:2] == first == [
+            {"role": "human", "content": "hi"},
+            {"role": "ai", "content": "hello"},
+        ]
+
+    def test_edited_content_is_renormalized(self):
+        Formatter.normalize([AIMessage(content="draft", id="m1")])
+        assert Formatter.normalize([AIMessage(content="final", id="m1")]) == [{"role": "ai", "content": "final"}]
+
+    def test_serialized_and_anonymous_messages(self):
+        msg = dumpd(AIMessage(content="", id="m1", tool_calls=[{"name": "fn", "args": {}, "id": "c1"}]))
+        assert Formatter.normalize([msg]) == [Formatter.norm(msg)]
+        assert Formatter.normalize([HumanMessage(content="no id")]) == [{"role": "human", "content": "no id"}]
+        assert len(Formatter.normalized) == 0
+
+    def test_cache_is_bounded(self):
+        with patch("langgraphics.formatter.MAX_NORMALIZED", 2):
+            Formatter.normalize([HumanMessage(content=str(i), id=str(i)) for i in range(5)])
+        assert [key[0] for key in Formatter.normalized] == ["3", "4"]
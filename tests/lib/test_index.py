@@ -0,0 +1,43 @@
+from langgraphics.index import TopologyIndex
+
+EDGES = {
+    ("__start__", "a"): "e0",
+    ("a", "b"): "e1",
+    ("a", "c"): "e2",
+    ("b", "c"): "e3",
+    ("c", "sub:__start__"): "e4",
+    ("c", "__end__"): "e5",
+}
+
+
+def test_nodes_are_interned_in_edge_order():
+    index = TopologyIndex(EDGES)
+    assert index.names == ["__start__", "a", "b", "c", "sub:__start__", "__end__"]
+    assert index.start_nodes == [0, 4]
+    assert index.node_names == {"a", "b", "c"}
+    assert index.incoming == {"a", "b", "c", "sub:__start__", "__end__"}
+
+
+def test_adjacency_keeps_edge_order_per_node():
+    index = TopologyIndex(EDGES)
+    names = lambda edges: [index.edge_ids[e] for e in edges]
+    assert names(index.predecessors(index.ids["c"])) == ["e2", "e3"]
+    assert names(index.successors(index.ids["a"])) == ["e1", "e2"]
+    assert names(index.successors(index.ids["c"])) == ["e4", "e5"]
+    assert names(index.predecessors(index.ids["__start__"])) == []
+
+
+def test_message_maps_edge_numbers_back_to_names():
+    edges = TopologyIndex(EDGES).to_message()["edges"]
+    assert edges[3] == ["e3", "b", "c"]
+    assert len(edges) == len(EDGES)
+
+
+def test_extend_returns_a_new_index_and_keeps_numbers():
+    index = TopologyIndex(EDGES)
+    extended = index.extend({("sub:__start__", "sub:x"): "e6", ("sub:x", "sub:__end__"): "e7"})
+    assert len(index.names) == 6 and len(index.pred_offsets) == 7
+    assert extended.names[:6] == index.names and extended.edge_ids[:6] == index.edge_ids
+    assert [extended.edge_ids[e] for e in extended.predecessors(extended.ids["sub:x"])] == ["e6"]
+    assert extended.top_level[extended.ids["sub:x"]] is False
+    assert extended.node_names == index.node_names
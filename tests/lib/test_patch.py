@@ -0,0 +1,42 @@
+import copy
+
+import pytest
+
+from langgraphics.patch import apply, diff
+
+CASES = [
+    ({"messages": [{"content": "hi"}]}, {"messages": [{"content": "hi"}, {"content": "yo"}]}),
+    ({"a": 1, "b": {"c": 2}}, {"a": 1, "b": {"c": 3}, "d": None}),
+    ({"a": [1, 2, 3], "b": True}, {"a": [1, 4]}),
+    ({"a/b": 1, "c~d": 2}, {"a/b": 2}),
+    ({"a": 1}, {"a": "1"}),
+    ([1, 2], {"a": 1}),
+]
+
+
+@pytest.mark.parametrize("old,new", CASES)
+def test_apply_diff_roundtrip(old, new):
+    assert apply(copy.deepcopy(old), diff(old, new)) == new
+
+
+def test_appended_message_is_a_single_add():
+    old = {"messages": [{"role": "human", "content": "x" * 1000}]}
+    new = {"messages": [*old["messages"], {"role": "ai", "content": "ok"}]}
+
+    assert diff(old, new) == [
+        {"op": "add", "path": "/messages/-", "value": {"role": "ai", "content": "ok"}},
+    ]
+
+
+def test_identical_documents_produce_no_ops():
+    assert diff({"a": [1, {"b": 2}]}, {"a": [1, {"b": 2}]}) == []
+
+
+def test_applied_values_are_not_edited_by_later_patches():
+    message = {"role": "ai", "content": "draft"}
+    first = [{"op": "add", "path": "/messages/-", "value": message}]
+    doc = apply({"messages": []}, first)
+    apply(doc, [{"op": "replace", "path": "/messages/0/content", "value": "final"}])
+
+    assert doc == {"messages": [{"role": "ai", "content": "final"}]}
+    assert message == {"role": "ai", "content": "draft"} and first[0]["value"] is message
@@ -0,0 +1,65 @@
+import json
+import time
+
+from langgraphics.pricing import MAX_RESOLVED, PriceIndex, compile_prices, prices, refresh
+
+MODELS = {
+    "openai/gpt-4o": {"cost": {"input": 2.5, "output": 10, "cache_read": 1.25, "cache_write": 0}},
+    "azure/gpt-4o": {"cost": {"input": 2.5, "output": 10, "cache_read": 1.25, "cache_write": 0}},
+    "gpt-4o-mini": {"cost": {"input": 0.15, "output": 0.6, "cache_read": 0.075}},
+    "claude-3.5-sonnet-20240620": {"cost": {"input": 3, "output": 15}},
+    "claude-3.5-sonnet-20241022": {"cost": {"input": 3, "output": 14}},
+    "free-model": {"cost": {"input": 0, "output": 0}},
+    "no-cost": {"reasoning": True},
+}
+
+
+def test_compile_keeps_only_cost_rows_and_aliases():
+    compiled = compile_prices(MODELS)
+    assert compiled["fields"] == ["input", "output", "cache_read", "cache_write"]
+    assert len(compiled["rows"]) == 4
+    assert compiled["names"]["openai/gpt-4o"] == compiled["names"]["azure/gpt-4o"]
+    assert compiled["names"]["gpt-4o"] == compiled["names"]["openai/gpt-4o"]
+    assert "free-model" not in compiled["names"] and "no-cost" not in compiled["names"]
+
+
+def test_lookup_matches_variants():
+    index = PriceIndex(compile_prices(MODELS))
+    output = lambda model: (index.lookup(model) or {}).get("output")
+    assert output("GPT-4o") == 10
+    assert output("gpt-4o-2024-08-06") == 10
+    assert output("openrouter/openai/gpt-4o-2024-08-06") == 10
+    assert output("gpt-4o-mini-2024-07-18") == 0.6
+    assert output("gpt-4o-mini-search") == 0.6
+    assert output("claude-3.5-sonnet") == 14
+    assert output("claude-3.5-sonnet-latest") == 14
+    assert output("unknown-model") is None
+
+
+def test_lookup_is_memoized_and_bounded():
+    index = PriceIndex(compile_prices(MODELS))
+    assert index.lookup("gpt-4o-2024-08-06") is index.lookup("GPT-4o-2024-08-06")
+    for i in range(MAX_RESOLVED + 1):
+        index.lookup(f"unknown-{i}")
+    assert len(index.resolved) <= MAX_RESOLVED
+
+
+def test_bundled_index_matches_models_json():
+    with open("langgraphics/metadata/models.json", encoding="utf-8") as fp:
+        assert compile_prices(json.load(fp)) == json.loads(
+            open("langgraphics/metadata/prices.json", encoding="utf-8").read()
+        )
+
+
+def test_bundled_index_loads_quickly():
+    start = time.perf_counter()
+    index = prices()
+    assert time.perf_counter() - start < 0.5
+    assert index.lookup("openai/gpt-4o-mini")["output"] == 0.6
+
+
+def test_refresh_replaces_index_from_cache():
+    assert prices().lookup("free-model") is None
+    refresh({"custom-model": {"cost": {"input": 1, "output": 2}}})
+    assert prices().lookup("custom-model")["output"] == 2
+    assert prices().lookup("gpt-4o") is None
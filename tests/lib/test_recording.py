@@ -0,0 +1,107 @@
+import json
+import threading
+
+import websockets
+
+from langgraphics import watch
+from langgraphics.recorder import Recorder
+from langgraphics.viewer import read_trace, view
+from tests.lib.conftest import find_free_port
+
+
+def read_lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+async def test_headless_mode_records_without_servers(simple_graph, tmp_path):
+    path = tmp_path / "traces" / "run.jsonl"
+    before = {t.name for t in threading.enumerate()}
+    viewport = watch(simple_graph, record=path)
+    await viewport.ainvoke({"value": "test"})
+
+    assert isinstance(viewport.ws, Recorder) and viewport.http_server is None
+    started = {t.name for t in threading.enumerate()} - before
+    assert {name for name in started if not name.startswith("asyncio_")} <= {"langgraphics-recorder"}
+
+    lines = read_lines(path)
+    assert lines[0]["type"] == "graph"
+    assert lines[1]["type"] == "run_start" and lines[-1]["type"] == "run_end"
+    assert [m["seq"] for m in lines[1:]] == list(range(1, len(lines)))
+    edges = [(m["source"], m["target"]) for m in lines if m["type"] == "edge_active"]
+    assert edges == [("__start__", "step_a"), ("step_a", "step_b"), ("step_b", "__end__")]
+    outputs = [m for m in lines if m["type"] == "node_output"]
+    assert [o["state"] for o in outputs] == [{"value": "test"}, {"value": "test_a"}]
+
+
+async def test_runs_append_to_the_same_trace(simple_graph, tmp_path):
+    path = tmp_path / "run.jsonl"
+    viewport = watch(simple_graph, record=path)
+    await viewport.ainvoke({"value": "one"})
+    await viewport.ainvoke({"value": "two"})
+
+    topology, events = read_trace(path)
+    assert topology["type"] == "graph"
+    assert [e["type"] for e in events].count("run_start") == 2
+
+
+async def test_payload_workers_survive_the_end_of_a_run(simple_graph, tmp_path):
+    path = tmp_path / "run.jsonl"
+    viewport = watch(simple_graph, record=path, payload_workers=2)
+    await viewport.ainvoke({"value": "one"})
+    await viewport.ainvoke({"value": "two"})
+
+    _, events = read_trace(path)
+    outputs = [e for e in events if e["type"] == "node_output"]
+    assert [o["state"] for o in outputs] == [
+        {"value": "one"}, {"value": "one_a"}, {"value": "two"}, {"value": "two_a"},
+    ]
+
+
+async def test_delta_patches_over_budget_become_keyframes(simple_graph, tmp_path):
+    path = tmp_path / "run.jsonl"
+    viewport = watch(simple_graph, record=path, state_mode="delta", field_budget=1024)
+    await viewport.ainvoke({"value": "x" * 16384})
+
+    lines = path.read_text().splitlines()
+    events = [json.loads(line) for line in lines]
+    outputs = [e for e in events if e["type"] == "node_output"]
+    assert [o["node_id"] for o in outputs] == ["step_a", "step_b"]
+    assert "state_patch" not in outputs[1] and outputs[1]["truncated"]["state"]["size"] > 16384
+    assert all(len(line) < 8192 for line, e in zip(lines, events) if e["type"] != "blob")
+
+
+async def test_blobs_are_recorded_before_their_events(simple_graph, tmp_path):
+    path = tmp_path / "run.jsonl"
+    viewport = watch(simple_graph, record=path, field_budget=0, event_budget=8)
+    await viewport.ainvoke({"value": "x" * 64})
+
+    lines = read_lines(path)
+    seen = set()
+    for line in lines:
+        if line["type"] == "blob":
+            seen.add(line["id"])
+        for blob_id in (line.get("blobs") or {}).values():
+            assert blob_id in seen
+
+
+async def test_viewer_serves_recorded_runs(simple_graph, tmp_path):
+    path = tmp_path / "run.jsonl"
+    viewport = watch(simple_graph, record=path, field_budget=0, event_budget=4)
+    await viewport.ainvoke({"value": "test"})
+    run_id = read_trace(path)[1][0]["run_id"]
+
+    ws_port = find_free_port()
+    manager = view(path, port=find_free_port(), ws_port=ws_port, open_browser=False)
+    async with websockets.connect(f"ws://localhost:{ws_port}/?run_id={run_id}") as ws:
+        messages = []
+        while not messages or messages[-1]["type"] != "run_end":
+            frame = json.loads(await ws.recv())
+            messages.extend(frame if isinstance(frame, list) else [frame])
+        outputs = [m for m in messages if m["type"] == "node_output"]
+        await ws.send(json.dumps({"type": "fetch", "id": outputs[0]["blobs"]["state"]}))
+        blob = json.loads(await ws.recv())
+    await manager.shutdown()
+
+    assert messages[0]["type"] == "graph" and messages[1]["type"] == "run_start"
+    assert [o["node_id"] for o in outputs] == ["step_a", "step_b"]
+    assert json.loads(blob["body"]) == {"value": "test"}
@@ -0,0 +1,153 @@
+import json
+
+from langgraphics.blobs import BlobStore
+from langgraphics.snapshot import Snapshot
+
+TOPOLOGY = {
+    "type": "graph",
+    "nodes": [
+        {"id": "__start__", "name": "__start__", "node_type": "start"},
+        {"id": "A", "name": "A", "node_type": "node"},
+        {
+            "id": "sub",
+            "name": "sub",
+            "node_type": "subgraph",
+            "subgraph": {
+                "nodes": [{"id": "inner", "name": "inner", "node_type": "node"}],
+                "edges": [],
+            },
+        },
+        {"id": "__end__", "name": "__end__", "node_type": "end"},
+    ],
+    "edges": [],
+}
+
+
+def ea(source: str, target: str, edge_id: str) -> dict:
+    return {"type": "edge_active", "source": source, "target": target, "edge_id": edge_id}
+
+
+def node_output(node_id: str, parent_run_id: str | None = None, tokens: int = 0) -> dict:
+    return {
+        "type": "node_output",
+        "run_id": f"run-{node_id}",
+        "parent_run_id": parent_run_id,
+        "node_id": node_id,
+        "status": "ok",
+        "metrics": {
+            "latency": "0ms",
+            "costs": {"cached": "0.0", "total": "0.001"},
+            "tokens": {"cached": 0, "total": tokens},
+        },
+    }
+
+
+def test_edge_activation_demotes_previous_node():
+    snapshot = Snapshot(TOPOLOGY)
+    for event in [
+        {"type": "run_start", "run_id": "r1"},
+        ea("__start__", "A", "e0"),
+        ea("A", "sub", "e1"),
+    ]:
+        snapshot.apply(event)
+
+    message = snapshot.to_message()
+    assert message["run_id"] == "r1"
+    assert message["nodes"] == {"A": "completed", "sub": "active", "sub:__start__": "active"}
+    assert message["edges"]["e0"]["status"] == "traversed"
+    assert message["edges"]["e1"] == {"source": "A", "target": "sub", "status": "active"}
+
+
+def test_node_output_completes_node_and_keeps_latest_output():
+    snapshot = Snapshot(TOPOLOGY)
+    for event in [
+        {"type": "run_start", "run_id": "r1"},
+        ea("__start__", "A", "e0"),
+        node_output("llm", parent_run_id="run-A", tokens=10),
+        node_output("A"),
+        node_output("A", tokens=5),
+    ]:
+        snapshot.apply(event)
+
+    message = snapshot.to_message()
+    assert message["nodes"]["A"] == "completed"
+    assert message["edges"]["e0"]["status"] == "traversed"
+    assert [o["node_id"] for o in message["outputs"]] == ["A"]
+    assert message["metrics"]["tokens"] == {"cached": 0, "total": 15}
+    assert message["metrics"]["costs"]["total"] == "0.003"
+
+
+def test_reset_clears_everything():
+    snapshot = Snapshot(TOPOLOGY)
+    snapshot.apply({"type": "run_start", "run_id": "r1"})
+    snapshot.apply(ea("__start__", "A", "e0"))
+    snapshot.reset()
+
+    assert snapshot.size == 0
+    assert snapshot.to_message()["nodes"] == {}
+
+
+def test_delta_states_are_materialized_on_compaction():
+    snapshot = Snapshot(TOPOLOGY)
+    keyframe = {**node_output("A"), "state": '{"m": [1]}', "state_id": 1}
+    delta = {
+        **node_output("B"),
+        "state": None,
+        "state_id": 2,
+        "state_base": 1,
+        "state_patch": [{"op": "add", "path": "/m/-", "value": 2}],
+    }
+    for event in [{"type": "run_start", "run_id": "r1"}, keyframe, delta]:
+        snapshot.apply(event)
+
+    message = snapshot.to_message()
+    assert message["state"]["id"] == 2
+    assert json.loads(message["state"]["value"]) == {"m": [1, 2]}
+    output = next(o for o in message["outputs"] if o["node_id"] == "B")
+    assert json.loads(output["state"]) == {"m": [1, 2]}
+    assert output["state_patch"] is None
+
+
+def test_lazy_keyframes_are_read_from_the_blob_store():
+    blobs = BlobStore()
+    snapshot = Snapshot(TOPOLOGY, blobs)
+    keyframe = {**node_output("A"), "state": None, "state_id": 1, "blobs": {"state": blobs.put('{"m": [1]}')}}
+    delta = {
+        **node_output("B"),
+        "state": None,
+        "state_id": 2,
+        "state_base": 1,
+        "state_patch": [{"op": "add", "path": "/m/-", "value": 2}],
+    }
+    for event in [{"type": "run_start", "run_id": "r1"}, keyframe, delta]:
+        snapshot.apply(event)
+
+    assert json.loads(snapshot.to_message()["state"]["value"]) == {"m": [1, 2]}
+
+
+def test_interned_states_and_patches_are_restored_from_the_blob_store():
+    blobs = BlobStore()
+    hi, yo = blobs.put('{"content": "hi"}'), blobs.put('{"content": "yo"}')
+    keyframe = {**node_output("A"), "state": '{"m": null}', "state_id": 1, "refs": {"state": {"m": [hi]}}}
+    delta = {
+        **node_output("B"),
+        "state": None,
+        "state_id": 2,
+        "state_base": 1,
+        "state_patch": [{"op": "add", "path": "/m/-", "ref": yo}],
+    }
+    snapshot = Snapshot(TOPOLOGY, blobs)
+    for event in [{"type": "run_start", "run_id": "r1"}, keyframe, delta]:
+        snapshot.apply(event)
+
+    assert json.loads(snapshot.to_message()["state"]["value"]) == {"m": [{"content": "hi"}, {"content": "yo"}]}
+
+
+def test_compact_edge_events_are_expanded_from_the_index():
+    topology = {**TOPOLOGY, "index": {"edges": [["e0", "__start__", "A"]]}}
+    snapshot = Snapshot(topology)
+    snapshot.apply({"type": "run_start", "run_id": "r1"})
+    snapshot.apply({"type": "edge_active", "edge": 0})
+
+    assert snapshot.edges == {"e0": {"source": "__start__", "target": "A", "status": "active"}}
+    assert snapshot.nodes == {"A": "active"}
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import re
+import threading
+import urllib.request
+from concurrent.futures import Future
+
+import websockets
+
+from langgraphics import watch
+from langgraphics.store import RECORD, TraceStore
+from tests.lib.conftest import find_free_port
+
+METRICS = {"costs": {"total": "0.5"}, "tokens": {"total": 10}}
+
+
+def event(msg_type: str, channel: str, **fields) -> str:
+    return json.dumps({"type": msg_type, "channel": channel, **fields})
+
+
+def record_run(store: TraceStore, run_id: str, steps: int = 2, status: str = "run_end") -> None:
+    store.append(run_id, "run_start", event("run_start", run_id, run_id=run_id))
+    for i in range(steps):
+        message = {"type": "node_output", "node_id": f"n{i}", "metrics": METRICS}
+        store.append(run_id, "node_output", json.dumps(message), message)
+    store.append(run_id, status, event(status, run_id))
+    store.flush()
+
+
+def test_runs_are_indexed_and_read_back(tmp_path):
+    store = TraceStore(tmp_path)
+    store.append("a", "run_start", event("run_start", "a"))
+    record_run(store, "b", status="error")
+    store.append("a", "edge_active", event("edge_active", "a"))
+    store.append("a", "run_end", event("run_end", "a"))
+    store.flush()
+
+    assert [e[0] for e in store.events("a")] == ["run_start", "edge_active", "run_end"]
+    assert [e[0] for e in store.events("b")] == ["run_start", "node_output", "node_output", "error"]
+    assert json.loads(store.events("b")[1][1])["node_id"] == "n0"
+    runs = {r["run_id"]: r for r in store.list_runs()}
+    assert runs["a"]["status"] == "ok" and runs["a"]["events"] == 3
+    assert runs["b"]["status"] == "error" and runs["b"]["cost"] == 1.0 and runs["b"]["tokens"] == 20
+    assert store.events("missing") is None
+
+
+def test_store_survives_reopening_and_torn_index(tmp_path):
+    store = TraceStore(tmp_path)
+    record_run(store, "a")
+    store.append("b", "run_start", event("run_start", "b"))
+    store.close()
+    with open(tmp_path / "runs.idx", "ab") as fp:
+        fp.write(b"\0" * (RECORD.size // 2))
+
+    reopened = TraceStore(tmp_path)
+    assert [r["run_id"] for r in reopened.list_runs()] == ["b", "a"]
+    assert [r["status"] for r in reopened.list_runs()] == ["interrupted", "ok"]
+    record_run(reopened, "c")
+    assert len(reopened.events("a")) == 4 and len(reopened.events("c")) == 4
+
+
+def test_segments_rotate_and_expire(tmp_path):
+    store = TraceStore(tmp_path, segment_size=256, retention_runs=2)
+    for i in range(6):
+        record_run(store, f"run{i}")
+
+    assert [r["run_id"] for r in store.list_runs()] == ["run5", "run4"]
+    assert store.events("run0") is None
+    assert len(store.events("run5")) == 4
+    segments = sorted(p.name for p in tmp_path.glob("*.log"))
+    assert len(segments) < 6 and segments[0] != "00000001.log"
+
+    sized = TraceStore(tmp_path / "sized", segment_size=256, retention_bytes=600)
+    for i in range(6):
+        record_run(sized, f"run{i}")
+    assert sum(p.stat().st_size for p in (tmp_path / "sized").glob("*.log")) <= 600 + 512
+    assert "run5" in {r["run_id"] for r in sized.list_runs()}
+
+
+async def test_past_runs_are_served_after_restart(simple_graph, tmp_path):
+    viewport = watch(simple_graph, port=find_free_port(), ws_port=find_free_port(), open_browser=False, store=tmp_path)
+    await viewport.ainvoke({"value": "test"})
+
+    port, ws_port = find_free_port(), find_free_port()
+    viewport = watch(
+        simple_graph, port=port, ws_port=ws_port, open_browser=False, store=tmp_path, persistent=True
+    )
+    with urllib.request.urlopen(f"http://localhost:{port}/runs") as response:
+        runs = json.loads(response.read())
+    assert [r["status"] for r in runs] == ["ok"]
+    assert runs[0]["cost"] == 0.0 and runs[0]["tokens"] == 0
+    run_id = runs[0]["run_id"]
+
+    with urllib.request.urlopen(f"http://localhost:{port}/runs/{run_id}") as response:
+        streamed = [json.loads(line) for line in response.read().decode().splitlines()]
+    assert streamed[0]["type"] == "run_start" and streamed[-1]["type"] == "run_end"
+
+    while viewport.ws.server is None:
+        await asyncio.sleep(0.01)
+    async with websockets.connect(f"ws://localhost:{ws_port}/?run_id={run_id}") as ws:
+        messages = []
+        while not messages or messages[-1]["type"] != "run_end":
+            frame = json.loads(await ws.recv())
+            messages.extend(frame if isinstance(frame, list) else [frame])
+    await viewport.shutdown()
+
+    assert messages[0]["type"] == "graph"
+    assert messages[1:] == streamed
+    outputs = [m for m in messages if m["type"] == "node_output"]
+    assert [m["node_id"] for m in outputs] == ["step_a", "step_b"]
+    # Nobody was watching the run, yet it was stored with its payloads and cost.
+    assert [m["state"] for m in outputs] == [{"value": "test"}, {"value": "test_a"}]
+    assert all(m["metrics"]["costs"]["total"] == "0.0" for m in outputs)
+
+
+async def test_stored_runs_keep_every_blob_they_reference(simple_graph, tmp_path):
+    viewport = watch(
+        simple_graph, port=find_free_port(), ws_port=find_free_port(), open_browser=False,
+        store=tmp_path, field_budget=512, persistent=True,
+    )
+    await viewport.ainvoke({"value": "data:image/png;base64," + "A" * 4096})
+    await viewport.ainvoke({"value": "x" * 4096})
+    await viewport.shutdown()
+
+    store = TraceStore(tmp_path)
+    kinds = set()
+    for run in store.list_runs():
+        stored = set()
+        for msg_type, message in store.events(run["run_id"]):
+            event = json.loads(message)
+            if msg_type == "blob":
+                assert event["body"] and event["id"] not in stored
+                stored.add(event["id"])
+                continue
+            truncated = {t["id"] for t in (event.get("truncated") or {}).values()}
+            urls = set(re.findall(r"/blobs/([0-9a-f]+)", message))
+            assert truncated | urls <= stored
+            kinds |= {"truncated"} if truncated else set()
+            kinds |= {"url"} if urls else set()
+    assert len(store.list_runs()) == 2 and kinds == {"truncated", "url"}
+
+
+async def test_stored_runs_are_read_off_the_event_loop(simple_graph, tmp_path):
+    viewport = watch(simple_graph, port=find_free_port(), ws_port=find_free_port(), open_browser=False, store=tmp_path)
+    await viewport.ainvoke({"value": "test"})
+
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph, port=find_free_port(), ws_port=ws_port, open_browser=False, store=tmp_path, persistent=True
+    )
+    store = viewport.ws.store
+    read, threads = store.events, []
+
+    def events(run_id):
+        threads.append(threading.current_thread())
+        return read(run_id)
+
+    store.events = events
+    run_id = store.list_runs()[0]["run_id"]
+    while viewport.ws.server is None:
+        await asyncio.sleep(0.01)
+    loop_thread: Future = Future()
+    viewport.ws.loop.call_soon_threadsafe(lambda: loop_thread.set_result(threading.current_thread()))
+    async with websockets.connect(f"ws://localhost:{ws_port}/?run_id={run_id}") as ws:
+        messages = []
+        while not messages or messages[-1]["type"] != "run_end":
+            frame = json.loads(await ws.recv())
+            messages.extend(frame if isinstance(frame, list) else [frame])
+    await viewport.shutdown()
+
+    assert messages[0]["type"] == "graph" and messages[1]["type"] == "run_start"
+    assert threads and loop_thread.result(timeout=1) not in threads
@@ -9,7 +9,7 @@ from examples import (
     sub2_agent,
     sync_agent,
 )
-from langgraphics.topology import extract
+from langgraphics.topology import edge_lookup, extract, fingerprint, load
 
 if sys.version_info >= (3, 11):
     from examples import deep_agent, sub1_agent
@@ -409,3 +409,55 @@ def test_sub2_agent_node2b_subgraph_two_inner_nodes():
     assert {n["name"] for n in node2b["subgraph"]["nodes"]} == {
         "__start__", "node1", "node2", "__end__"
     }
+
+
+def test_sub2_agent_edge_lookup_prefixes_subgraph_edges():
+    lookup = edge_lookup(extract(sub2_agent.graph))
+    inner = [(k, v) for k, v in lookup.items() if ":" in v]
+    assert inner
+    assert all(v.split(":")[0] == k[0].split(":")[0] == k[1].split(":")[0] for k, v in inner)
+    assert len(lookup) == len(set(lookup.values()))
+
+
+def test_fingerprint_is_structural(simple_graph, branching_graph):
+    assert fingerprint(simple_graph) == fingerprint(simple_graph)
+    assert fingerprint(simple_graph) != fingerprint(branching_graph)
+    assert fingerprint(object()) is None
+
+
+def test_load_persists_topology_by_fingerprint(simple_graph, cache_dir):
+    topo = load(simple_graph)
+    assert topo == extract(simple_graph)
+    assert (cache_dir / "topology" / f"{fingerprint(simple_graph)}.json").exists()
+
+    simple_graph.get_graph = None
+    assert load(simple_graph) == topo
+
+
+def test_lazy_load_is_cached_apart_from_eager(cache_dir):
+    eager = load(sub2_agent.graph)
+    pending = {}
+    lazy = load(sub2_agent.graph, pending)
+    collapsed = [n["id"] for n in lazy["nodes"] if n.get("collapsed")]
+    assert collapsed and sorted(pending) == sorted(collapsed)
+    assert all("subgraph" not in n for n in lazy["nodes"])
+    assert (cache_dir / "topology" / f"{fingerprint(sub2_agent.graph)}.lazy.json").exists()
+
+    cached: dict = {}
+    assert load(sub2_agent.graph, cached) == lazy and cached == pending
+    assert load(sub2_agent.graph) == eager
+
+
+def test_lazy_extract_collapses_subgraphs():
+    pending = {}
+    topo = extract(sub2_agent.graph, pending)
+    collapsed = [n["id"] for n in topo["nodes"] if n.get("collapsed")]
+    assert collapsed and sorted(collapsed) == sorted(pending)
+    assert all("subgraph" not in n for n in topo["nodes"])
+
+    node_id = collapsed[0]
+    inner = extract(pending.pop(node_id), pending, node_id)
+    eager = next(n for n in extract(sub2_agent.graph)["nodes"] if n["id"] == node_id)["subgraph"]
+    assert inner["edges"] == eager["edges"]
+    assert [n["id"] for n in inner["nodes"]] == [n["id"] for n in eager["nodes"]]
+    assert all(k.startswith(f"{node_id}:") for k in pending if k not in collapsed)
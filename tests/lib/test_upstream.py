@@ -1,74 +1,93 @@
 import json
+import threading
 import time
-from pathlib import Path
-from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import pytest
 
-from langgraphics.upstream import sync
+from langgraphics.cache import cache_dir, read_json, write_json
+from langgraphics.pricing import prices
+from langgraphics.upstream import sync, sync_in_background
 
-SYNC_TIME_FILE = Path(__file__).parents[2] / "langgraphics" / "metadata" / ".sync_time"
-FAKE_MODELS = json.dumps({"fake-model": {"reasoning": False, "tool_call": True}}).encode()
+FAKE_COST = {"input": 1, "output": 2, "cache_read": 0.5, "cache_write": 0}
+FAKE_MODELS = json.dumps({"fake-model": {"reasoning": False, "cost": FAKE_COST}}).encode()
+ETAG = '"v1"'
 
 
-@pytest.fixture(autouse=True)
-def clean_sync_time():
-    if SYNC_TIME_FILE.exists():
-        SYNC_TIME_FILE.unlink()
-    yield
-    if SYNC_TIME_FILE.exists():
-        SYNC_TIME_FILE.unlink()
+class ModelsHandler(BaseHTTPRequestHandler):
+    requests: list[dict[str, str]] = []
+    delay = 0.0
 
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        time.sleep(self.delay)
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(FAKE_MODELS)))
+        self.end_headers()
+        self.wfile.write(FAKE_MODELS)
 
-def test_sync_creates_sync_time_and_updates_models():
-    assert not SYNC_TIME_FILE.exists()
+    def log_message(self, *args):
+        pass
 
-    with patch("urllib.request.urlopen") as mock_urlopen:
-        mock_urlopen.return_value.__enter__.return_value.read.return_value = FAKE_MODELS
-        sync()
-        assert mock_urlopen.call_count == 1, (
-            "sync() should fetch when last sync was more than a day ago"
-        )
 
-    assert SYNC_TIME_FILE.exists()
+@pytest.fixture
+def server():
+    ModelsHandler.requests = []
+    ModelsHandler.delay = 0.0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ModelsHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/models.json"
+    httpd.shutdown()
+    httpd.server_close()
 
-    recorded_time = float(SYNC_TIME_FILE.read_text().strip())
-    assert abs(recorded_time - time.time()) < 5
 
+def test_sync_stores_models_in_cache_dir(server):
+    assert sync(server) is True
+    assert len(ModelsHandler.requests) == 1
 
-def test_sync_skips_fetch_when_called_again_within_a_day():
-    assert not SYNC_TIME_FILE.exists()
+    assert (cache_dir() / "models.json").read_bytes() == FAKE_MODELS
+    meta = read_json("models.meta.json")
+    assert meta["etag"] == ETAG
+    assert abs(meta["checked"] - time.time()) < 5
+    assert prices().lookup("fake-model") == FAKE_COST
 
-    with patch("urllib.request.urlopen") as mock_urlopen:
-        mock_urlopen.return_value.__enter__.return_value.read.return_value = FAKE_MODELS
-        sync()
-        assert mock_urlopen.call_count == 1, (
-            "sync() should fetch when last sync was more than a day ago"
-        )
 
-    recorded_time = float(SYNC_TIME_FILE.read_text().strip())
+def test_sync_skips_fetch_within_a_day(server):
+    sync(server)
+    assert sync(server) is False
+    assert len(ModelsHandler.requests) == 1
 
-    with patch("urllib.request.urlopen") as mock_urlopen:
-        mock_urlopen.return_value.__enter__.return_value.read.return_value = FAKE_MODELS
-        sync()
-        assert mock_urlopen.call_count == 0, (
-            "sync() should skip when last sync was less than a day ago"
-        )
 
-    assert recorded_time == float(SYNC_TIME_FILE.read_text().strip())
+def test_sync_revalidates_with_etag_after_a_day(server):
+    sync(server)
+    stale = time.time() - 25 * 60 * 60
+    write_json("models.meta.json", {**read_json("models.meta.json"), "checked": stale})
 
+    assert sync(server) is False
+    assert ModelsHandler.requests[-1]["If-None-Match"] == ETAG
+    assert read_json("models.meta.json")["checked"] > stale
+    assert prices().lookup("fake-model") == FAKE_COST
 
-def test_sync_refetches_after_a_day():
-    stale_time = time.time() - (25 * 60 * 60)
-    SYNC_TIME_FILE.write_text(str(stale_time))
 
-    with patch("urllib.request.urlopen") as mock_urlopen:
-        mock_urlopen.return_value.__enter__.return_value.read.return_value = FAKE_MODELS
-        sync()
-        assert mock_urlopen.call_count == 1, (
-            "sync() should fetch when last sync was more than a day ago"
-        )
+def test_sync_failure_falls_back_to_bundled_models():
+    assert sync("http://127.0.0.1:1/models.json", timeout=1) is False
+    assert read_json("models.meta.json") is None
+    assert prices().lookup("fake-model") is None
 
-    new_time = float(SYNC_TIME_FILE.read_text().strip())
-    assert new_time > stale_time
-    assert abs(new_time - time.time()) < 5
+
+def test_sync_in_background_does_not_block(server):
+    ModelsHandler.delay = 0.5
+    start = time.monotonic()
+    thread = sync_in_background(server)
+    assert time.monotonic() - start < 0.2
+    assert sync_in_background(server) is thread
+
+    thread.join(timeout=5)
+    assert len(ModelsHandler.requests) == 1
+    assert read_json("models.json") == json.loads(FAKE_MODELS)
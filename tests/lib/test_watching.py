@@ -1,10 +1,19 @@
+import asyncio
+import json
+import operator
+import time
+from typing import Annotated, TypedDict
+
 import pytest
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableParallel
+from langgraph.graph import END, StateGraph
 
 from examples import basic_agent, error_agent, sync_agent
 from langgraphics import watch
+from langgraphics.formatter import Formatter
 from langgraphics.topology import extract
-from tests.lib.conftest import find_free_port, safe_ainvoke, ws_collect
+from tests.lib.conftest import SimpleState, find_free_port, safe_ainvoke, ws_collect
 
 
 async def test_linear_message_sequence(simple_graph):
@@ -114,6 +123,370 @@ async def test_all_edge_ids_exist_in_topology(simple_graph):
         )
 
 
+async def test_batched_frames_keep_event_order(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        batch_ms=50,
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    assert messages[1]["type"] == "run_start"
+    assert messages[-1]["type"] == "run_end"
+
+    edge_events = [m for m in messages if m["type"] == "edge_active"]
+    assert [(e["source"], e["target"]) for e in edge_events] == [
+        ("__start__", "step_a"),
+        ("step_a", "step_b"),
+        ("step_b", "__end__"),
+    ]
+
+
+async def test_delta_state_mode_sends_patches_after_keyframe(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        state_mode="delta",
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    outputs = [m for m in messages if m["type"] == "node_output" and m.get("state_id")]
+    assert [o["node_id"] for o in outputs] == ["step_a", "step_b"]
+    assert outputs[0]["state"] == {"value": "test"}
+    assert outputs[1]["state"] is None
+    assert outputs[1]["state_base"] == outputs[0]["state_id"]
+    assert outputs[1]["state_patch"] == [{"op": "replace", "path": "/value", "value": "test_a"}]
+
+
+async def test_payload_workers_keep_event_order(branching_graph, monkeypatch):
+    inputs = Formatter.inputs
+    delays = iter([0.2])
+
+    def slow_inputs(run, **kwargs):
+        # The first payload finishes last on the pool.
+        time.sleep(next(delays, 0))
+        return inputs(run, **kwargs)
+
+    monkeypatch.setattr(Formatter, "inputs", slow_inputs)
+
+    events = []
+    for workers in (0, 4):
+        ws_port = find_free_port()
+        viewport = watch(
+            branching_graph,
+            port=find_free_port(),
+            ws_port=ws_port,
+            open_browser=False,
+            state_mode="delta",
+            payload_workers=workers,
+        )
+        async with ws_collect(ws_port) as (messages, done):
+            await safe_ainvoke(viewport, {"value": "x", "counter": 0})
+        events.append([
+            (m["type"], m.get("node_id"), m.get("edge_id"), m.get("input"), m.get("state"), m.get("state_patch"))
+            for m in messages if m["type"] != "graph"
+        ])
+
+    assert events[0] == events[1]
+    outputs = [e for e in events[1] if e[0] == "node_output"]
+    assert isinstance(outputs[0][4], dict)
+    assert any(e[5] for e in outputs)
+
+
+async def test_interned_delta_patches_reference_message_ids():
+    class ChatState(TypedDict):
+        messages: Annotated[list, operator.add]
+
+    def ask(state: ChatState) -> dict:
+        return {"messages": [{"role": "ai", "content": "question?"}]}
+
+    def answer(state: ChatState) -> dict:
+        return {"messages": [{"role": "human", "content": "answer"}]}
+
+    builder = StateGraph(ChatState)
+    builder.add_node("ask", ask)
+    builder.add_node("answer", answer)
+    builder.add_node("done", lambda state: {})
+    builder.set_entry_point("ask")
+    builder.add_edge("ask", "answer")
+    builder.add_edge("answer", "done")
+    builder.add_edge("done", END)
+    ws_port = find_free_port()
+    viewport = watch(
+        builder.compile(),
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        state_mode="delta",
+        payloads="interned",
+        payload_workers=2,
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"messages": [{"role": "human", "content": "hi"}]})
+
+    bodies = {k: json.loads(v) for m in messages if m["type"] == "intern" for k, v in m["messages"].items()}
+    outputs = [m for m in messages if m["type"] == "node_output"]
+    assert [o["node_id"] for o in outputs] == ["ask", "answer", "done"]
+    assert outputs[0]["state"] == {"messages": None}
+    assert [bodies[i] for i in outputs[0]["refs"]["state"]["messages"]] == [{"role": "human", "content": "hi"}]
+    patches = [o["state_patch"] for o in outputs[1:]]
+    assert [[(op["path"], bodies[op["ref"]]) for op in ops] for ops in patches] == [
+        [("/messages/-", {"role": "ai", "content": "question?"})],
+        [("/messages/-", {"role": "human", "content": "answer"})],
+    ]
+    assert all("interned" not in o and "value" not in op for o in outputs for op in o.get("state_patch") or [])
+
+
+async def test_subscribed_detail_limits_node_output_payloads(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(simple_graph, port=find_free_port(), ws_port=ws_port, open_browser=False)
+    assert viewport.ws.detail == "none"
+
+    async with ws_collect(ws_port, detail="tree") as (messages, done):
+        while viewport.ws.detail != "tree":
+            await asyncio.sleep(0.01)
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    outputs = [m for m in messages if m["type"] == "node_output"]
+    assert [o["node_id"] for o in outputs] == ["step_a", "step_b"]
+    assert all("input" not in o and "state" not in o for o in outputs)
+    assert all(o["status"] == "ok" for o in outputs)
+
+
+async def test_persistent_viewport_serves_several_runs(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        persistent=True,
+    )
+
+    runs = []
+    for _ in range(2):
+        async with ws_collect(ws_port) as (messages, done):
+            await viewport.ainvoke({"value": "test"})
+        runs.append([m for m in messages if m["type"] in ("run_start", "edge_active", "run_end")])
+    await viewport.shutdown()
+
+    channels = [{m["channel"] for m in run} for run in runs]
+    assert all(len(c) == 1 for c in channels) and channels[0] != channels[1]
+    assert [m["edge_id"] for m in runs[0] if m["type"] == "edge_active"] == [
+        m["edge_id"] for m in runs[1] if m["type"] == "edge_active"
+    ]
+    assert list(viewport.ws.history) == [run[0]["run_id"] for run in runs]
+
+
+async def test_viewport_keeps_running_after_shutdown(simple_graph, monkeypatch):
+    viewport = watch(
+        simple_graph, port=find_free_port(), ws_port=find_free_port(), open_browser=False
+    )
+    shutdown = viewport.ws.shutdown
+
+    async def idle_shutdown() -> None:
+        # The drainer is parked (idle) by the time a run ends, as in the slow case.
+        while viewport.ws.loop is not None and (viewport.ws.queue or not viewport.ws.idle):
+            await asyncio.sleep(0.01)
+        await shutdown()
+
+    monkeypatch.setattr(viewport.ws, "shutdown", idle_shutdown)
+
+    first = await viewport.ainvoke({"value": "x"})
+    second = await viewport.ainvoke({"value": "y"})
+
+    assert first == {"value": "x_a_b"} and second == {"value": "y_a_b"}
+    assert viewport.ws.loop is None
+    assert [m["type"] for m in viewport.ws.queue][0] == "run_start"
+
+
+async def test_concurrent_runs_do_not_share_edge_state(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        persistent=True,
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await asyncio.gather(*[viewport.ainvoke({"value": str(i)}) for i in range(3)])
+        while sum(m["type"] == "run_end" for m in messages) < 3:
+            await asyncio.sleep(0.01)
+    await viewport.shutdown()
+
+    edges: dict[str, list[str]] = {}
+    for m in messages:
+        if m["type"] == "edge_active":
+            edges.setdefault(m["channel"], []).append(m["edge_id"])
+    assert len(edges) == 3
+    assert len({tuple(e) for e in edges.values()}) == 1
+    assert len(next(iter(edges.values()))) == 3
+
+
+def track_tracers(viewport) -> list:
+    tracers = []
+    make_config = viewport._make_config
+
+    def tracking_config(config, execution):
+        merged = make_config(config, execution)
+        tracers.append(execution.tracer)
+        return merged
+
+    viewport._make_config = tracking_config
+    return tracers
+
+
+async def test_tracer_state_is_released_when_runs_end(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        persistent=True,
+    )
+    tracers = track_tracers(viewport)
+    async with ws_collect(ws_port) as (messages, done):
+        await viewport.ainvoke({"value": "test"})
+    await viewport.shutdown()
+
+    assert viewport.stats == {"executions": []}
+    assert tracers[0].stats == {"states": 0, "scopes": 0, "runs": 0, "evicted": 0}
+
+
+async def test_tracked_states_are_capped(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        max_tracked_states=1,
+    )
+    tracers = track_tracers(viewport)
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    outputs = [m for m in messages if m["type"] == "node_output"]
+    assert [o["state"] for o in outputs] == [{"value": "test"}, {"value": "test_a"}]
+    assert tracers[0].stats["evicted"] > 0
+
+
+async def test_running_ancestors_keep_their_state_under_pressure():
+    async def branch(value: str) -> str:
+        await asyncio.sleep(0.01)
+        return value
+
+    fan_out = RunnableParallel(a=RunnableLambda(branch), b=RunnableLambda(branch), c=RunnableLambda(branch))
+
+    async def parent(state: SimpleState, config: RunnableConfig) -> dict:
+        results = await fan_out.ainvoke(state["value"], config)
+        return {"value": "".join(results.values())}
+
+    builder = StateGraph(SimpleState)
+    builder.add_node("parent", parent)
+    builder.set_entry_point("parent")
+    builder.add_edge("parent", END)
+    ws_port = find_free_port()
+    viewport = watch(
+        builder.compile(),
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        max_tracked_states=4,
+    )
+    tracers = track_tracers(viewport)
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "x"})
+
+    outputs = [m for m in messages if m["type"] == "node_output" and m["node_id"] == "parent"]
+    assert [o["state"] for o in outputs] == [{"value": "x"}]
+    assert tracers[0].stats["evicted"] > 0
+
+
+async def test_nested_subgraph_edges_resolve_full_ids(nested_graph):
+    ws_port = find_free_port()
+    viewport = watch(nested_graph, port=find_free_port(), ws_port=ws_port, open_browser=False)
+    tracers = track_tracers(viewport)
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    assert [(m["source"], m["target"]) for m in messages if m["type"] == "edge_active"] == [
+        ("__start__", "outer"),
+        ("outer:__start__", "outer:inner"),
+        ("outer:inner:__start__", "outer:inner:x"),
+        ("outer:inner:x", "outer:inner:y"),
+        ("outer:inner:y", "outer:inner:__end__"),
+        ("outer:inner", "outer:__end__"),
+        ("outer", "after"),
+        ("after", "__end__"),
+    ]
+    assert tracers[0].stats["scopes"] == 0
+
+
+async def test_compact_ids_are_resolvable_from_the_topology(simple_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        simple_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        compact_ids=True,
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    edges = messages[0]["index"]["edges"]
+    active = [edges[m["edge"]] for m in messages if m["type"] == "edge_active"]
+    assert [(source, target) for _, source, target in active] == [
+        ("__start__", "step_a"), ("step_a", "step_b"), ("step_b", "__end__"),
+    ]
+    assert all("source" not in m for m in messages if m["type"] == "edge_active")
+
+
+async def test_lazy_subgraphs_expand_on_first_execution(nested_graph):
+    ws_port = find_free_port()
+    viewport = watch(
+        nested_graph,
+        port=find_free_port(),
+        ws_port=ws_port,
+        open_browser=False,
+        lazy_subgraphs=True,
+    )
+
+    async with ws_collect(ws_port) as (messages, done):
+        await safe_ainvoke(viewport, {"value": "test"})
+
+    outer = next(n for n in messages[0]["nodes"] if n["id"] == "outer")
+    assert outer["collapsed"] and "subgraph" not in outer
+    sequence = [
+        m["id"] if m["type"] == "subgraph" else m["target"]
+        for m in messages if m["type"] in ("subgraph", "edge_active")
+    ]
+    assert sequence == [
+        "outer", "outer", "outer:inner", "outer:inner", "outer:inner:x", "outer:inner:y",
+        "outer:inner:__end__", "outer:__end__", "after", "__end__",
+    ]
+    assert viewport.pending == {}
+
+
 async def test_basic_agent_edge_sequence():
     ws_port = find_free_port()
     viewport = watch(
@@ -0,0 +1,130 @@
+import {describe, expect, it} from "vitest";
+import {applyPatch, payloadBody, resolveState} from "../../langgraphics-web/src/state";
+import type {NodeEntry} from "../../langgraphics-web/src/types";
+
+function entry(fields: Partial<NodeEntry>): NodeEntry {
+    return {run_id: `r${fields.state_id}`, node_id: "n", ...fields};
+}
+
+describe("applyPatch", () => {
+    it("adds, replaces and removes object keys", () => {
+        const doc = applyPatch({a: 1, b: 2}, [
+            {op: "replace", path: "/a", value: 3},
+            {op: "remove", path: "/b"},
+            {op: "add", path: "/c~1d", value: 4},
+        ]);
+        expect(doc).toEqual({a: 3, "c/d": 4});
+    });
+
+    it("appends to and trims arrays", () => {
+        expect(applyPatch({m: [1, 2, 3]}, [
+            {op: "remove", path: "/m/2"},
+            {op: "add", path: "/m/-", value: 9},
+        ])).toEqual({m: [1, 2, 9]});
+    });
+});
+
+describe("resolveState", () => {
+    const entries = [
+        entry({state_id: 1, state: JSON.stringify({messages: ["a"]})}),
+        entry({state_id: 2, state_base: 1, state_patch: [{op: "add", path: "/messages/-", value: "b"}]}),
+        entry({state_id: 3, state_base: 2, state_patch: [{op: "add", path: "/messages/-", value: "c"}]}),
+    ];
+
+    it("returns keyframes as is", () => {
+        expect(resolveState(entries, entries[0], null)).toEqual({messages: ["a"]});
+    });
+
+    it("replays patches from the nearest keyframe", () => {
+        expect(resolveState(entries, entries[2], null)).toEqual({messages: ["a", "b", "c"]});
+    });
+
+    it("starts from the snapshot base when the keyframe was compacted", () => {
+        const base = {id: 2, value: JSON.stringify({messages: ["x", "y"]})};
+        expect(resolveState([entries[2]], entries[2], base)).toEqual({messages: ["x", "y", "c"]});
+    });
+
+    it("reads keyframes through the given accessor", () => {
+        const lazy = [entry({state_id: 1, blobs: {state: "b1"}}), entries[1]];
+        const bodies: Record<string, string> = {b1: JSON.stringify({messages: ["z"]})};
+        const stateOf = (e: NodeEntry) => e.state ?? (e.blobs?.state ? bodies[e.blobs.state] : null);
+        expect(resolveState(lazy, lazy[1], null, stateOf)).toEqual({messages: ["z", "b"]});
+    });
+
+    it("returns null when the chain is broken", () => {
+        expect(resolveState([entries[2]], entries[2], null)).toBeNull();
+    });
+});
+
+describe("payloadBody", () => {
+    const blobs = new Map<string, string | null>([
+        ["h", JSON.stringify({role: "human", content: "hi"})],
+        ["a", JSON.stringify({role: "ai", content: "hello"})],
+    ]);
+
+    it("rebuilds interned message lists and state keys", () => {
+        const e = entry({
+            state: JSON.stringify({messages: null, step: 2}),
+            refs: {input: ["h", "a"], state: {messages: ["h"]}},
+        });
+        const missing: string[] = [];
+        expect(JSON.parse(payloadBody(e, "input", blobs, missing)!)).toEqual([
+            {role: "human", content: "hi"},
+            {role: "ai", content: "hello"},
+        ]);
+        expect(JSON.parse(payloadBody(e, "state", blobs, missing)!)).toEqual({
+            messages: [{role: "human", content: "hi"}],
+            step: 2,
+        });
+        expect(missing).toEqual([]);
+    });
+
+    it("reads the rest of an interned state from its blob", () => {
+        const withRest = new Map([...blobs, ["s", JSON.stringify({messages: null, step: 3})]]);
+        const e = entry({state: null, blobs: {state: "s"}, refs: {state: {messages: ["a"]}}});
+        expect(JSON.parse(payloadBody(e, "state", withRest, [])!)).toEqual({
+            messages: [{role: "ai", content: "hello"}],
+            step: 3,
+        });
+    });
+
+    it("reports unknown references", () => {
+        const missing: string[] = [];
+        expect(payloadBody(entry({refs: {output: ["a", "x"]}}), "output", blobs, missing)).toBeNull();
+        expect(missing).toEqual(["x"]);
+    });
+});
+
+describe("structured payloads", () => {
+    it("resolves patches without mutating the keyframe", () => {
+        const keyframe = entry({state_id: 1, state: {messages: ["a"]}});
+        const patched = entry({state_id: 2, state_base: 1, state_patch: [{op: "add", path: "/messages/-", value: "b"}]});
+        expect(resolveState([keyframe, patched], patched, null)).toEqual({messages: ["a", "b"]});
+        expect(keyframe.state).toEqual({messages: ["a"]});
+    });
+
+    it("fills interned patch values in from the blobs", () => {
+        const blobs = new Map([["m2", JSON.stringify({content: "yo"})]]);
+        const keyframe = entry({state_id: 1, state: {messages: [{content: "hi"}]}});
+        const patched = entry({state_id: 2, state_base: 1, state_patch: [{op: "add", path: "/messages/-", ref: "m2"}]});
+        expect(resolveState([keyframe, patched], patched, null, undefined, blobs)).toEqual({
+            messages: [{content: "hi"}, {content: "yo"}],
+        });
+        const missing: string[] = [];
+        expect(resolveState([keyframe, patched], patched, null, undefined, new Map(), missing)).toBeNull();
+        expect(missing).toEqual(["m2"]);
+    });
+
+    it("keeps inserted patch values intact across later patches", () => {
+        const keyframe = entry({state_id: 1, state: {}});
+        const added = entry({state_id: 2, state_base: 1, state_patch: [{op: "add", path: "/config", value: {model: "a"}}]});
+        const nested = entry({state_id: 3, state_base: 2, state_patch: [{op: "replace", path: "/config/model", value: "b"}]});
+        const entries = [keyframe, added, nested];
+        expect(resolveState(entries, nested, null)).toEqual({config: {model: "b"}});
+        expect(added.state_patch![0].value).toEqual({model: "a"});
+        expect(resolveState(entries, added, null)).toEqual({config: {model: "a"}});
+        expect(payloadBody(entry({input: [{role: "human", content: "hi"}]}), "input", new Map(), [])).toEqual([
+            {role: "human", content: "hi"},
+        ]);
+    });
+});
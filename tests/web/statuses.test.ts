@@ -119,6 +119,29 @@ describe("computeStatuses", () => {
         expect(result.edgeStatuses.get("e1")).toBe("traversed");
     });
 
+    it("snapshot seeds statuses that later events build on", () => {
+        const {nodeStatuses, edgeStatuses} = computeStatuses([
+            {
+                type: "snapshot",
+                run_id: "abc",
+                nodes: {A: "completed", B: "active"},
+                edges: {
+                    e0: {source: "__start__", target: "A", status: "traversed"},
+                    e1: {source: "A", target: "B", status: "active"},
+                },
+                outputs: [],
+                metrics: {costs: {cached: "0.0", total: "0.0"}, tokens: {cached: 0, total: 0}},
+            },
+            {type: "edge_active", source: "B", target: "__end__", edge_id: "e2"},
+        ]);
+        expect(nodeStatuses.get("A")).toBe("completed");
+        expect(nodeStatuses.get("B")).toBe("completed");
+        expect(nodeStatuses.get("__end__")).toBe("active");
+        expect(edgeStatuses.get("e0")).toBe("traversed");
+        expect(edgeStatuses.get("e1")).toBe("traversed");
+        expect(edgeStatuses.get("e2")).toBe("active");
+    });
+
     it("run_start clears previous run statuses", () => {
         const {nodeStatuses, edgeStatuses} = computeStatuses([
             {type: "run_start", run_id: "run1"},